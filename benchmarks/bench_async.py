@@ -0,0 +1,75 @@
+"""
+Sync vs async request path benchmark
+
+Runs the same request mix against the original threadpool-bound handlers
+(``benchmarks.sync_app``) and the Motor-backed ``main:app``, one after the
+other on the same port, and prints req/s and latency percentiles for each.
+
+Requires a local mongod; DATABASE_URL / DATABASE_NAME are read from the
+environment (use a throwaway database, a few toys are inserted if empty):
+
+    DATABASE_URL=mongodb://localhost:27017 DATABASE_NAME=toybench \\
+        python -m benchmarks.bench_async --concurrency 256 --duration 15
+"""
+
+import argparse
+import asyncio
+import json
+import random
+
+from benchmarks.loadgen import run_load, start_server, stop_server
+from database import db
+
+SAMPLE_TOY = {"name": "Bench Bear", "description": "Benchmark plush.", "price": 9.99,
+              "category": "Plush", "rating": 4.5, "in_stock": True}
+
+
+def _toy_ids():
+    if db is None:
+        raise SystemExit("DATABASE_URL and DATABASE_NAME must point at a local mongod")
+    if db["toy"].count_documents({}) < 100:
+        db["toy"].insert_many([dict(SAMPLE_TOY, name=f"Bench Toy {i}") for i in range(100)])
+    return [str(d["_id"]) for d in db["toy"].find({}, {"_id": 1}).limit(100)]
+
+
+def _request_mix(toy_ids):
+    order = json.dumps({
+        "customer_name": "Bench", "customer_email": "bench@example.com",
+        "customer_address": "1 Load St",
+        "items": [{"toy_id": toy_ids[0], "name": "Bench Toy", "price": 9.99, "quantity": 1}],
+        "subtotal": 9.99, "total": 9.99,
+    }).encode()
+
+    def next_request():
+        roll = random.random()
+        if roll < 0.45:
+            return "GET", "/api/toys", None
+        if roll < 0.95:
+            return "GET", f"/api/toys/{random.choice(toy_ids)}", None
+        return "POST", "/api/orders", order
+    return next_request
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--concurrency", type=int, default=256)
+    parser.add_argument("--duration", type=float, default=15.0)
+    parser.add_argument("--port", type=int, default=8765)
+    args = parser.parse_args()
+
+    next_request = _request_mix(_toy_ids())
+    report = {}
+    for mode, app in (("sync", "benchmarks.sync_app:app"), ("async", "main:app")):
+        proc = start_server(app, args.port)
+        try:
+            result = asyncio.run(run_load("127.0.0.1", args.port, next_request,
+                                          args.concurrency, args.duration))
+        finally:
+            stop_server(proc)
+        report[mode] = result.summary()
+        print(f"{mode:>5}: {report[mode]}")
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+"""
+Response compression microbenchmark
+
+Drives CompressionMiddleware directly (no server, no database) with list
+pages of N toys rendered the way GET /api/toys renders them, and reports
+per encoding:
+
+- bytes on the wire against the identity body;
+- CPU time per request with the precompressed cache cold (every request
+  compresses) and warm (repeat hits on the same ETag reuse the bytes).
+
+    python -m benchmarks.bench_compression --sizes 24 100
+"""
+
+import argparse
+import asyncio
+import json
+import time
+
+from benchmarks.bench_encoding import _toys
+from compression import CompressionMiddleware, CompressionSettings, ResponseCompressor
+from http_cache import etag_for
+from responses import dumps
+
+
+def _app(body: bytes):
+    headers = [(b"content-type", b"application/json"), (b"content-length", str(len(body)).encode()),
+               (b"etag", etag_for(body).encode()), (b"cache-control", b"public, max-age=30")]
+
+    async def app(scope, receive, send):
+        await send({"type": "http.response.start", "status": 200, "headers": list(headers)})
+        await send({"type": "http.response.body", "body": body})
+    return app
+
+
+async def _request(middleware, accept_encoding: str) -> int:
+    scope = {"type": "http", "method": "GET", "path": "/api/toys",
+             "headers": [(b"accept-encoding", accept_encoding.encode())]}
+    size = 0
+
+    async def send(message):
+        nonlocal size
+        if message["type"] == "http.response.body":
+            size += len(message["body"])
+
+    await middleware(scope, None, send)
+    return size
+
+
+def _cpu_per_request(middleware, accept_encoding: str, requests: int, cold: bool) -> float:
+    async def run():
+        for _ in range(requests):
+            if cold:
+                middleware.compressor.cache.clear()
+            await _request(middleware, accept_encoding)
+    start = time.process_time()
+    asyncio.run(run())
+    return (time.process_time() - start) / requests
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[24, 100])
+    parser.add_argument("--requests", type=int, default=2000)
+    args = parser.parse_args()
+
+    report = {}
+    for n in args.sizes:
+        body = dumps({"items": _toys(n), "next_cursor": "eyJpZCI6ICI2NWYxIn0"})
+        middleware = CompressionMiddleware(_app(body), ResponseCompressor(CompressionSettings.from_env()))
+        row = {"identity_bytes": len(body)}
+        row["identity_us"] = round(_cpu_per_request(middleware, "identity", args.requests, cold=False) * 1e6, 1)
+        for encoding in middleware.compressor.encodings:
+            row[f"{encoding}_bytes"] = asyncio.run(_request(middleware, encoding))
+            row[f"{encoding}_ratio"] = round(row[f"{encoding}_bytes"] / len(body), 3)
+            row[f"{encoding}_cold_us"] = round(_cpu_per_request(middleware, encoding, args.requests, cold=True) * 1e6, 1)
+            row[f"{encoding}_warm_us"] = round(_cpu_per_request(middleware, encoding, args.requests, cold=False) * 1e6, 1)
+        report[n] = row
+        print(n, row)
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+"""
+Response encoding microbenchmark
+
+Times serializing N toy documents the old way (stringify each _id, run
+FastAPI's jsonable_encoder, render with the stdlib JSONResponse) against
+MongoJSONResponse (orjson straight from the raw documents). CPU only, no
+database needed:
+
+    python -m benchmarks.bench_encoding --sizes 100 1000 10000
+"""
+
+import argparse
+import json
+import timeit
+from datetime import datetime, timezone
+
+from bson import ObjectId
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+
+from responses import MongoJSONResponse
+
+
+def _toys(n: int) -> list:
+    now = datetime.now(timezone.utc)
+    return [{
+        "_id": ObjectId(), "name": f"Cuddly Bear {i}",
+        "description": "Super soft plush bear with embroidered eyes, safe for all ages.",
+        "price": 19.99, "category": "Plush",
+        "image": "https://images.unsplash.com/photo-1612198185720-2d3a9c5a4f8e",
+        "rating": 4.7, "in_stock": True, "created_at": now, "updated_at": now,
+    } for i in range(n)]
+
+
+def _before(docs: list) -> bytes:
+    docs = [dict(d) for d in docs]
+    for d in docs:
+        d["_id"] = str(d["_id"])
+    return JSONResponse(jsonable_encoder({"items": docs, "next_cursor": None})).body
+
+
+def _after(docs: list) -> bytes:
+    return MongoJSONResponse({"items": docs, "next_cursor": None}).body
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100, 1000, 10000])
+    args = parser.parse_args()
+
+    report = {}
+    for n in args.sizes:
+        docs = _toys(n)
+        number = max(1, 20000 // n)
+        row = {}
+        for label, fn in (("before", _before), ("after", _after)):
+            best = min(timeit.repeat(lambda: fn(docs), number=number, repeat=5)) / number
+            row[f"{label}_ms"] = round(best * 1000, 3)
+        row["speedup"] = round(row["before_ms"] / row["after_ms"], 1)
+        report[n] = row
+        print(n, row)
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,52 @@
+"""
+Group commit benchmark
+
+Measures order intake (orders/sec and latency) with ORDER_WRITE_MODE=direct
+against ORDER_WRITE_MODE=group, durable acknowledgement in both cases, so
+the difference is the batching alone. 429s from a full queue are counted
+as errors.
+
+Requires a local mongod:
+
+    DATABASE_URL=mongodb://localhost:27017 DATABASE_NAME=toybench \\
+        python -m benchmarks.bench_group_commit --concurrency 256 --duration 15
+"""
+
+import argparse
+import asyncio
+import json
+import random
+
+from benchmarks.bench_orders import _catalog, _order_body
+from benchmarks.loadgen import run_load, start_server, stop_server
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--concurrency", type=int, default=256)
+    parser.add_argument("--duration", type=float, default=15.0)
+    parser.add_argument("--lines", type=int, default=3)
+    parser.add_argument("--write-concern", default="1", help="ORDER_WRITE_CONCERN_W for both runs")
+    parser.add_argument("--port", type=int, default=8768)
+    args = parser.parse_args()
+
+    toys = _catalog()
+    rng = random.Random(0)
+    bodies = [_order_body(toys, args.lines, rng) for _ in range(100)]
+    report = {}
+    for mode in ("direct", "group"):
+        env = {"ORDER_WRITE_MODE": mode, "ORDER_ACK": "durable", "ORDER_WRITE_CONCERN_W": args.write_concern}
+        proc = start_server("main:app", args.port, env=env)
+        try:
+            result = asyncio.run(run_load("127.0.0.1", args.port,
+                                          lambda: ("POST", "/api/orders", rng.choice(bodies)),
+                                          args.concurrency, args.duration))
+        finally:
+            stop_server(proc)
+        report[mode] = result.summary()
+        print(f"{mode:>6}: {report[mode]}")
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
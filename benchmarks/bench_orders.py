@@ -0,0 +1,70 @@
+"""
+Order intake latency benchmark
+
+Posts orders with 1, 10 and 100 lines to a running ``main:app`` and reports
+throughput and latency per order size. Intake resolves every line's toy
+with one $in query, so latency should grow with line count far more slowly
+than a find_one per line would.
+
+Requires a local mongod (a few hundred toys are inserted if missing):
+
+    DATABASE_URL=mongodb://localhost:27017 DATABASE_NAME=toybench \\
+        python -m benchmarks.bench_orders --concurrency 32 --duration 10
+"""
+
+import argparse
+import asyncio
+import json
+import random
+
+from benchmarks.loadgen import run_load, start_server, stop_server
+from database import db
+
+
+def _catalog(n: int = 300) -> list:
+    if db is None:
+        raise SystemExit("DATABASE_URL and DATABASE_NAME must point at a local mongod")
+    if db["toy"].count_documents({}) < n:
+        db["toy"].insert_many([{"name": f"Bench Toy {i}", "price": round(5 + i % 50, 2),
+                                "category": "Bench", "in_stock": True} for i in range(n)])
+    return list(db["toy"].find({}, {"name": 1, "price": 1}).limit(n))
+
+
+def _order_body(toys: list, lines: int, rng: random.Random) -> bytes:
+    picked = rng.sample(toys, lines)
+    items = [{"toy_id": str(t["_id"]), "name": t["name"], "price": t["price"], "quantity": 1} for t in picked]
+    subtotal = round(sum(t["price"] for t in picked), 2)
+    return json.dumps({
+        "customer_name": "Bench", "customer_email": "bench@example.com",
+        "customer_address": "1 Load St", "items": items,
+        "subtotal": subtotal, "shipping": 0, "total": subtotal,
+    }).encode()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--lines", type=int, nargs="+", default=[1, 10, 100])
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--duration", type=float, default=10.0)
+    parser.add_argument("--port", type=int, default=8766)
+    args = parser.parse_args()
+
+    toys = _catalog(max(300, max(args.lines)))
+    rng = random.Random(0)
+    report = {}
+    proc = start_server("main:app", args.port)
+    try:
+        for lines in args.lines:
+            bodies = [_order_body(toys, lines, rng) for _ in range(50)]
+            result = asyncio.run(run_load("127.0.0.1", args.port,
+                                          lambda: ("POST", "/api/orders", rng.choice(bodies)),
+                                          args.concurrency, args.duration))
+            report[lines] = result.summary()
+            print(f"{lines:>4} lines: {report[lines]}")
+    finally:
+        stop_server(proc)
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+"""
+Toy search latency benchmark
+
+Seeds catalogs of increasing size into a scratch database and times, per
+size: the old unanchored case-insensitive $regex, the $text search used by
+GET /api/toys?q=, and the in-process prefix index behind /api/toys/suggest.
+
+Requires a local mongod. The target database is dropped and re-seeded:
+
+    DATABASE_URL=mongodb://localhost:27017 python -m benchmarks.bench_search \\
+        --database toybench_search --sizes 10000 100000 1000000
+"""
+
+import argparse
+import json
+import os
+import random
+import time
+
+from pymongo import MongoClient
+
+from indexes import sync_indexes
+from search import PrefixIndex
+
+ADJECTIVES = ["Cuddly", "Rainbow", "Wooden", "Magnetic", "Glow", "Mini", "Giant", "Musical", "Classic", "Turbo"]
+NOUNS = ["Bear", "Robot", "Puzzle", "Train", "Blocks", "Dinosaur", "Kite", "Rings", "Castle", "Rocket"]
+CATEGORIES = ["Plush", "STEM", "Puzzles", "Educational", "Outdoor", "Vehicles"]
+QUERIES = ["bear", "robot kit", "rainbow", "dino", "wooden train", "zzz-no-match"]
+PREFIXES = ["b", "be", "rob", "rainbow r", "wood", "q"]
+
+
+def _seed(collection, size: int, rng: random.Random):
+    collection.drop()
+    batch = []
+    for i in range(size):
+        name = f"{rng.choice(ADJECTIVES)} {rng.choice(NOUNS)} {i}"
+        batch.append({"name": name, "description": f"A {name.lower()} for curious kids.",
+                      "category": rng.choice(CATEGORIES), "price": round(rng.uniform(3, 120), 2),
+                      "rating": round(rng.uniform(3, 5), 1), "in_stock": True})
+        if len(batch) == 10000:
+            collection.insert_many(batch, ordered=False)
+            batch = []
+    if batch:
+        collection.insert_many(batch, ordered=False)
+    sync_indexes(collection.database)
+
+
+def _time(fn, repeat: int) -> dict:
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - start)
+    samples.sort()
+    return {"p50_ms": round(samples[len(samples) // 2] * 1000, 3),
+            "p99_ms": round(samples[min(len(samples) - 1, int(len(samples) * 0.99))] * 1000, 3)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--database", default="toybench_search")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000, 1_000_000])
+    parser.add_argument("--repeat", type=int, default=50)
+    args = parser.parse_args()
+
+    collection = MongoClient(os.getenv("DATABASE_URL", "mongodb://localhost:27017"))[args.database]["toy"]
+    report = {}
+    for size in args.sizes:
+        _seed(collection, size, random.Random(size))
+        prefix_index = PrefixIndex()
+        prefix_index.rebuild(collection.find({}, {"name": 1, "rating": 1}))
+        row = {}
+        for q in QUERIES:
+            row[f"regex:{q}"] = _time(lambda: list(collection.find(
+                {"name": {"$regex": q, "$options": "i"}}).limit(24)), args.repeat)
+            row[f"text:{q}"] = _time(lambda: list(collection.find(
+                {"$text": {"$search": q}}, {"score": {"$meta": "textScore"}}
+            ).sort([("score", {"$meta": "textScore"})]).limit(24)), args.repeat)
+        for prefix in PREFIXES:
+            row[f"prefix:{prefix}"] = _time(lambda: prefix_index.suggest(prefix, 10), args.repeat)
+        report[size] = row
+        print(size, json.dumps(row))
+    collection.drop()
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
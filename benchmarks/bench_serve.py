@@ -0,0 +1,133 @@
+"""
+Launcher benchmark: ``uvicorn --reload`` vs serve.py
+
+Starts the API three ways on the same port, one after the other:
+
+- reload:   ``uvicorn main:app --reload`` (what start_server.sh used to run)
+- serve-1:  ``python serve.py --workers 1``
+- serve-N:  ``python serve.py`` with --workers (default: one per CPU)
+
+and reports for each the startup time (process start until the first 200
+from GET /), throughput and latency under load, the CPU the process tree
+burns while idle (the reloader polls every source file), and how long a
+SIGTERM takes to stop it.
+
+The load is driven from ``--clients`` processes so that with many workers
+the single-threaded load generator is not what saturates. The default path
+needs a mongod (DATABASE_URL / DATABASE_NAME, as for the other benchmarks);
+``--path /`` measures the server alone:
+
+    DATABASE_URL=mongodb://localhost:27017 DATABASE_NAME=toybench \\
+        python -m benchmarks.bench_serve --workers 4 --clients 4 --duration 15
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from benchmarks.loadgen import LoadResult, request_once, run_load, start_command, stop_server
+
+
+def _cpu_seconds(pid: int) -> float:
+    """utime + stime of ``pid`` and all its descendants (Linux /proc)"""
+    try:
+        with open(f"/proc/{pid}/stat") as f:
+            fields = f.read().rsplit(")", 1)[1].split()
+        total = (int(fields[11]) + int(fields[12])) / os.sysconf("SC_CLK_TCK")
+        with open(f"/proc/{pid}/task/{pid}/children") as f:
+            children = [int(child) for child in f.read().split()]
+    except OSError:
+        return 0.0
+    return total + sum(_cpu_seconds(child) for child in children)
+
+
+def _wait_until_ready(port: int, timeout: float = 60.0):
+    # Workers may still be importing the app after the parent has bound the port
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            if asyncio.run(request_once("127.0.0.1", port, "GET", "/")) == 200:
+                return
+        except (OSError, ValueError, IndexError):
+            pass
+        time.sleep(0.05)
+    raise TimeoutError(f"Server on port {port} did not answer within {timeout}s")
+
+
+def _load(port: int, path: str, concurrency: int, duration: float) -> LoadResult:
+    return asyncio.run(run_load("127.0.0.1", port, lambda: ("GET", path, None), concurrency, duration))
+
+
+def _measure(name: str, cmd, args) -> dict:
+    started = time.perf_counter()
+    proc = start_command(cmd, args.port)
+    try:
+        _wait_until_ready(args.port)
+        startup = time.perf_counter() - started
+
+        cpu_before = _cpu_seconds(proc.pid)
+        time.sleep(args.idle)
+        idle_cpu = _cpu_seconds(proc.pid) - cpu_before
+
+        result = LoadResult()
+        with ProcessPoolExecutor(args.clients) as pool:
+            parts = list(pool.map(_load, [args.port] * args.clients, [args.path] * args.clients,
+                                  [args.concurrency // args.clients] * args.clients,
+                                  [args.duration] * args.clients))
+        for part in parts:
+            result.requests += part.requests
+            result.errors += part.errors
+            result.latencies.extend(part.latencies)
+        result.duration = max(part.duration for part in parts)
+    finally:
+        stopping = time.perf_counter()
+        stop_server(proc)
+        stop = time.perf_counter() - stopping
+    return {
+        "launcher": name,
+        "startup_s": round(startup, 2),
+        "idle_cpu_pct": round(100 * idle_cpu / args.idle, 1),
+        **result.summary(),
+        "stop_s": round(stop, 2),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--path", default="/api/toys")
+    parser.add_argument("--concurrency", type=int, default=256)
+    parser.add_argument("--clients", type=int, default=max(1, min(4, (os.cpu_count() or 2) // 2)),
+                        help="load generator processes, sharing --concurrency")
+    parser.add_argument("--duration", type=float, default=15.0)
+    parser.add_argument("--idle", type=float, default=5.0, help="seconds of idle CPU sampling")
+    parser.add_argument("--port", type=int, default=8765)
+    args = parser.parse_args()
+
+    quiet = ["--log-level", "warning"]
+    launchers = [
+        ("reload", [sys.executable, "-m", "uvicorn", "main:app", "--host", "127.0.0.1",
+                    "--port", str(args.port), "--reload", *quiet]),
+        ("serve-1", [sys.executable, "serve.py", "--host", "127.0.0.1", "--port", str(args.port),
+                     "--workers", "1", *quiet]),
+        (f"serve-{args.workers}", [sys.executable, "serve.py", "--host", "127.0.0.1",
+                                   "--port", str(args.port), "--workers", str(args.workers), *quiet]),
+    ]
+    results = []
+    for name, cmd in launchers:
+        results.append(_measure(name, cmd, args))
+        print(json.dumps(results[-1]), flush=True)
+
+    print(f"\n{'launcher':>10} {'startup s':>10} {'idle cpu%':>10} {'req/s':>10} "
+          f"{'p50 ms':>8} {'p99 ms':>8} {'errors':>7} {'stop s':>7}")
+    for r in results:
+        print(f"{r['launcher']:>10} {r['startup_s']:>10} {r['idle_cpu_pct']:>10} {r['rps']:>10} "
+              f"{r['p50_ms']:>8} {r['p99_ms']:>8} {r['errors']:>7} {r['stop_s']:>7}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+"""
+Tracing overhead microbenchmark
+
+Drives a FastAPI app shaped like the catalog reads (path parameter, query
+validation, a timed helper call, an orjson response) straight through ASGI,
+with no server and no database, and reports CPU time per request for:
+
+- baseline: plain routes and no tracing middleware, which is what main.py
+  installs when TRACE_EXPORTER is unset;
+- TracedRoute + TracingMiddleware with nothing sampled, at 1% sampling
+  (the default rate) and at 100%, exporting to a temp file.
+
+    python -m benchmarks.bench_tracing --requests 20000
+"""
+
+import argparse
+import asyncio
+import dataclasses
+import json
+import os
+import tempfile
+import time
+
+from fastapi import FastAPI, Query
+from fastapi.routing import APIRoute
+
+import tracing
+from metrics import timed_operation
+from responses import MongoJSONResponse
+
+
+@timed_operation
+async def _fetch(collection_name: str, toy_id: str) -> dict:
+    return {"_id": toy_id, "name": "Cuddly Bear", "price": 19.99, "category": "Plush", "rating": 4.5}
+
+
+def _app(traced: bool) -> FastAPI:
+    app = FastAPI()
+    app.router.route_class = tracing.TracedRoute if traced else APIRoute
+
+    @app.get("/api/toys/{toy_id}")
+    async def get_toy(toy_id: str, fields: str = Query(None)):
+        return MongoJSONResponse(await _fetch("toy", toy_id))
+
+    if traced:
+        app.add_middleware(tracing.TracingMiddleware)
+    return app
+
+
+async def _drive(app, requests: int):
+    scope = {"type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "GET",
+             "scheme": "http", "path": "/api/toys/abc", "raw_path": b"/api/toys/abc",
+             "query_string": b"fields=name", "root_path": "", "headers": [], "server": ("test", 80)}
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        pass
+
+    for _ in range(requests):
+        await app(dict(scope), receive, send)
+
+
+def _cpu_us(app, requests: int) -> float:
+    asyncio.run(_drive(app, 200))  # warm up
+    start = time.process_time()
+    asyncio.run(_drive(app, requests))
+    return (time.process_time() - start) / requests * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=20000)
+    args = parser.parse_args()
+
+    trace_file = os.path.join(tempfile.mkdtemp(), "traces.jsonl")
+    base = tracing.TracingSettings(file=trace_file)
+    report = {"baseline_us": round(_cpu_us(_app(False), args.requests), 2)}
+    for label, settings in (
+        ("unsampled", dataclasses.replace(base, exporter="file", sample_rate=0.0)),
+        ("sampled_1pct", dataclasses.replace(base, exporter="file", sample_rate=0.01)),
+        ("sampled_100pct", dataclasses.replace(base, exporter="file", sample_rate=1.0)),
+    ):
+        tracing.tracer.settings = settings
+        report[f"{label}_us"] = round(_cpu_us(_app(True), args.requests), 2)
+        tracing.tracer.flush()
+        report[f"{label}_overhead_pct"] = round((report[f"{label}_us"] / report["baseline_us"] - 1) * 100, 2)
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
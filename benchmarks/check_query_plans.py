@@ -0,0 +1,108 @@
+"""
+Query plan check for GET /api/toys listings
+
+Seeds a scratch catalog, then explains every supported combination of
+sort, category, price/rating range, in_stock and cursor position exactly
+as toy_listing builds them. Fails if any winning plan contains an
+in-memory SORT stage or a full collection scan (COLLSCAN).
+
+Requires a local mongod. The target database is dropped and re-seeded:
+
+    DATABASE_URL=mongodb://localhost:27017 python -m benchmarks.check_query_plans \\
+        --database toybench_plans --size 20000
+"""
+
+import argparse
+import itertools
+import os
+import random
+import sys
+from datetime import datetime, timedelta
+
+from pymongo import MongoClient
+
+from indexes import sync_indexes
+from pagination import position_of
+from toy_listing import TOY_SORTS, toy_listing_query
+
+CATEGORIES = ["Plush", "STEM", "Puzzles", "Educational", "Outdoor", "Vehicles"]
+PAGE_SIZE = 24
+
+
+def _seed(collection, size: int, rng: random.Random):
+    collection.drop()
+    start = datetime(2024, 1, 1)
+    batch = []
+    for i in range(size):
+        stock = rng.randint(0, 20)
+        batch.append({"name": f"Toy {i}", "category": rng.choice(CATEGORIES),
+                      "price": round(rng.uniform(3, 120), 2), "rating": round(rng.uniform(1, 5), 1),
+                      "stock": stock, "in_stock": stock > 0,
+                      "created_at": start + timedelta(minutes=i), "updated_at": start + timedelta(minutes=i)})
+        if len(batch) == 10000:
+            collection.insert_many(batch, ordered=False)
+            batch = []
+    if batch:
+        collection.insert_many(batch, ordered=False)
+    sync_indexes(collection.database)
+
+
+def _stages(plan: dict):
+    yield plan.get("stage")
+    for key in ("inputStage", "queryPlan"):
+        if key in plan:
+            yield from _stages(plan[key])
+    for child in plan.get("inputStages", []):
+        yield from _stages(child)
+
+
+def _winning_plan(explain: dict) -> dict:
+    planner = explain["queryPlanner"]
+    # Slot-based engine (6.0+) nests the classic plan under queryPlan
+    return planner["winningPlan"].get("queryPlan", planner["winningPlan"])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--database", default="toybench_plans")
+    parser.add_argument("--size", type=int, default=20_000)
+    args = parser.parse_args()
+
+    collection = MongoClient(os.getenv("DATABASE_URL", "mongodb://localhost:27017"))[args.database]["toy"]
+    _seed(collection, args.size, random.Random(args.size))
+
+    failures = 0
+    checked = 0
+    combos = itertools.product(
+        [None, *TOY_SORTS],             # sort
+        [None, "STEM"],                 # category
+        [None, True],                   # in_stock
+        [(None, None), (10.0, 50.0)],   # min_price, max_price
+        [None, 4.0],                    # min_rating
+        [False, True],                  # second page
+    )
+    for sort, category, in_stock, (min_price, max_price), min_rating, paged in combos:
+        filter_dict, sort_spec, hint, field = toy_listing_query(
+            sort, category, in_stock, min_price, max_price, min_rating)
+        if paged:
+            first = list(collection.find(filter_dict).sort(sort_spec).hint(hint).limit(PAGE_SIZE))
+            if not first:
+                continue
+            filter_dict, sort_spec, hint, field = toy_listing_query(
+                sort, category, in_stock, min_price, max_price, min_rating, position_of(first[-1], field))
+        plan = _winning_plan(collection.find(filter_dict).sort(sort_spec).hint(hint).limit(PAGE_SIZE + 1).explain())
+        stages = set(_stages(plan))
+        checked += 1
+        bad = stages & {"SORT", "COLLSCAN"}
+        label = (f"sort={sort} category={category} in_stock={in_stock} price={min_price}-{max_price} "
+                 f"min_rating={min_rating} paged={paged}")
+        if bad:
+            failures += 1
+            print(f"FAIL {label}: {sorted(bad)} via {hint}")
+    collection.drop()
+    print(f"{checked} plans checked, {failures} with SORT or COLLSCAN")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,173 @@
+"""
+Minimal HTTP load generator
+
+Keeps ``concurrency`` keep-alive connections busy against a running server
+and records per-request latency. It is dependency-free (asyncio streams) so
+the driver itself does not become the bottleneck the way a
+thread-per-request client would.
+"""
+
+import asyncio
+import os
+import socket
+import subprocess
+import sys
+import time
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List, Optional, Tuple
+
+# (method, path, body), optionally followed by a label to break results down by
+Request = Tuple[str, str, Optional[bytes]]
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+@dataclass
+class LoadResult:
+    requests: int = 0
+    errors: int = 0
+    duration: float = 0.0
+    latencies: List[float] = field(default_factory=list)
+    by_label: Dict[str, "LoadResult"] = field(default_factory=dict)
+
+    def record(self, latency: float, failed: bool, label: Optional[str] = None):
+        self.latencies.append(latency)
+        self.requests += 1
+        self.errors += failed
+        if label is not None:
+            self.by_label.setdefault(label, LoadResult()).record(latency, failed)
+
+    def percentile(self, p: float) -> float:
+        if not self.latencies:
+            return 0.0
+        ordered = sorted(self.latencies)
+        index = min(len(ordered) - 1, int(round(p / 100 * (len(ordered) - 1))))
+        return ordered[index]
+
+    def summary(self) -> dict:
+        return {
+            "requests": self.requests,
+            "errors": self.errors,
+            "rps": round(self.requests / self.duration, 1) if self.duration else 0.0,
+            "p50_ms": round(self.percentile(50) * 1000, 2),
+            "p95_ms": round(self.percentile(95) * 1000, 2),
+            "p99_ms": round(self.percentile(99) * 1000, 2),
+        }
+
+    def summaries(self) -> dict:
+        """Overall summary plus one per label"""
+        summary = {"all": self.summary()}
+        for label, result in sorted(self.by_label.items()):
+            result.duration = self.duration
+            summary[label] = result.summary()
+        return summary
+
+
+async def _read_response(reader: asyncio.StreamReader) -> int:
+    """Read one HTTP/1.1 response and return its status code"""
+    status_line = await reader.readline()
+    if not status_line:
+        raise ConnectionError("Server closed the connection")
+    status = int(status_line.split()[1])
+    length = 0
+    chunked = False
+    while True:
+        line = await reader.readline()
+        if line in (b"\r\n", b"\n", b""):
+            break
+        name, _, value = line.decode("latin-1").partition(":")
+        name = name.strip().lower()
+        if name == "content-length":
+            length = int(value)
+        elif name == "transfer-encoding" and "chunked" in value.lower():
+            chunked = True
+    if chunked:
+        while True:
+            size = int((await reader.readline()).split(b";")[0], 16)
+            await reader.readexactly(size + 2)
+            if size == 0:
+                break
+    elif length:
+        await reader.readexactly(length)
+    return status
+
+
+async def request_once(host: str, port: int, method: str, path: str, body: Optional[bytes] = None) -> int:
+    """Send a single request on a fresh connection and return the status code"""
+    reader, writer = await asyncio.open_connection(host, port)
+    try:
+        head = f"{method} {path} HTTP/1.1\r\nHost: {host}\r\nConnection: close\r\n"
+        if body is not None:
+            head += f"Content-Type: application/json\r\nContent-Length: {len(body)}\r\n"
+        writer.write(head.encode("latin-1") + b"\r\n" + (body or b""))
+        return await _read_response(reader)
+    finally:
+        writer.close()
+
+
+async def _worker(host: str, port: int, next_request: Callable[[], Request],
+                  deadline: float, result: LoadResult):
+    reader, writer = await asyncio.open_connection(host, port)
+    try:
+        while time.perf_counter() < deadline:
+            request = next_request()
+            method, path, body = request[:3]
+            head = f"{method} {path} HTTP/1.1\r\nHost: {host}\r\n"
+            if body is not None:
+                head += f"Content-Type: application/json\r\nContent-Length: {len(body)}\r\n"
+            start = time.perf_counter()
+            writer.write(head.encode("latin-1") + b"\r\n" + (body or b""))
+            status = await _read_response(reader)
+            result.record(time.perf_counter() - start, status >= 400, request[3] if len(request) > 3 else None)
+    finally:
+        writer.close()
+
+
+async def run_load(host: str, port: int, next_request: Callable[[], Request],
+                   concurrency: int = 64, duration: float = 10.0) -> LoadResult:
+    """Drive the server with ``concurrency`` connections for ``duration`` seconds"""
+    result = LoadResult()
+    started = time.perf_counter()
+    deadline = started + duration
+    await asyncio.gather(*(
+        _worker(host, port, next_request, deadline, result) for _ in range(concurrency)
+    ))
+    result.duration = time.perf_counter() - started
+    return result
+
+
+def wait_for_port(host: str, port: int, timeout: float = 20.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            with socket.create_connection((host, port), timeout=0.5):
+                return
+        except OSError:
+            time.sleep(0.1)
+    raise TimeoutError(f"Server on {host}:{port} did not come up within {timeout}s")
+
+
+def start_server(app: str, port: int, extra_args: List[str] = None, env: dict = None) -> subprocess.Popen:
+    """Start ``uvicorn <app>`` from the repo root and wait until it accepts connections"""
+    cmd = [sys.executable, "-m", "uvicorn", app, "--host", "127.0.0.1",
+           "--port", str(port), "--log-level", "warning"] + (extra_args or [])
+    return start_command(cmd, port, env)
+
+
+def start_command(cmd: List[str], port: int, env: dict = None) -> subprocess.Popen:
+    """Run ``cmd`` from the repo root and wait until ``port`` accepts connections"""
+    proc = subprocess.Popen(cmd, cwd=REPO_ROOT, env={**os.environ, **(env or {})})
+    try:
+        wait_for_port("127.0.0.1", port)
+    except TimeoutError:
+        proc.kill()
+        raise
+    return proc
+
+
+def stop_server(proc: subprocess.Popen):
+    proc.terminate()
+    try:
+        proc.wait(timeout=10)
+    except subprocess.TimeoutExpired:
+        proc.kill()
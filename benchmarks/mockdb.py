@@ -0,0 +1,106 @@
+"""
+mongomock stand-in for CPU-only benchmarks
+
+Wraps a mongomock database in the slice of Motor's async API that this repo
+uses (collections with awaitable CRUD, cursors with sort/skip/limit/hint and
+async iteration or to_list, aggregate, with_options), and installs it in
+place of the real clients. Nothing here talks to a server, so benchmarks
+built on it measure the app's own CPU cost: routing, validation, encoding,
+middleware, helpers.
+
+mongomock has no $text search, and hints and write concerns are ignored.
+Requires ``pip install mongomock`` (not a runtime dependency).
+"""
+
+import sys
+
+
+class MockCursor:
+    def __init__(self, cursor):
+        self._cursor = cursor
+
+    def sort(self, *args, **kwargs):
+        self._cursor = self._cursor.sort(*args, **kwargs)
+        return self
+
+    def skip(self, n):
+        self._cursor = self._cursor.skip(n)
+        return self
+
+    def limit(self, n):
+        self._cursor = self._cursor.limit(n)
+        return self
+
+    def hint(self, index):
+        return self
+
+    async def to_list(self, length=None):
+        docs = []
+        for doc in self._cursor:
+            docs.append(doc)
+            if length is not None and len(docs) >= length:
+                break
+        return docs
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        try:
+            return next(self._cursor)
+        except StopIteration:
+            raise StopAsyncIteration
+
+    async def close(self):
+        pass
+
+
+class MockCollection:
+    def __init__(self, collection):
+        self._collection = collection
+
+    def with_options(self, **kwargs):
+        return self
+
+    def find(self, filter=None, projection=None, **kwargs):
+        kwargs.pop("batch_size", None)
+        return MockCursor(self._collection.find(filter, projection, **kwargs))
+
+    def aggregate(self, pipeline, **kwargs):
+        return MockCursor(self._collection.aggregate(pipeline, **kwargs))
+
+    def __getattr__(self, name):
+        method = getattr(self._collection, name)
+
+        async def call(*args, **kwargs):
+            return method(*args, **kwargs)
+        return call
+
+
+class MockDatabase:
+    def __init__(self, database):
+        self.sync = database
+
+    def __getitem__(self, name):
+        return MockCollection(self.sync[name])
+
+    async def command(self, *args, **kwargs):
+        return {"ok": 1}
+
+
+def install(name: str = "toybench") -> MockDatabase:
+    """Point database.py and every module that imported its clients at a fresh mongomock database"""
+    import mongomock
+
+    sync_db = mongomock.MongoClient()[name]
+    async_db = MockDatabase(sync_db)
+    # Modules that did ``from database import async_db`` hold their own reference
+    for module_name in ("database", "main", "inventory", "catalog", "facets", "idempotency", "order_queue"):
+        module = sys.modules.get(module_name)
+        if module is None:
+            continue
+        if hasattr(module, "async_db"):
+            module.async_db = async_db
+        if hasattr(module, "db"):
+            module.db = sync_db
+    return async_db
@@ -0,0 +1,67 @@
+"""
+Inventory oversell stress test
+
+Creates one toy with ``--stock`` units, then fires ``--orders`` concurrent
+single-unit checkouts for it at a multi-worker ``main:app``. Passes only if
+exactly ``--stock`` orders succeed, the rest get 409, and the toy ends at
+zero stock with as many stored orders as successful checkouts.
+
+Requires a local mongod; use a throwaway database:
+
+    DATABASE_URL=mongodb://localhost:27017 DATABASE_NAME=toybench \\
+        python -m benchmarks.stress_inventory --stock 100 --orders 1000 --workers 4
+"""
+
+import argparse
+import asyncio
+import json
+import sys
+from collections import Counter
+
+from benchmarks.loadgen import request_once, start_server, stop_server
+from database import db
+
+
+async def _checkouts(port: int, body: bytes, count: int) -> Counter:
+    statuses = await asyncio.gather(*(
+        request_once("127.0.0.1", port, "POST", "/api/orders", body) for _ in range(count)
+    ), return_exceptions=True)
+    return Counter(s if isinstance(s, int) else type(s).__name__ for s in statuses)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--stock", type=int, default=100)
+    parser.add_argument("--orders", type=int, default=1000)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--port", type=int, default=8767)
+    args = parser.parse_args()
+
+    if db is None:
+        raise SystemExit("DATABASE_URL and DATABASE_NAME must point at a local mongod")
+    toy_id = db["toy"].insert_one({"name": "Hot SKU", "price": 10.0, "category": "Stress",
+                                   "in_stock": True, "stock": args.stock}).inserted_id
+    body = json.dumps({
+        "customer_name": "Stress", "customer_email": "stress@example.com",
+        "customer_address": "1 Promo Ave",
+        "items": [{"toy_id": str(toy_id), "name": "Hot SKU", "price": 10.0, "quantity": 1}],
+        "subtotal": 10.0, "total": 10.0,
+    }).encode()
+
+    proc = start_server("main:app", args.port, ["--workers", str(args.workers)])
+    try:
+        statuses = asyncio.run(_checkouts(args.port, body, args.orders))
+    finally:
+        stop_server(proc)
+
+    stock = db["toy"].find_one({"_id": toy_id})["stock"]
+    orders = db["order"].count_documents({"items.toy_id": str(toy_id)})
+    print(json.dumps({"statuses": dict(statuses), "final_stock": stock, "orders_stored": orders}, indent=2))
+    expected = min(args.stock, args.orders)
+    ok = statuses[201] == expected == orders and stock == args.stock - expected and stock >= 0
+    print("PASS: no oversell" if ok else "FAIL: stock and orders disagree")
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
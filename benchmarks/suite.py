@@ -0,0 +1,345 @@
+"""
+Benchmark suite for the Toy Store API
+
+Seeds a catalog of N toys and M orders, then drives the API with a
+configurable mix of scenarios and concurrency:
+
+- list    GET /api/toys (random category and sort on some requests)
+- get     GET /api/toys/{toy_id}
+- search  GET /api/toys?q=...
+- order   POST /api/orders with 1-3 lines at the current prices
+
+Each selected scenario runs on its own and then all of them together as
+"mix", weighted by --mix. Results (throughput, p50/p95/p99 per scenario,
+allocations, environment and commit) are written as JSON so two commits can
+be compared with --compare.
+
+Backends:
+- mongod: the full stack. ``main:app`` runs under uvicorn against a local
+  mongod and is driven over HTTP by benchmarks.loadgen. The target database
+  is dropped and re-seeded. Allocations are the server's peak and final RSS.
+- mongomock: CPU only and in process. The ASGI app is called directly with
+  database.py pointed at mongomock (benchmarks.mockdb), so the numbers are
+  the app's own cost without network or server time. Allocations come from
+  tracemalloc (peak bytes per request and bytes retained), measured in a
+  separate pass so tracing does not skew latency. mongomock has no $text
+  search, so "search" is left out of the default mix.
+
+    DATABASE_URL=mongodb://localhost:27017 python -m benchmarks.suite --backend mongod \\
+        --toys 10000 --orders 5000 --concurrency 32 --duration 10 \\
+        --mix list=50,get=30,search=10,order=10
+    python -m benchmarks.suite --backend mongomock --toys 2000 --duration 5
+    python -m benchmarks.suite --compare benchmarks/results/old.json benchmarks/results/new.json
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import time
+import tracemalloc
+from datetime import datetime, timedelta, timezone
+from typing import Callable, Dict, List, Optional
+
+from bson import ObjectId
+
+from benchmarks.loadgen import REPO_ROOT, LoadResult, Request, run_load, start_server, stop_server
+
+SCENARIOS = ("list", "get", "search", "order")
+DEFAULT_MIX = "list=50,get=30,search=10,order=10"
+ADJECTIVES = ["Cuddly", "Rainbow", "Wooden", "Magnetic", "Glow", "Mini", "Giant", "Musical", "Classic", "Turbo"]
+NOUNS = ["Bear", "Robot", "Puzzle", "Train", "Blocks", "Dinosaur", "Kite", "Rings", "Castle", "Rocket"]
+CATEGORIES = ["Plush", "STEM", "Puzzles", "Educational", "Outdoor", "Vehicles"]
+SORTS = ["price", "-price", "-rating", "-created_at"]
+SEARCH_TERMS = ["bear", "robot", "rainbow train", "wooden", "glow kite", "castle"]
+# High enough that orders never run a toy out of stock during a run
+BENCH_STOCK = 10 ** 9
+
+
+def parse_mix(mix: str) -> Dict[str, int]:
+    weights = {}
+    for part in mix.split(","):
+        name, _, weight = part.partition("=")
+        name = name.strip()
+        if name not in SCENARIOS:
+            raise SystemExit(f"Unknown scenario {name!r}; expected one of {', '.join(SCENARIOS)}")
+        weights[name] = int(weight or 1)
+    return {name: weight for name, weight in weights.items() if weight > 0}
+
+
+# ----- Seeding -----
+
+def make_toys(n: int, rng: random.Random) -> List[dict]:
+    start = datetime(2024, 1, 1, tzinfo=timezone.utc)
+    toys = []
+    for i in range(n):
+        name = f"{rng.choice(ADJECTIVES)} {rng.choice(NOUNS)} {i}"
+        created = start + timedelta(minutes=i)
+        toys.append({
+            "_id": ObjectId(), "name": name, "description": f"A {name.lower()} for curious kids.",
+            "category": rng.choice(CATEGORIES), "price": round(rng.uniform(3, 120), 2),
+            "rating": round(rng.uniform(1, 5), 1), "stock": BENCH_STOCK, "in_stock": True,
+            "image": f"https://example.com/toys/{i}.jpg", "created_at": created, "updated_at": created,
+        })
+    return toys
+
+
+def order_body(toys: List[dict], rng: random.Random) -> dict:
+    picked = rng.sample(toys, rng.randint(1, 3))
+    items = [{"toy_id": str(t["_id"]), "name": t["name"], "price": t["price"], "quantity": 1} for t in picked]
+    subtotal = round(sum(t["price"] for t in picked), 2)
+    return {"customer_name": "Bench", "customer_email": f"bench{rng.randrange(1000)}@example.com",
+            "customer_address": "1 Load St", "items": items, "subtotal": subtotal, "shipping": 0, "total": subtotal}
+
+
+def make_orders(m: int, toys: List[dict], rng: random.Random) -> List[dict]:
+    now = datetime.now(timezone.utc)
+    return [{**order_body(toys, rng), "status": "pending", "created_at": now, "updated_at": now} for _ in range(m)]
+
+
+def seed(sync_db, toys: List[dict], orders: List[dict]):
+    for name in ("toy", "order"):
+        sync_db[name].delete_many({})
+    for name, docs in (("toy", toys), ("order", orders)):
+        for i in range(0, len(docs), 10000):
+            sync_db[name].insert_many(docs[i:i + 10000], ordered=False)
+
+
+# ----- Request mix -----
+
+def request_factory(weights: Dict[str, int], toys: List[dict], rng: random.Random) -> Callable[[], Request]:
+    names, cumulative = list(weights), []
+    total = 0
+    for name in names:
+        total += weights[name]
+        cumulative.append(total)
+    order_bodies = [json.dumps(order_body(toys, rng)).encode() for _ in range(200)]
+
+    def next_request() -> Request:
+        name = rng.choices(names, cum_weights=cumulative)[0]
+        if name == "list":
+            query = "page_size=24"
+            if rng.random() < 0.5:
+                query += f"&category={rng.choice(CATEGORIES)}"
+            if rng.random() < 0.3:
+                query += f"&sort={rng.choice(SORTS)}"
+            return "GET", f"/api/toys?{query}", None, name
+        if name == "get":
+            return "GET", f"/api/toys/{rng.choice(toys)['_id']}", None, name
+        if name == "search":
+            return "GET", f"/api/toys?q={rng.choice(SEARCH_TERMS).replace(' ', '+')}", None, name
+        return "POST", "/api/orders", rng.choice(order_bodies), name
+    return next_request
+
+
+# ----- In-process driver (mongomock) -----
+
+async def _asgi_call(app, method: str, target: str, body: Optional[bytes]) -> int:
+    path, _, query = target.partition("?")
+    headers = [(b"host", b"bench")]
+    if body is not None:
+        headers += [(b"content-type", b"application/json"), (b"content-length", str(len(body)).encode())]
+    scope = {"type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": method,
+             "scheme": "http", "path": path, "raw_path": path.encode(), "query_string": query.encode(),
+             "root_path": "", "headers": headers, "client": ("127.0.0.1", 50000), "server": ("bench", 80)}
+    sent = False
+    status = 500
+
+    async def receive():
+        nonlocal sent
+        if sent:
+            await asyncio.sleep(3600)
+        sent = True
+        return {"type": "http.request", "body": body or b"", "more_body": False}
+
+    async def send(message):
+        nonlocal status
+        if message["type"] == "http.response.start":
+            status = message["status"]
+
+    await app(scope, receive, send)
+    return status
+
+
+async def run_asgi_load(app, next_request: Callable[[], Request], concurrency: int, duration: float) -> LoadResult:
+    """run_load's counterpart that calls the ASGI app in process instead of over HTTP"""
+    result = LoadResult()
+    started = time.perf_counter()
+    deadline = started + duration
+
+    async def worker():
+        while time.perf_counter() < deadline:
+            method, path, body, label = next_request()
+            start = time.perf_counter()
+            status = await _asgi_call(app, method, path, body)
+            result.record(time.perf_counter() - start, status >= 400, label)
+
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    result.duration = time.perf_counter() - started
+    return result
+
+
+async def measure_allocations(app, next_request: Callable[[], Request], requests: int) -> dict:
+    """Peak bytes allocated while serving one request, and bytes still held after all of them"""
+    peaks = []
+    tracemalloc.start()
+    try:
+        retained_before = tracemalloc.get_traced_memory()[0]
+        for _ in range(requests):
+            method, path, body, _ = next_request()
+            current = tracemalloc.get_traced_memory()[0]
+            tracemalloc.reset_peak()
+            await _asgi_call(app, method, path, body)
+            peaks.append(tracemalloc.get_traced_memory()[1] - current)
+        retained = tracemalloc.get_traced_memory()[0] - retained_before
+    finally:
+        tracemalloc.stop()
+    peaks.sort()
+    return {"requests": requests, "peak_kb_p50": round(peaks[len(peaks) // 2] / 1024, 1),
+            "peak_kb_p99": round(peaks[min(len(peaks) - 1, int(len(peaks) * 0.99))] / 1024, 1),
+            "retained_kb": round(retained / 1024, 1)}
+
+
+# ----- Runs -----
+
+def _phases(weights: Dict[str, int]) -> Dict[str, Dict[str, int]]:
+    phases = {name: {name: 1} for name in weights}
+    if len(weights) > 1:
+        phases["mix"] = weights
+    return phases
+
+
+def run_mongomock(args, weights: Dict[str, int], toys: List[dict], orders: List[dict]) -> dict:
+    import main
+    from benchmarks import mockdb
+
+    mock = mockdb.install(args.database)
+    seed(mock.sync, toys, orders)
+    rng = random.Random(args.seed)
+    results = {}
+    for phase, phase_weights in _phases(weights).items():
+        next_request = request_factory(phase_weights, toys, rng)
+        asyncio.run(run_asgi_load(main.app, next_request, args.concurrency, min(1.0, args.duration)))  # warm up
+        load = asyncio.run(run_asgi_load(main.app, next_request, args.concurrency, args.duration))
+        results[phase] = {"latency": load.summaries(),
+                          "allocations": asyncio.run(measure_allocations(main.app, next_request, args.alloc_requests))}
+        print(phase, json.dumps(results[phase]["latency"]["all"]), file=sys.stderr)
+    return results
+
+
+def _rss_kb(pid: int) -> dict:
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            fields = dict(line.split(":", 1) for line in f if ":" in line)
+        return {"rss_kb": int(fields["VmRSS"].split()[0]), "peak_rss_kb": int(fields["VmHWM"].split()[0])}
+    except (OSError, KeyError, ValueError):
+        return {}
+
+
+def run_mongod(args, weights: Dict[str, int], toys: List[dict], orders: List[dict]) -> dict:
+    from pymongo import MongoClient
+
+    from indexes import sync_indexes
+
+    url = os.getenv("DATABASE_URL", "mongodb://localhost:27017")
+    client = MongoClient(url)
+    sync_db = client[args.database]
+    seed(sync_db, toys, orders)
+    sync_indexes(sync_db)
+
+    rng = random.Random(args.seed)
+    results = {}
+    proc = start_server("main:app", args.port, env={"DATABASE_URL": url, "DATABASE_NAME": args.database})
+    try:
+        for phase, phase_weights in _phases(weights).items():
+            next_request = request_factory(phase_weights, toys, rng)
+            asyncio.run(run_load("127.0.0.1", args.port, next_request, args.concurrency, min(2.0, args.duration)))
+            load = asyncio.run(run_load("127.0.0.1", args.port, next_request, args.concurrency, args.duration))
+            results[phase] = {"latency": load.summaries(), "allocations": _rss_kb(proc.pid)}
+            print(phase, json.dumps(results[phase]["latency"]["all"]), file=sys.stderr)
+    finally:
+        stop_server(proc)
+        client.drop_database(args.database)
+    return results
+
+
+def _commit() -> Optional[str]:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=REPO_ROOT, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(old_path: str, new_path: str):
+    with open(old_path) as f:
+        old = json.load(f)
+    with open(new_path) as f:
+        new = json.load(f)
+    print(f"{'phase/label':<20} {'rps':>22} {'p50 ms':>18} {'p99 ms':>18}")
+    for phase, entry in new["results"].items():
+        for label, summary in entry["latency"].items():
+            before = old["results"].get(phase, {}).get("latency", {}).get(label)
+            if before is None:
+                continue
+            cells = []
+            for key in ("rps", "p50_ms", "p99_ms"):
+                a, b = before[key], summary[key]
+                change = f"{(b / a - 1) * 100:+.1f}%" if a else "n/a"
+                cells.append(f"{a:>7} -> {b:<7} {change:>7}")
+            print(f"{phase + '/' + label:<20} " + " ".join(cells))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--backend", choices=("mongod", "mongomock"), default="mongod")
+    parser.add_argument("--database", default="toybench_suite")
+    parser.add_argument("--toys", type=int, default=10000)
+    parser.add_argument("--orders", type=int, default=5000)
+    parser.add_argument("--mix", default=None, help=f"scenario=weight,... (default {DEFAULT_MIX})")
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--duration", type=float, default=10.0)
+    parser.add_argument("--alloc-requests", type=int, default=500)
+    parser.add_argument("--port", type=int, default=8767)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", help="results file (default benchmarks/results/<time>-<commit>-<backend>.json)")
+    parser.add_argument("--compare", nargs=2, metavar=("OLD", "NEW"), help="compare two results files and exit")
+    args = parser.parse_args()
+
+    if args.compare:
+        return compare(*args.compare)
+
+    mix = args.mix or (DEFAULT_MIX if args.backend == "mongod" else DEFAULT_MIX.replace(",search=10", ""))
+    weights = parse_mix(mix)
+    rng = random.Random(args.seed)
+    toys = make_toys(args.toys, rng)
+    orders = make_orders(args.orders, toys, rng)
+
+    run = run_mongod if args.backend == "mongod" else run_mongomock
+    started = datetime.now(timezone.utc)
+    results = run(args, weights, toys, orders)
+    report = {
+        "meta": {
+            "commit": _commit(), "started_at": started.isoformat(), "backend": args.backend,
+            "python": platform.python_version(), "platform": platform.platform(), "cpus": os.cpu_count(),
+            "toys": args.toys, "orders": args.orders, "mix": weights, "concurrency": args.concurrency,
+            "duration": args.duration, "seed": args.seed,
+        },
+        "results": results,
+    }
+    output = args.output or os.path.join(
+        REPO_ROOT, "benchmarks", "results",
+        f"{started.strftime('%Y%m%dT%H%M%S')}-{report['meta']['commit'] or 'nogit'}-{args.backend}.json")
+    os.makedirs(os.path.dirname(output) or ".", exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(json.dumps(report, indent=2))
+    print(f"Results written to {output}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,44 @@
+"""
+Baseline app with the original sync handlers
+
+Mirrors the toy/order endpoints as they were before the Motor migration
+(plain ``def`` handlers calling blocking pymongo helpers, so every request
+occupies a Starlette threadpool slot). Used only as the comparison target
+in ``bench_async``.
+"""
+
+from bson import ObjectId
+from fastapi import FastAPI, HTTPException
+from typing import Optional
+
+from database import db, create_document, get_documents
+from main import CreateOrder
+from schemas import Order
+
+app = FastAPI(title="Toy Store API (sync baseline)")
+
+
+@app.get("/api/toys")
+def list_toys(category: Optional[str] = None):
+    filter_dict = {}
+    if category:
+        filter_dict["category"] = category
+    toys = get_documents("toy", filter_dict=filter_dict, limit=100)
+    for t in toys:
+        t["_id"] = str(t.get("_id"))
+    return toys
+
+
+@app.get("/api/toys/{toy_id}")
+def get_toy(toy_id: str):
+    doc = db["toy"].find_one({"_id": ObjectId(toy_id)})
+    if not doc:
+        raise HTTPException(status_code=404, detail="Toy not found")
+    doc["_id"] = str(doc["_id"])
+    return doc
+
+
+@app.post("/api/orders", status_code=201)
+def create_order(payload: CreateOrder):
+    order = Order(**payload.model_dump())
+    return {"order_id": create_document("order", order)}
@@ -0,0 +1,98 @@
+"""
+In-Process Caching
+
+A small bounded LRU cache with per-entry TTL. It is per process: with several
+workers each keeps its own copy, so writes made through another worker are
+only picked up once the entry expires.
+"""
+
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Hashable, Optional
+
+_MISSING = object()
+
+
+class TTLCache:
+    """LRU cache whose entries also expire ``ttl`` seconds after being stored.
+
+    ``generation(key)`` increases whenever that key is invalidated. A reader
+    that fetched a value before a concurrent write can pass the generation it
+    observed to ``set`` so the stale value is dropped instead of cached.
+    Generations are kept per hash slot rather than per key, so memory stays
+    bounded; a write to an unrelated key only drops a concurrent fill when
+    both hash to the same one of GENERATION_SLOTS slots.
+    """
+
+    GENERATION_SLOTS = 4096
+
+    def __init__(self, maxsize: int = 1024, ttl: float = 60.0, clock=time.monotonic):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._clock = clock
+        self._data: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._generations = [0] * self.GENERATION_SLOTS
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def __len__(self):
+        return len(self._data)
+
+    def generation(self, key: Hashable) -> int:
+        return self._generations[hash(key) % self.GENERATION_SLOTS]
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        with self._lock:
+            entry = self._data.get(key, _MISSING)
+            if entry is _MISSING:
+                self.misses += 1
+                return default
+            value, expires_at = entry
+            if expires_at <= self._clock():
+                del self._data[key]
+                self.expirations += 1
+                self.misses += 1
+                return default
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key: Hashable, value: Any, generation: Optional[int] = None):
+        if self.maxsize <= 0:
+            return
+        with self._lock:
+            if generation is not None and generation != self.generation(key):
+                return
+            self._data[key] = (value, self._clock() + self.ttl)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, key: Hashable):
+        with self._lock:
+            self._generations[hash(key) % self.GENERATION_SLOTS] += 1
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._generations = [generation + 1 for generation in self._generations]
+            self._data.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._data),
+                "maxsize": self.maxsize,
+                "ttl_seconds": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+            }
@@ -0,0 +1,247 @@
+"""
+In-Memory Catalog Snapshot
+
+With CATALOG_MODE=memory the whole toy collection is loaded at startup and
+GET /api/toys (browsing, not ?q= search) and GET /api/toys/{toy_id} are
+served from it without touching MongoDB.
+
+The snapshot is kept fresh by a background task:
+- a change stream when the deployment supports one (replica set / Atlas);
+- otherwise a poll for toys with updated_at at or after the newest seen
+  minus CATALOG_POLL_OVERLAP_SECONDS, every CATALOG_POLL_SECONDS, plus a
+  full reload every CATALOG_FULL_RELOAD_SECONDS to pick up deletions made
+  outside this process. The overlap covers the two clocks stamping
+  updated_at (the app's in database.py, the server's $$NOW in inventory.py)
+  and writes that commit after a later-stamped one.
+Writes made through database.py in this process wake the poller at once.
+If the change stream breaks (connection lost, server unreachable) it is
+reopened with backoff, reloading the snapshot each time.
+"""
+
+import asyncio
+import bisect
+import logging
+import os
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+
+from pymongo.errors import OperationFailure, PyMongoError
+
+import database
+
+logger = logging.getLogger(__name__)
+
+# Ceiling for the delay between attempts to reopen a broken change stream
+MAX_RETRY_SECONDS = 60.0
+
+
+@dataclass(frozen=True)
+class CatalogSettings:
+    mode: str = "database"
+    poll_seconds: float = 2.0
+    full_reload_seconds: float = 300.0
+    change_streams: bool = True
+    overlap_seconds: float = 5.0
+
+    @classmethod
+    def from_env(cls) -> "CatalogSettings":
+        return cls(
+            mode=os.getenv("CATALOG_MODE") or cls.mode,
+            poll_seconds=float(os.getenv("CATALOG_POLL_SECONDS") or cls.poll_seconds),
+            full_reload_seconds=float(os.getenv("CATALOG_FULL_RELOAD_SECONDS") or cls.full_reload_seconds),
+            change_streams=(os.getenv("CATALOG_CHANGE_STREAMS") or "1").lower() not in ("0", "false", "no", "off"),
+            overlap_seconds=float(os.getenv("CATALOG_POLL_OVERLAP_SECONDS") or cls.overlap_seconds),
+        )
+
+    @property
+    def enabled(self) -> bool:
+        return self.mode == "memory"
+
+
+class CatalogSnapshot:
+    """Toys keyed by _id (hex string) plus _id-ordered indexes, overall and
+    per category. ObjectId hex strings sort in the same order as the ids, so
+    keyset pagination works exactly like the database path.
+
+    Only the event loop thread mutates the snapshot.
+    """
+
+    def __init__(self, collection_name: str, settings: CatalogSettings):
+        self.collection_name = collection_name
+        self.settings = settings
+        self.ready = False
+        self._by_id: Dict[str, dict] = {}
+        self._ids: List[str] = []
+        self._by_category: Dict[str, List[str]] = {}
+        self._high_water: Optional[datetime] = None
+        self._wake = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+        self._loop = None
+        self.source = None
+        self.reloads = 0
+        self.updates = 0
+
+    def __len__(self):
+        return len(self._by_id)
+
+    # ----- reads -----
+
+    def get(self, toy_id: str) -> Optional[dict]:
+        return self._by_id.get(toy_id)
+
+    def page(self, category: Optional[str], after_id: Optional[str], limit: int,
+             projection: Optional[dict] = None) -> List[dict]:
+        """Up to ``limit`` toys after ``after_id`` in _id order"""
+        ids = self._by_category.get(category, []) if category else self._ids
+        start = bisect.bisect_right(ids, after_id) if after_id else 0
+        docs = [self._by_id[toy_id] for toy_id in ids[start:start + limit]]
+        if projection:
+            fields = set(projection) | {"_id"}
+            docs = [{k: v for k, v in doc.items() if k in fields} for doc in docs]
+        return docs
+
+    def stats(self) -> dict:
+        return {
+            "mode": self.settings.mode,
+            "ready": self.ready,
+            "source": self.source,
+            "toys": len(self._by_id),
+            "categories": len(self._by_category),
+            "high_water": self._high_water,
+            "reloads": self.reloads,
+            "updates": self.updates,
+        }
+
+    # ----- mutation -----
+
+    def _index(self, ids: List[str], toy_id: str):
+        i = bisect.bisect_left(ids, toy_id)
+        if i == len(ids) or ids[i] != toy_id:
+            ids.insert(i, toy_id)
+
+    def _unindex(self, ids: List[str], toy_id: str):
+        i = bisect.bisect_left(ids, toy_id)
+        if i < len(ids) and ids[i] == toy_id:
+            del ids[i]
+
+    def upsert(self, doc: dict):
+        toy_id = str(doc["_id"])
+        previous = self._by_id.get(toy_id)
+        if previous is not None and previous.get("category") != doc.get("category"):
+            self._unindex(self._by_category.get(previous.get("category"), []), toy_id)
+        self._by_id[toy_id] = doc
+        self._index(self._ids, toy_id)
+        self._index(self._by_category.setdefault(doc.get("category"), []), toy_id)
+        updated_at = doc.get("updated_at")
+        if updated_at is not None and (self._high_water is None or updated_at > self._high_water):
+            self._high_water = updated_at
+        self.updates += 1
+
+    def remove(self, toy_id: str):
+        doc = self._by_id.pop(toy_id, None)
+        if doc is None:
+            return
+        self._unindex(self._ids, toy_id)
+        self._unindex(self._by_category.get(doc.get("category"), []), toy_id)
+
+    async def load(self):
+        """Replace the snapshot with a full read of the collection"""
+        docs = await database.async_db[self.collection_name].find({}).sort("_id", 1).to_list(length=None)
+        by_id, by_category, high_water = {}, {}, None
+        for doc in docs:
+            toy_id = str(doc["_id"])
+            by_id[toy_id] = doc
+            by_category.setdefault(doc.get("category"), []).append(toy_id)
+            updated_at = doc.get("updated_at")
+            if updated_at is not None and (high_water is None or updated_at > high_water):
+                high_water = updated_at
+        # Already in _id order thanks to the sort
+        self._by_id, self._ids, self._by_category = by_id, list(by_id), by_category
+        self._high_water = high_water
+        self.reloads += 1
+        self.ready = True
+
+    # ----- refresh -----
+
+    def on_write(self, collection_name: str, operation: str, doc_ids: list):
+        """database.py write listener: apply deletes now, poll for the rest"""
+        if collection_name != self.collection_name or self._loop is None:
+            return
+        if operation == "delete":
+            for toy_id in doc_ids:
+                self._loop.call_soon_threadsafe(self.remove, toy_id)
+        self._loop.call_soon_threadsafe(self._wake.set)
+
+    def start(self):
+        self._loop = asyncio.get_running_loop()
+        database.add_write_listener(self.on_write)
+        self._task = asyncio.create_task(self._refresh())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _refresh(self):
+        delay = self.settings.poll_seconds
+        while self.settings.change_streams:
+            try:
+                await self._watch()
+            except OperationFailure as e:
+                logger.info("Change streams unavailable (%s), polling updated_at instead", e)
+                break
+            except PyMongoError as e:
+                if self.source == "change_stream":
+                    # The stream was open: back off from the start again
+                    delay = self.settings.poll_seconds
+                self.source = None
+                logger.warning("Catalog change stream failed (%s), reopening in %.1fs", e, delay)
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, MAX_RETRY_SECONDS)
+        await self._poll()
+
+    async def _watch(self):
+        collection = database.async_db[self.collection_name]
+        async with collection.watch(full_document="updateLookup") as stream:
+            # Catch anything written between the initial load and the stream opening
+            await self.load()
+            self.source = "change_stream"
+            async for change in stream:
+                operation = change["operationType"]
+                if operation in ("insert", "update", "replace") and change.get("fullDocument"):
+                    self.upsert(change["fullDocument"])
+                elif operation == "delete":
+                    self.remove(str(change["documentKey"]["_id"]))
+                elif operation in ("drop", "rename", "invalidate"):
+                    await self.load()
+
+    async def _poll(self):
+        self.source = "poll"
+        loop = asyncio.get_running_loop()
+        next_reload = loop.time() + self.settings.full_reload_seconds
+        while True:
+            try:
+                await asyncio.wait_for(self._wake.wait(), timeout=self.settings.poll_seconds)
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+            try:
+                if loop.time() >= next_reload:
+                    await self.load()
+                    next_reload = loop.time() + self.settings.full_reload_seconds
+                    continue
+                # >= and an overlap: writes can share a timestamp, come from
+                # another clock, or commit behind the newest one seen
+                query = {}
+                if self._high_water is not None:
+                    since = self._high_water - timedelta(seconds=self.settings.overlap_seconds)
+                    query = {"updated_at": {"$gte": since}}
+                async for doc in database.async_db[self.collection_name].find(query):
+                    self.upsert(doc)
+            except PyMongoError as e:
+                logger.warning("Catalog refresh failed: %s", e)
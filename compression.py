@@ -0,0 +1,256 @@
+"""
+Response Compression
+
+ASGI middleware that compresses JSON, NDJSON and text responses with brotli
+(when the ``brotli`` package is installed and the client accepts it) or gzip.
+Bodies smaller than COMPRESSION_MIN_SIZE bytes go out as they are: below
+about a kilobyte the framing overhead and CPU outweigh the saving.
+
+Catalog responses carry an ETag (see http_cache), so identical bodies
+are recognised without hashing them again: the compressed bytes are kept in
+an LRU keyed by (ETag, encoding) and repeat hits skip the compressor. Bodies
+marked ``no-store`` or ``private`` are never kept.
+
+Streamed responses (the NDJSON exports) are compressed chunk by chunk and
+flushed after each one, so clients still receive rows as they are produced.
+
+Compressing turns a strong ETag into a weak one, since the bytes on the wire
+differ from the identity body; If-None-Match uses the weak comparison, so
+conditional requests still get their 304. Catalog ETags are weak to begin
+with, so a resource keeps one validator whether it is sent compressed,
+uncompressed or as a 304. 304s also carry Vary: Accept-Encoding, as the 200
+they stand for would.
+"""
+
+import gzip
+import os
+import zlib
+from dataclasses import dataclass
+from typing import Optional
+
+from starlette.datastructures import Headers, MutableHeaders
+
+from cache import TTLCache
+
+try:
+    import brotli
+except ImportError:  # gzip only
+    brotli = None
+
+COMPRESSIBLE_TYPES = ("application/json", "application/x-ndjson", "text/")
+
+
+@dataclass(frozen=True)
+class CompressionSettings:
+    minimum_size: int = 1024
+    gzip_level: int = 6
+    brotli_quality: int = 4
+    cache_size: int = 2048
+    cache_ttl: float = 300.0
+
+    @classmethod
+    def from_env(cls) -> "CompressionSettings":
+        return cls(
+            minimum_size=int(os.getenv("COMPRESSION_MIN_SIZE") or cls.minimum_size),
+            gzip_level=int(os.getenv("COMPRESSION_GZIP_LEVEL") or cls.gzip_level),
+            brotli_quality=int(os.getenv("COMPRESSION_BROTLI_QUALITY") or cls.brotli_quality),
+            cache_size=int(os.getenv("COMPRESSION_CACHE_SIZE") or cls.cache_size),
+            cache_ttl=float(os.getenv("COMPRESSION_CACHE_TTL") or cls.cache_ttl),
+        )
+
+
+def _accepted(accept_encoding: str) -> dict:
+    """Accept-Encoding as {coding: q}"""
+    accepted = {}
+    for part in accept_encoding.split(","):
+        coding, _, params = part.strip().partition(";")
+        q = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        if coding:
+            accepted[coding.lower()] = q
+    return accepted
+
+
+class ResponseCompressor:
+    """Encoders, the precompressed body cache and counters shared by the middleware"""
+
+    def __init__(self, settings: CompressionSettings):
+        self.settings = settings
+        self.encodings = ("br", "gzip") if brotli is not None else ("gzip",)
+        self.cache = TTLCache(maxsize=settings.cache_size, ttl=settings.cache_ttl)
+        self.responses = 0
+        self.bytes_in = 0
+        self.bytes_out = 0
+
+    def choose(self, accept_encoding: str) -> Optional[str]:
+        """Best supported encoding the client accepts, preferring brotli on ties"""
+        if not accept_encoding:
+            return None
+        accepted = _accepted(accept_encoding)
+        wildcard = accepted.get("*", 0.0)
+        best, best_q = None, 0.0
+        for encoding in self.encodings:
+            q = accepted.get(encoding, wildcard)
+            if q > best_q:
+                best, best_q = encoding, q
+        return best
+
+    def compress(self, body: bytes, encoding: str) -> bytes:
+        if encoding == "br":
+            return brotli.compress(body, quality=self.settings.brotli_quality)
+        # mtime=0 keeps the output identical for identical input
+        return gzip.compress(body, compresslevel=self.settings.gzip_level, mtime=0)
+
+    def compress_cached(self, body: bytes, encoding: str, etag: Optional[str]) -> bytes:
+        """Compress ``body``, reusing earlier output for the same ETag when one is given"""
+        if etag is None:
+            return self.compress(body, encoding)
+        key = (etag, encoding)
+        compressed = self.cache.get(key)
+        if compressed is None:
+            compressed = self.compress(body, encoding)
+            self.cache.set(key, compressed)
+        return compressed
+
+    def stream_encoder(self, encoding: str) -> "_StreamEncoder":
+        return _StreamEncoder(encoding, self.settings)
+
+    def record(self, size_in: int, size_out: int):
+        self.responses += 1
+        self.bytes_in += size_in
+        self.bytes_out += size_out
+
+    def stats(self) -> dict:
+        return {
+            "encodings": list(self.encodings),
+            "minimum_size": self.settings.minimum_size,
+            "responses_compressed": self.responses,
+            "bytes_in": self.bytes_in,
+            "bytes_out": self.bytes_out,
+            "ratio": round(self.bytes_out / self.bytes_in, 4) if self.bytes_in else None,
+            "cache": self.cache.stats(),
+        }
+
+
+class _StreamEncoder:
+    def __init__(self, encoding: str, settings: CompressionSettings):
+        self.encoding = encoding
+        if encoding == "br":
+            self._compressor = brotli.Compressor(quality=settings.brotli_quality)
+        else:
+            # wbits=31: zlib deflate with a gzip header and trailer
+            self._compressor = zlib.compressobj(settings.gzip_level, zlib.DEFLATED, 31)
+
+    def chunk(self, data: bytes) -> bytes:
+        if self.encoding == "br":
+            return self._compressor.process(data) + self._compressor.flush()
+        return self._compressor.compress(data) + self._compressor.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self) -> bytes:
+        if self.encoding == "br":
+            return self._compressor.finish()
+        return self._compressor.flush()
+
+
+def _cacheable(headers: Headers) -> bool:
+    cache_control = headers.get("cache-control", "").lower()
+    return "no-store" not in cache_control and "private" not in cache_control
+
+
+class CompressionMiddleware:
+    def __init__(self, app, compressor: ResponseCompressor):
+        self.app = app
+        self.compressor = compressor
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        encoding = self.compressor.choose(Headers(scope=scope).get("accept-encoding", ""))
+        await self.app(scope, receive, _CompressingSend(send, self.compressor, encoding))
+
+
+class _CompressingSend:
+    """``send`` wrapper for one response: holds the start message until the
+    first body chunk shows whether the body is complete or streamed"""
+
+    def __init__(self, send, compressor: ResponseCompressor, encoding: Optional[str]):
+        self.send = send
+        self.compressor = compressor
+        self.encoding = encoding
+        self.start = None
+        self.encoder = None
+        self.passthrough = False
+        self.size_in = 0
+        self.size_out = 0
+
+    async def __call__(self, message):
+        if message["type"] == "http.response.start":
+            self.start = message
+            return
+        if message["type"] != "http.response.body":
+            return await self.send(message)
+        if self.start is not None:
+            await self._first_chunk(message)
+        elif self.passthrough:
+            await self.send(message)
+        else:
+            await self._next_chunk(message)
+
+    async def _first_chunk(self, message):
+        start, self.start = self.start, None
+        headers = MutableHeaders(scope=start)
+        body = message.get("body", b"")
+        more_body = message.get("more_body", False)
+
+        content_type = headers.get("content-type", "")
+        if start["status"] == 304:
+            headers.add_vary_header("Accept-Encoding")
+        if (start["status"] < 200 or start["status"] in (204, 304) or "content-encoding" in headers
+                or not content_type.startswith(COMPRESSIBLE_TYPES)):
+            self.passthrough = True
+            await self.send(start)
+            return await self.send(message)
+
+        headers.add_vary_header("Accept-Encoding")
+        declared = headers.get("content-length")
+        too_small = len(body) < self.compressor.settings.minimum_size if not more_body else (
+            declared is not None and int(declared) < self.compressor.settings.minimum_size)
+        if self.encoding is None or too_small:
+            self.passthrough = True
+            await self.send(start)
+            return await self.send(message)
+
+        headers["content-encoding"] = self.encoding
+        etag = headers.get("etag")
+        if etag and not etag.startswith("W/"):
+            headers["etag"] = "W/" + etag
+        if not more_body:
+            compressed = self.compressor.compress_cached(
+                body, self.encoding, etag if etag and _cacheable(headers) else None)
+            self.compressor.record(len(body), len(compressed))
+            headers["content-length"] = str(len(compressed))
+            await self.send(start)
+            return await self.send({"type": "http.response.body", "body": compressed})
+
+        if "content-length" in headers:
+            del headers["content-length"]
+        self.encoder = self.compressor.stream_encoder(self.encoding)
+        await self.send(start)
+        await self._next_chunk(message)
+
+    async def _next_chunk(self, message):
+        body = message.get("body", b"")
+        more_body = message.get("more_body", False)
+        out = self.encoder.chunk(body) if body else b""
+        if not more_body:
+            out += self.encoder.finish()
+        self.size_in += len(body)
+        self.size_out += len(out)
+        if not more_body:
+            self.compressor.record(self.size_in, self.size_out)
+        await self.send({"type": "http.response.body", "body": out, "more_body": more_body})
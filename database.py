@@ -3,53 +3,509 @@ Database Helper Functions
 
 MongoDB helper functions ready to use in your backend code.
 Import and use these functions in your API endpoints for database operations.
+
+Two flavours are provided:
+- Sync helpers (``create_document``, ``get_documents``) built on pymongo, for
+  scripts and anything already running in a worker thread.
+- Async helpers (``create_document_async``, ``get_documents_async``) built on
+  Motor, for ``async def`` FastAPI handlers so a slow Mongo round-trip never
+  ties up a threadpool slot.
 """
 
-from pymongo import MongoClient
+from pymongo import MongoClient, WriteConcern, monitoring
+from pymongo.errors import BulkWriteError
+from motor.motor_asyncio import AsyncIOMotorClient
+from dataclasses import dataclass, asdict
 from datetime import datetime, timezone
+import asyncio
 import os
+import threading
+import time
 from dotenv import load_dotenv
-from typing import Union
+from itertools import islice
+from typing import AsyncIterator, Iterable, Iterator, Optional, Union
 from pydantic import BaseModel
+from bson import ObjectId
+
+from cache import TTLCache
+from metrics import timed_operation
+from query_log import QueryLogSettings, QueryMonitor
 
 # Load environment variables from .env file
 load_dotenv()
 
+def _env_int(name: str, default: Optional[int]) -> Optional[int]:
+    value = os.getenv(name)
+    return int(value) if value not in (None, "") else default
+
+def _env_bool(name: str, default: bool) -> bool:
+    value = os.getenv(name)
+    if value in (None, ""):
+        return default
+    return value.strip().lower() in ("1", "true", "yes", "on")
+
+@dataclass(frozen=True)
+class MongoSettings:
+    """Client and connection pool settings, read from MONGO_* environment variables.
+
+    Pools are per process, so with N uvicorn workers the server sees up to
+    N * max_pool_size connections per client.
+    """
+    max_pool_size: int = 100
+    min_pool_size: int = 0
+    max_idle_time_ms: Optional[int] = None
+    wait_queue_timeout_ms: Optional[int] = None
+    server_selection_timeout_ms: int = 30000
+    connect_timeout_ms: int = 20000
+    socket_timeout_ms: Optional[int] = None
+    compressors: Optional[str] = None
+    app_name: str = "toy-store-api"
+    sync_indexes_on_startup: bool = True
+
+    @classmethod
+    def from_env(cls) -> "MongoSettings":
+        return cls(
+            max_pool_size=_env_int("MONGO_MAX_POOL_SIZE", cls.max_pool_size),
+            min_pool_size=_env_int("MONGO_MIN_POOL_SIZE", cls.min_pool_size),
+            max_idle_time_ms=_env_int("MONGO_MAX_IDLE_TIME_MS", cls.max_idle_time_ms),
+            wait_queue_timeout_ms=_env_int("MONGO_WAIT_QUEUE_TIMEOUT_MS", cls.wait_queue_timeout_ms),
+            server_selection_timeout_ms=_env_int("MONGO_SERVER_SELECTION_TIMEOUT_MS", cls.server_selection_timeout_ms),
+            connect_timeout_ms=_env_int("MONGO_CONNECT_TIMEOUT_MS", cls.connect_timeout_ms),
+            socket_timeout_ms=_env_int("MONGO_SOCKET_TIMEOUT_MS", cls.socket_timeout_ms),
+            compressors=os.getenv("MONGO_COMPRESSORS") or cls.compressors,
+            app_name=os.getenv("MONGO_APP_NAME") or cls.app_name,
+            sync_indexes_on_startup=_env_bool("MONGO_SYNC_INDEXES", cls.sync_indexes_on_startup),
+        )
+
+    def client_kwargs(self) -> dict:
+        """Keyword arguments for MongoClient / AsyncIOMotorClient"""
+        kwargs = {
+            "maxPoolSize": self.max_pool_size,
+            "minPoolSize": self.min_pool_size,
+            "serverSelectionTimeoutMS": self.server_selection_timeout_ms,
+            "connectTimeoutMS": self.connect_timeout_ms,
+            "appname": self.app_name,
+        }
+        if self.max_idle_time_ms is not None:
+            kwargs["maxIdleTimeMS"] = self.max_idle_time_ms
+        if self.wait_queue_timeout_ms is not None:
+            kwargs["waitQueueTimeoutMS"] = self.wait_queue_timeout_ms
+        if self.socket_timeout_ms is not None:
+            kwargs["socketTimeoutMS"] = self.socket_timeout_ms
+        if self.compressors:
+            kwargs["compressors"] = self.compressors
+        return kwargs
+
+class PoolStats(monitoring.ConnectionPoolListener):
+    """Live connection pool counters for one client.
+
+    pymongo emits checkout-started and checked-out events on the thread doing
+    the checkout (Motor included, it runs pymongo in worker threads), so the
+    wait time is measured with a thread-local start timestamp.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self.open = 0
+        self.checked_out = 0
+        self.waiters = 0
+        self.checkouts = 0
+        self.checkout_failures = 0
+        self.wait_time_total = 0.0
+        self.wait_time_max = 0.0
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                "open": self.open,
+                "checked_out": self.checked_out,
+                "waiters": self.waiters,
+                "checkouts": self.checkouts,
+                "checkout_failures": self.checkout_failures,
+                "wait_time_avg_ms": round(self.wait_time_total / self.checkouts * 1000, 3) if self.checkouts else 0.0,
+                "wait_time_max_ms": round(self.wait_time_max * 1000, 3),
+            }
+
+    def connection_created(self, event):
+        with self._lock:
+            self.open += 1
+
+    def connection_closed(self, event):
+        with self._lock:
+            self.open -= 1
+
+    def connection_check_out_started(self, event):
+        self._local.started = time.perf_counter()
+        with self._lock:
+            self.waiters += 1
+
+    def connection_checked_out(self, event):
+        waited = time.perf_counter() - getattr(self._local, "started", time.perf_counter())
+        with self._lock:
+            self.waiters -= 1
+            self.checked_out += 1
+            self.checkouts += 1
+            self.wait_time_total += waited
+            self.wait_time_max = max(self.wait_time_max, waited)
+
+    def connection_check_out_failed(self, event):
+        with self._lock:
+            self.waiters -= 1
+            self.checkout_failures += 1
+
+    def connection_checked_in(self, event):
+        with self._lock:
+            self.checked_out -= 1
+
+    # Remaining pool events carry nothing we report on
+    def pool_created(self, event): pass
+    def pool_ready(self, event): pass
+    def pool_cleared(self, event): pass
+    def pool_closed(self, event): pass
+    def connection_ready(self, event): pass
+
+settings = MongoSettings.from_env()
+pool_stats = {"sync": PoolStats(), "async": PoolStats()}
+# Shared by both clients: shapes are aggregated whichever client ran them
+query_monitor = QueryMonitor(QueryLogSettings.from_env())
+
 _client = None
 db = None
 
+_async_client = None
+async_db = None
+
 database_url = os.getenv("DATABASE_URL")
 database_name = os.getenv("DATABASE_NAME")
 
 if database_url and database_name:
-    _client = MongoClient(database_url)
+    _client = MongoClient(database_url, event_listeners=[pool_stats["sync"], query_monitor], **settings.client_kwargs())
     db = _client[database_name]
+    # Motor binds to the running event loop lazily, on first use
+    _async_client = AsyncIOMotorClient(database_url, event_listeners=[pool_stats["async"], query_monitor], **settings.client_kwargs())
+    async_db = _async_client[database_name]
 
-# Helper functions for common database operations
-def create_document(collection_name: str, data: Union[BaseModel, dict]):
-    """Insert a single document with timestamp"""
-    if db is None:
-        raise Exception("Database not available. Check DATABASE_URL and DATABASE_NAME environment variables.")
+def get_pool_stats() -> dict:
+    """Pool settings and live per-client counters, for sizing pools per worker"""
+    return {
+        "pid": os.getpid(),
+        "settings": asdict(settings),
+        "pools": {name: stats.snapshot() for name, stats in pool_stats.items()},
+    }
+
+# Read-through cache for single-document lookups by _id (get_document*).
+# Per process; writes through these helpers invalidate, TTL bounds staleness
+# for writes made elsewhere. DOCUMENT_CACHE_SIZE=0 disables it.
+document_cache = TTLCache(
+    maxsize=_env_int("DOCUMENT_CACHE_SIZE", 10000),
+    ttl=float(os.getenv("DOCUMENT_CACHE_TTL", "60")),
+)
+
+# Callbacks run after every write made through these helpers, as
+# callback(collection_name, operation, doc_ids) with operation one of
+# "insert", "update" or "delete". They run on whichever thread made the write.
+_write_listeners = []
+
+def add_write_listener(callback):
+    _write_listeners.append(callback)
+
+def notify_write(collection_name: str, operation: str, doc_ids: list):
+    """Invalidate cached copies of written documents and tell the listeners"""
+    for doc_id in doc_ids:
+        document_cache.invalidate((collection_name, str(doc_id)))
+    for callback in _write_listeners:
+        callback(collection_name, operation, [str(doc_id) for doc_id in doc_ids])
+
+async def prewarm_async_pool():
+    """Open min_pool_size connections up front instead of on the first requests"""
+    if async_db is None or settings.min_pool_size <= 0:
+        return
+    # Concurrent pings each need their own connection, which fills the pool
+    await asyncio.gather(*(async_db.command("ping") for _ in range(settings.min_pool_size)))
+
+def _prepare_document(data: Union[BaseModel, dict]) -> dict:
+    """Convert input to a dict and stamp created_at/updated_at.
 
+    A created_at already present is kept (imports and synthetic seeds carry
+    historical dates); updated_at is always the time of this write.
+    """
     # Convert Pydantic model to dict if needed
     if isinstance(data, BaseModel):
         data_dict = data.model_dump()
     else:
         data_dict = data.copy()
 
-    data_dict['created_at'] = datetime.now(timezone.utc)
+    now = datetime.now(timezone.utc)
+    data_dict.setdefault('created_at', now)
+    data_dict['updated_at'] = now
+    return data_dict
+
+def _object_id(doc_id: Union[str, ObjectId]) -> ObjectId:
+    return doc_id if isinstance(doc_id, ObjectId) else ObjectId(doc_id)
+
+def _update_spec(data: Union[BaseModel, dict]) -> dict:
+    """$set spec for a partial update, stamping updated_at"""
+    if isinstance(data, BaseModel):
+        data_dict = data.model_dump(exclude_unset=True)
+    else:
+        data_dict = dict(data)
+    data_dict.pop("_id", None)
+    data_dict.pop("created_at", None)
     data_dict['updated_at'] = datetime.now(timezone.utc)
+    return {"$set": data_dict}
 
-    result = db[collection_name].insert_one(data_dict)
+# Helper functions for common database operations
+@timed_operation
+def create_document(collection_name: str, data: Union[BaseModel, dict]):
+    """Insert a single document with timestamp"""
+    if db is None:
+        raise Exception("Database not available. Check DATABASE_URL and DATABASE_NAME environment variables.")
+
+    result = db[collection_name].insert_one(_prepare_document(data))
+    notify_write(collection_name, "insert", [result.inserted_id])
     return str(result.inserted_id)
 
-def get_documents(collection_name: str, filter_dict: dict = None, limit: int = None):
-    """Get documents from collection"""
+def _batches(documents: Iterable, batch_size: int):
+    iterator = iter(documents)
+    while True:
+        batch = [_prepare_document(d) for d in islice(iterator, batch_size)]
+        if not batch:
+            return
+        yield batch
+
+def _bulk_result(result: dict, offset: int, batch: list, error: Optional[BulkWriteError] = None):
+    """Fold one insert_many batch into the running create_documents result"""
+    failed = set()
+    if error is not None:
+        for write_error in error.details.get("writeErrors", []):
+            failed.add(write_error["index"])
+            result["errors"].append({"index": offset + write_error["index"], "error": write_error.get("errmsg")})
+    # insert_many assigns _id client-side, so ids are known even for partial failures
+    result["inserted_ids"].extend(str(d["_id"]) for i, d in enumerate(batch) if i not in failed)
+    result["inserted"] = len(result["inserted_ids"])
+
+@timed_operation
+def create_documents(collection_name: str, documents: Iterable[Union[BaseModel, dict]], batch_size: int = 1000,
+                     write_concern: Optional[WriteConcern] = None) -> dict:
+    """Insert many documents with unordered bulk writes, batch_size per round-trip.
+
+    A failing document does not stop the rest; failures are reported as
+    {"index": position in ``documents``, "error": message}. ``write_concern``
+    overrides the client default for these inserts.
+    """
+    if db is None:
+        raise Exception("Database not available. Check DATABASE_URL and DATABASE_NAME environment variables.")
+
+    collection = db[collection_name]
+    if write_concern is not None:
+        collection = collection.with_options(write_concern=write_concern)
+    result = {"inserted": 0, "inserted_ids": [], "errors": []}
+    offset = 0
+    for batch in _batches(documents, batch_size):
+        try:
+            collection.insert_many(batch, ordered=False)
+            _bulk_result(result, offset, batch)
+        except BulkWriteError as e:
+            _bulk_result(result, offset, batch, e)
+        offset += len(batch)
+    notify_write(collection_name, "insert", result["inserted_ids"])
+    return result
+
+@timed_operation
+def stream_documents(collection_name: str, filter_dict: dict = None, projection: dict = None, batch_size: int = 1000) -> Iterator[dict]:
+    """Yield matching documents one at a time, fetching batch_size per round-trip.
+
+    Unlike get_documents, memory use stays constant regardless of how many
+    documents match.
+    """
+    if db is None:
+        raise Exception("Database not available. Check DATABASE_URL and DATABASE_NAME environment variables.")
+
+    with db[collection_name].find(filter_dict or {}, projection, batch_size=batch_size) as cursor:
+        yield from cursor
+
+@timed_operation
+def get_document(collection_name: str, doc_id: Union[str, ObjectId]):
+    """Get one document by _id through the document cache (None if absent)"""
+    if db is None:
+        raise Exception("Database not available. Check DATABASE_URL and DATABASE_NAME environment variables.")
+
+    key = (collection_name, str(doc_id))
+    doc = document_cache.get(key)
+    if doc is None:
+        generation = document_cache.generation(key)
+        doc = db[collection_name].find_one({"_id": _object_id(doc_id)})
+        if doc is None:
+            return None
+        document_cache.set(key, doc, generation=generation)
+    # Callers often mutate the result (e.g. stringify _id); keep the cached copy intact
+    return dict(doc)
+
+@timed_operation
+def update_document(collection_name: str, doc_id: Union[str, ObjectId], data: Union[BaseModel, dict]) -> bool:
+    """Set the given fields on one document and stamp updated_at"""
+    if db is None:
+        raise Exception("Database not available. Check DATABASE_URL and DATABASE_NAME environment variables.")
+
+    result = db[collection_name].update_one({"_id": _object_id(doc_id)}, _update_spec(data))
+    notify_write(collection_name, "update", [doc_id])
+    return result.matched_count > 0
+
+@timed_operation
+def delete_document(collection_name: str, doc_id: Union[str, ObjectId]) -> bool:
+    """Delete one document by _id"""
+    if db is None:
+        raise Exception("Database not available. Check DATABASE_URL and DATABASE_NAME environment variables.")
+
+    result = db[collection_name].delete_one({"_id": _object_id(doc_id)})
+    notify_write(collection_name, "delete", [doc_id])
+    return result.deleted_count > 0
+
+@timed_operation
+def get_documents(collection_name: str, filter_dict: dict = None, limit: int = None, sort: list = None, projection: dict = None,
+                  hint: Optional[str] = None):
+    """Get documents from collection, optionally sorted by [(field, direction), ...]
+    and trimmed to the fields in ``projection`` (a MongoDB projection document).
+    ``hint`` forces a specific index by name."""
     if db is None:
         raise Exception("Database not available. Check DATABASE_URL and DATABASE_NAME environment variables.")
     
-    cursor = db[collection_name].find(filter_dict or {})
+    cursor = db[collection_name].find(filter_dict or {}, projection)
+    if hint:
+        cursor = cursor.hint(hint)
+    if sort:
+        cursor = cursor.sort(sort)
     if limit:
         cursor = cursor.limit(limit)
     
     return list(cursor)
+
+# Async helper functions (Motor) for use inside async request handlers
+@timed_operation
+async def create_document_async(collection_name: str, data: Union[BaseModel, dict]):
+    """Insert a single document with timestamp without blocking the event loop"""
+    if async_db is None:
+        raise Exception("Database not available. Check DATABASE_URL and DATABASE_NAME environment variables.")
+
+    result = await async_db[collection_name].insert_one(_prepare_document(data))
+    notify_write(collection_name, "insert", [result.inserted_id])
+    return str(result.inserted_id)
+
+@timed_operation
+async def create_documents_async(collection_name: str, documents: Iterable[Union[BaseModel, dict]], batch_size: int = 1000,
+                                 write_concern: Optional[WriteConcern] = None) -> dict:
+    """Insert many documents with unordered bulk writes without blocking the event loop"""
+    if async_db is None:
+        raise Exception("Database not available. Check DATABASE_URL and DATABASE_NAME environment variables.")
+
+    collection = async_db[collection_name]
+    if write_concern is not None:
+        collection = collection.with_options(write_concern=write_concern)
+    result = {"inserted": 0, "inserted_ids": [], "errors": []}
+    offset = 0
+    for batch in _batches(documents, batch_size):
+        try:
+            await collection.insert_many(batch, ordered=False)
+            _bulk_result(result, offset, batch)
+        except BulkWriteError as e:
+            _bulk_result(result, offset, batch, e)
+        offset += len(batch)
+    notify_write(collection_name, "insert", result["inserted_ids"])
+    return result
+
+@timed_operation
+async def stream_documents_async(collection_name: str, filter_dict: dict = None, projection: dict = None, batch_size: int = 1000) -> AsyncIterator[dict]:
+    """Async generator counterpart of stream_documents"""
+    if async_db is None:
+        raise Exception("Database not available. Check DATABASE_URL and DATABASE_NAME environment variables.")
+
+    cursor = async_db[collection_name].find(filter_dict or {}, projection, batch_size=batch_size)
+    try:
+        async for doc in cursor:
+            yield doc
+    finally:
+        # Release the server-side cursor if the client disconnects mid-export
+        await cursor.close()
+
+@timed_operation
+async def get_document_async(collection_name: str, doc_id: Union[str, ObjectId]):
+    """Get one document by _id through the document cache (None if absent)"""
+    if async_db is None:
+        raise Exception("Database not available. Check DATABASE_URL and DATABASE_NAME environment variables.")
+
+    key = (collection_name, str(doc_id))
+    doc = document_cache.get(key)
+    if doc is None:
+        generation = document_cache.generation(key)
+        doc = await async_db[collection_name].find_one({"_id": _object_id(doc_id)})
+        if doc is None:
+            return None
+        document_cache.set(key, doc, generation=generation)
+    return dict(doc)
+
+@timed_operation
+async def update_document_async(collection_name: str, doc_id: Union[str, ObjectId], data: Union[BaseModel, dict]) -> bool:
+    """Set the given fields on one document and stamp updated_at"""
+    if async_db is None:
+        raise Exception("Database not available. Check DATABASE_URL and DATABASE_NAME environment variables.")
+
+    result = await async_db[collection_name].update_one({"_id": _object_id(doc_id)}, _update_spec(data))
+    notify_write(collection_name, "update", [doc_id])
+    return result.matched_count > 0
+
+@timed_operation
+async def delete_document_async(collection_name: str, doc_id: Union[str, ObjectId]) -> bool:
+    """Delete one document by _id"""
+    if async_db is None:
+        raise Exception("Database not available. Check DATABASE_URL and DATABASE_NAME environment variables.")
+
+    result = await async_db[collection_name].delete_one({"_id": _object_id(doc_id)})
+    notify_write(collection_name, "delete", [doc_id])
+    return result.deleted_count > 0
+
+@timed_operation
+async def get_documents_async(collection_name: str, filter_dict: dict = None, limit: int = None, sort: list = None, projection: dict = None,
+                              hint: Optional[str] = None):
+    """Get documents from collection without blocking the event loop"""
+    if async_db is None:
+        raise Exception("Database not available. Check DATABASE_URL and DATABASE_NAME environment variables.")
+
+    cursor = async_db[collection_name].find(filter_dict or {}, projection)
+    if hint:
+        cursor = cursor.hint(hint)
+    if sort:
+        cursor = cursor.sort(sort)
+    if limit:
+        cursor = cursor.limit(limit)
+
+    # length=None drains the cursor; callers bound the size with ``limit``
+    return await cursor.to_list(length=None)
+
+def _text_search_query(text: str, filter_dict: dict = None, projection: dict = None):
+    """Filter, projection and sort for a $text query ranked by relevance"""
+    query = dict(filter_dict or {})
+    query["$text"] = {"$search": text}
+    score = dict(projection or {})
+    score["score"] = {"$meta": "textScore"}
+    return query, score, [("score", {"$meta": "textScore"})]
+
+@timed_operation
+def search_documents(collection_name: str, text: str, filter_dict: dict = None, limit: int = 20, skip: int = 0, projection: dict = None):
+    """Full-text search (requires a text index), best matches first"""
+    if db is None:
+        raise Exception("Database not available. Check DATABASE_URL and DATABASE_NAME environment variables.")
+
+    query, projection, sort = _text_search_query(text, filter_dict, projection)
+    cursor = db[collection_name].find(query, projection).sort(sort).skip(skip).limit(limit)
+    return list(cursor)
+
+@timed_operation
+async def search_documents_async(collection_name: str, text: str, filter_dict: dict = None, limit: int = 20, skip: int = 0, projection: dict = None):
+    """Full-text search (requires a text index) without blocking the event loop"""
+    if async_db is None:
+        raise Exception("Database not available. Check DATABASE_URL and DATABASE_NAME environment variables.")
+
+    query, projection, sort = _text_search_query(text, filter_dict, projection)
+    cursor = async_db[collection_name].find(query, projection).sort(sort).skip(skip).limit(limit)
+    return await cursor.to_list(length=None)
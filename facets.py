@@ -0,0 +1,116 @@
+"""
+Toy Facet Counts
+
+Counts for the storefront filter chips (category, price bucket, rating
+bucket, in_stock), computed by a single $facet aggregation and served from
+memory. Toy writes reported through database.add_write_listener mark the
+counts stale; the next request still gets the cached counts immediately and
+triggers one background recompute, at most every ``min_refresh_seconds``.
+Per-order stock changes therefore cannot turn into one aggregation per
+checkout, at the cost of counts lagging writes by a few seconds. Writes made
+by other workers or scripts are never reported here, so counts older than
+``max_age_seconds`` are refreshed the same way.
+
+Toys without a rating are counted in a last rating bucket with both bounds
+null, not in the top one.
+"""
+
+import asyncio
+import logging
+import threading
+import time
+from datetime import datetime, timezone
+from typing import Optional
+
+import database
+
+logger = logging.getLogger(__name__)
+
+PRICE_BOUNDARIES = [0, 10, 25, 50, 100]
+RATING_BOUNDARIES = [0, 3, 4, 4.5]
+
+PIPELINE = [{"$facet": {
+    "category": [
+        {"$group": {"_id": "$category", "count": {"$sum": 1}}},
+        {"$sort": {"count": -1, "_id": 1}},
+    ],
+    # Values at or above the last boundary (and missing values) land in "default"
+    "price": [{"$bucket": {"groupBy": "$price", "boundaries": PRICE_BOUNDARIES,
+                           "default": "default", "output": {"count": {"$sum": 1}}}}],
+    "rating": [{"$match": {"rating": {"$type": "number"}}},
+               {"$bucket": {"groupBy": "$rating", "boundaries": RATING_BOUNDARIES,
+                            "default": "default", "output": {"count": {"$sum": 1}}}}],
+    # Missing or null: kept out of the buckets above, where "default" means >= 4.5
+    "unrated": [{"$match": {"rating": None}}, {"$count": "count"}],
+    "in_stock": [{"$group": {"_id": "$in_stock", "count": {"$sum": 1}}}],
+    "total": [{"$count": "count"}],
+}}]
+
+
+def _buckets(rows: list, boundaries: list) -> list:
+    counts = {row["_id"]: row["count"] for row in rows}
+    buckets = [{"min": low, "max": high, "count": counts.get(low, 0)}
+               for low, high in zip(boundaries, boundaries[1:])]
+    buckets.append({"min": boundaries[-1], "max": None, "count": counts.get("default", 0)})
+    return buckets
+
+
+def shape(result: dict) -> dict:
+    """Turn the raw $facet output into the API response"""
+    return {
+        "category": [{"value": row["_id"], "count": row["count"]} for row in result["category"]],
+        "price": _buckets(result["price"], PRICE_BOUNDARIES),
+        "rating": _buckets(result["rating"], RATING_BOUNDARIES) + [
+            {"min": None, "max": None, "count": result["unrated"][0]["count"] if result["unrated"] else 0}],
+        "in_stock": [{"value": row["_id"], "count": row["count"]}
+                     for row in sorted(result["in_stock"], key=lambda r: not r["_id"])],
+        "total": result["total"][0]["count"] if result["total"] else 0,
+        "computed_at": datetime.now(timezone.utc),
+    }
+
+
+class FacetCache:
+    def __init__(self, collection_name: str, min_refresh_seconds: float = 5.0, max_age_seconds: float = 60.0):
+        self.collection_name = collection_name
+        self.min_refresh_seconds = min_refresh_seconds
+        self.max_age_seconds = max_age_seconds
+        self._value: Optional[dict] = None
+        # Set from write listeners, which may run on any thread
+        self._stale = threading.Event()
+        self._computed_at = 0.0
+        self._lock = asyncio.Lock()
+        self._refreshing: Optional[asyncio.Task] = None
+        database.add_write_listener(self.on_write)
+
+    def on_write(self, collection_name: str, operation: str, doc_ids: list):
+        if collection_name == self.collection_name:
+            self._stale.set()
+
+    async def refresh(self) -> dict:
+        requested = time.monotonic()
+        async with self._lock:
+            # Another caller refreshed while we waited for the lock, and no
+            # write has landed since its aggregation started
+            if self._value is not None and self._computed_at >= requested and not self._stale.is_set():
+                return self._value
+            self._stale.clear()
+            cursor = database.async_db[self.collection_name].aggregate(PIPELINE)
+            result = (await cursor.to_list(length=1))[0]
+            self._value = shape(result)
+            self._computed_at = time.monotonic()
+            return self._value
+
+    async def get(self) -> dict:
+        if self._value is None:
+            return await self.refresh()
+        age = time.monotonic() - self._computed_at
+        stale = self._stale.is_set() or age >= self.max_age_seconds
+        if stale and age >= self.min_refresh_seconds and (self._refreshing is None or self._refreshing.done()):
+            self._refreshing = asyncio.create_task(self._background_refresh())
+        return self._value
+
+    async def _background_refresh(self):
+        try:
+            await self.refresh()
+        except Exception as e:
+            logger.warning("Facet refresh failed: %s", e)
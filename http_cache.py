@@ -0,0 +1,107 @@
+"""
+HTTP Caching for Catalog Reads
+
+Catalog responses carry an ETag (a hash of the identity JSON body) and a
+Cache-Control header configured per route, so browsers and CDNs can keep and
+revalidate them. The ETag is weak: CompressionMiddleware may send the same
+JSON gzip- or brotli-encoded, and a 304 must carry the same validator as the
+200 it revalidates, whichever encoding that 200 used. A conditional GET whose
+If-None-Match matches, or whose If-Modified-Since is not older than the
+resource's Last-Modified, gets an empty 304 instead of the body.
+
+Cache-Control per route comes from the environment:
+- CACHE_CONTROL_TOY_LIST    GET /api/toys
+- CACHE_CONTROL_TOY_DETAIL  GET /api/toys/{toy_id}
+- CACHE_CONTROL_FACETS      GET /api/toys/facets
+Set one to "no-store" to opt a route out of shared caching; ETags and 304s
+still apply.
+"""
+
+import hashlib
+import os
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from typing import Any, Optional
+
+from fastapi import Request
+from fastapi.responses import Response
+
+from responses import dumps
+
+
+@dataclass(frozen=True)
+class HttpCacheSettings:
+    toy_list: str = "public, max-age=30, stale-while-revalidate=60"
+    toy_detail: str = "public, max-age=60, stale-while-revalidate=300"
+    facets: str = "public, max-age=30, stale-while-revalidate=60"
+
+    @classmethod
+    def from_env(cls) -> "HttpCacheSettings":
+        return cls(
+            toy_list=os.getenv("CACHE_CONTROL_TOY_LIST") or cls.toy_list,
+            toy_detail=os.getenv("CACHE_CONTROL_TOY_DETAIL") or cls.toy_detail,
+            facets=os.getenv("CACHE_CONTROL_FACETS") or cls.facets,
+        )
+
+
+def etag_for(body: bytes) -> str:
+    """Weak entity tag for a rendered body, identical across content encodings"""
+    return 'W/"' + hashlib.blake2b(body, digest_size=16).hexdigest() + '"'
+
+
+def last_modified_of(doc: dict) -> Optional[datetime]:
+    """When ``doc`` last changed, from the timestamps database.py stamps"""
+    value = doc.get("updated_at") or doc.get("created_at")
+    if not isinstance(value, datetime):
+        return None
+    # pymongo returns naive datetimes in UTC; HTTP dates have 1s precision
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return value.replace(microsecond=0)
+
+
+def _etag_matches(header: str, etag: str) -> bool:
+    # If-None-Match uses the weak comparison: W/"x" matches "x"
+    if header.strip() == "*":
+        return True
+    opaque = etag.removeprefix("W/")
+    return any(tag.strip().removeprefix("W/") == opaque for tag in header.split(","))
+
+
+def _not_modified_since(header: str, last_modified: datetime) -> bool:
+    try:
+        since = parsedate_to_datetime(header)
+    except (TypeError, ValueError):
+        return False
+    if since.tzinfo is None:
+        since = since.replace(tzinfo=timezone.utc)
+    return last_modified <= since
+
+
+def is_not_modified(request: Request, etag: str, last_modified: Optional[datetime] = None) -> bool:
+    """Evaluate the request's preconditions; If-None-Match wins over If-Modified-Since"""
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        return _etag_matches(if_none_match, etag)
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since and last_modified is not None:
+        return _not_modified_since(if_modified_since, last_modified)
+    return False
+
+
+def cached_json_response(
+    request: Request,
+    content: Any,
+    cache_control: str,
+    last_modified: Optional[datetime] = None,
+) -> Response:
+    """Render ``content`` as JSON with validators, or a 304 if the client's copy is current"""
+    body = dumps(content)
+    etag = etag_for(body)
+    headers = {"ETag": etag, "Cache-Control": cache_control}
+    if last_modified is not None:
+        headers["Last-Modified"] = format_datetime(last_modified, usegmt=True)
+    if is_not_modified(request, etag, last_modified):
+        return Response(status_code=304, headers=headers)
+    return Response(body, media_type="application/json", headers=headers)
@@ -0,0 +1,186 @@
+"""
+Idempotency Keys
+
+ASGI middleware that makes selected POST endpoints safe to retry. The first
+request carrying an ``Idempotency-Key`` header claims the key with an insert
+(the _id is unique, so exactly one concurrent request wins) and its 2xx
+response is stored. Retries with the same key get the stored response back
+without the request body being parsed, validated or written again.
+
+- Same key, different body: 422 (the key is being reused for another request)
+- Same key while the first request is still running: 409, retry shortly
+- Non-2xx or failed first request: the claim is dropped so a retry can run
+- 202 Accepted is not stored, since the write has not happened yet. An
+  endpoint that queues the write calls ``defer_until_written`` with the
+  write's future: the claim stays pending (retries get 409) until the
+  future succeeds, then the 202 is stored; if the write fails the claim is
+  dropped so a retry can place the order again
+
+Records expire after schemas.IDEMPOTENCY_KEY_TTL_SECONDS via a TTL index.
+"""
+
+import asyncio
+import hashlib
+import logging
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Tuple
+
+from pymongo.errors import DuplicateKeyError
+
+import database
+from responses import dumps
+from schemas import Idempotency
+
+logger = logging.getLogger(__name__)
+
+COLLECTION = "idempotency"
+HEADER = b"idempotency-key"
+MAX_KEY_LENGTH = 255
+# A pending claim older than this is assumed abandoned (e.g. the worker died)
+PENDING_TIMEOUT = timedelta(seconds=60)
+# Scope entry through which an endpoint hands over its queued write
+PENDING_WRITE = "idempotency.pending_write"
+
+
+def defer_until_written(scope: dict, written: asyncio.Future):
+    """Store this request's 202 response only once ``written`` succeeds"""
+    scope[PENDING_WRITE] = written
+
+
+async def _send_json(send, status_code: int, content, extra_headers=()):
+    body = dumps(content)
+    await send({"type": "http.response.start", "status": status_code, "headers": [
+        (b"content-type", b"application/json"), (b"content-length", str(len(body)).encode()), *extra_headers,
+    ]})
+    await send({"type": "http.response.body", "body": body})
+
+
+class IdempotencyMiddleware:
+    """Apply idempotency keys to ``routes``: {(method, path): scope name}"""
+
+    def __init__(self, app, routes: Dict[Tuple[str, str], str]):
+        self.app = app
+        self.routes = routes
+        # Strong references to the tasks finishing deferred records
+        self._finishing = set()
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or database.async_db is None:
+            return await self.app(scope, receive, send)
+        name = self.routes.get((scope["method"], scope["path"]))
+        key = dict(scope["headers"]).get(HEADER) if name else None
+        if not key:
+            return await self.app(scope, receive, send)
+        key = key.decode("latin-1")
+        if len(key) > MAX_KEY_LENGTH:
+            return await _send_json(send, 400, {"detail": "Idempotency-Key is too long"})
+
+        # Buffer the body: it is hashed and then replayed to the app
+        chunks = []
+        while True:
+            message = await receive()
+            chunks.append(message.get("body", b""))
+            if not message.get("more_body"):
+                break
+        body = b"".join(chunks)
+        request_hash = hashlib.sha256(body).hexdigest()
+        record_id = f"{name}:{key}"
+
+        collection = database.async_db[COLLECTION]
+        claimed = await self._claim(collection, record_id, name, key, request_hash)
+        if claimed is not True:
+            return await self._replay(send, claimed, request_hash)
+
+        replayed = False
+
+        async def replay_receive():
+            nonlocal replayed
+            if not replayed:
+                replayed = True
+                return {"type": "http.request", "body": body, "more_body": False}
+            return await receive()
+
+        response = {"status": 500, "headers": [], "body": []}
+
+        async def capture_send(message):
+            if message["type"] == "http.response.start":
+                response["status"] = message["status"]
+                response["headers"] = message.get("headers", [])
+            elif message["type"] == "http.response.body":
+                response["body"].append(message.get("body", b""))
+            await send(message)
+
+        try:
+            await self.app(scope, replay_receive, capture_send)
+        except Exception:
+            await collection.delete_one({"_id": record_id, "status": "pending"})
+            raise
+        written = scope.get(PENDING_WRITE)
+        if response["status"] == 202 and written is not None:
+            written.add_done_callback(lambda future: self._finish_later(collection, record_id, response, future))
+        elif 200 <= response["status"] < 300 and response["status"] != 202:
+            await self._store(collection, record_id, response)
+        else:
+            await collection.delete_one({"_id": record_id, "status": "pending"})
+
+    async def _store(self, collection, record_id: str, response: dict):
+        content_type = dict(response["headers"]).get(b"content-type", b"application/json")
+        await collection.update_one({"_id": record_id}, {"$set": {
+            "status": "done", "status_code": response["status"],
+            "content_type": content_type.decode("latin-1"), "body": b"".join(response["body"]),
+        }})
+
+    def _finish_later(self, collection, record_id: str, response: dict, written: asyncio.Future):
+        task = asyncio.ensure_future(self._finish(collection, record_id, response, written))
+        self._finishing.add(task)
+        task.add_done_callback(self._finishing.discard)
+
+    async def _finish(self, collection, record_id: str, response: dict, written: asyncio.Future):
+        try:
+            if written.cancelled() or written.exception() is not None:
+                await collection.delete_one({"_id": record_id, "status": "pending"})
+            else:
+                await self._store(collection, record_id, response)
+        except Exception:
+            # The claim stays pending and is taken over after PENDING_TIMEOUT
+            logger.exception("Could not finish idempotency record %s", record_id)
+
+    async def _claim(self, collection, record_id: str, name: str, key: str, request_hash: str):
+        """True if this request now owns the key, else the existing record"""
+        now = datetime.now(timezone.utc)
+        record = Idempotency(scope=name, key=key, request_hash=request_hash, created_at=now)
+        try:
+            await collection.insert_one({"_id": record_id, **record.model_dump()})
+            return True
+        except DuplicateKeyError:
+            pass
+        existing = await collection.find_one({"_id": record_id})
+        if existing is None:
+            # Expired or dropped between our insert and read; try once more
+            try:
+                await collection.insert_one({"_id": record_id, **record.model_dump()})
+                return True
+            except DuplicateKeyError:
+                return await collection.find_one({"_id": record_id}) or {"status": "pending"}
+        if existing["status"] == "pending" and existing.get("request_hash") == request_hash:
+            taken_over = await collection.update_one(
+                {"_id": record_id, "status": "pending", "created_at": {"$lt": now - PENDING_TIMEOUT}},
+                {"$set": {"created_at": now}},
+            )
+            if taken_over.modified_count:
+                return True
+        return existing
+
+    async def _replay(self, send, existing: dict, request_hash: str):
+        if existing.get("request_hash", request_hash) != request_hash:
+            return await _send_json(send, 422, {"detail": "Idempotency-Key was already used with a different request body"})
+        if existing["status"] != "done":
+            return await _send_json(send, 409, {"detail": "A request with this Idempotency-Key is still in progress"},
+                                    [(b"retry-after", b"1")])
+        body = existing["body"]
+        await send({"type": "http.response.start", "status": existing["status_code"], "headers": [
+            (b"content-type", existing["content_type"].encode("latin-1")),
+            (b"content-length", str(len(body)).encode()),
+            (b"idempotent-replayed", b"true"),
+        ]})
+        await send({"type": "http.response.body", "body": body})
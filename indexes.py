@@ -0,0 +1,134 @@
+"""
+Index Management
+
+Collects the indexes declared in ``__indexes__`` on the models in schemas.py
+and syncs them to MongoDB. Syncing is idempotent: creating an index that
+already exists with the same spec is a no-op on the server, so it is safe to
+run at every startup and from every worker.
+
+Usage:
+    python indexes.py report                    # missing / undeclared / unused
+    python indexes.py sync                      # create missing indexes
+    python indexes.py sync --drop-undeclared    # ...and drop undeclared ones
+"""
+
+import argparse
+import inspect
+import json
+from typing import Dict, List
+
+from pydantic import BaseModel
+from pymongo import IndexModel
+from pymongo.errors import OperationFailure
+
+import schemas
+
+
+def collection_name(model: type) -> str:
+    """Collection name for a schema model (lowercase class name)"""
+    return model.__name__.lower()
+
+
+def declared_indexes() -> Dict[str, List[IndexModel]]:
+    """Map collection name -> IndexModels declared on its schema"""
+    registry = {}
+    for _, model in inspect.getmembers(schemas, inspect.isclass):
+        if issubclass(model, BaseModel) and "__indexes__" in vars(model):
+            registry.setdefault(collection_name(model), []).extend(model.__indexes__)
+    return registry
+
+
+def _compare(declared: List[IndexModel], existing: dict, usage: dict) -> dict:
+    declared_names = {model.document["name"] for model in declared}
+    existing_names = set(existing) - {"_id_"}
+    return {
+        "declared": sorted(declared_names),
+        "missing": sorted(declared_names - existing_names),
+        "undeclared": sorted(existing_names - declared_names),
+        # Access counters reset when mongod restarts, so read this with uptime in mind
+        "unused": sorted(name for name in existing_names if usage.get(name) == 0),
+        "usage": {name: ops for name, ops in usage.items() if name != "_id_"},
+    }
+
+
+def _usage(stats: list) -> dict:
+    return {doc["name"]: int(doc["accesses"]["ops"]) for doc in stats}
+
+
+def report_indexes(database) -> dict:
+    """Compare declared indexes with what exists on the server"""
+    report = {}
+    for name, declared in declared_indexes().items():
+        collection = database[name]
+        try:
+            usage = _usage(list(collection.aggregate([{"$indexStats": {}}])))
+        except OperationFailure:
+            usage = {}
+        report[name] = _compare(declared, collection.index_information(), usage)
+    return report
+
+
+def sync_indexes(database, drop_undeclared: bool = False) -> dict:
+    """Create every declared index (and optionally drop undeclared ones)"""
+    report = report_indexes(database)
+    for name, declared in declared_indexes().items():
+        entry = report[name]
+        try:
+            database[name].create_indexes(declared)
+            entry["created"], entry["missing"] = entry["missing"], []
+            if drop_undeclared:
+                for index_name in entry["undeclared"]:
+                    database[name].drop_index(index_name)
+                entry["dropped"], entry["undeclared"] = entry["undeclared"], []
+        except OperationFailure as e:
+            # Typically an existing index with the same name but different options
+            entry["error"] = str(e)
+    return report
+
+
+async def report_indexes_async(database) -> dict:
+    """report_indexes for a Motor database"""
+    report = {}
+    for name, declared in declared_indexes().items():
+        collection = database[name]
+        try:
+            usage = _usage(await collection.aggregate([{"$indexStats": {}}]).to_list(length=None))
+        except OperationFailure:
+            usage = {}
+        report[name] = _compare(declared, await collection.index_information(), usage)
+    return report
+
+
+async def sync_indexes_async(database, drop_undeclared: bool = False) -> dict:
+    """sync_indexes for a Motor database"""
+    report = await report_indexes_async(database)
+    for name, declared in declared_indexes().items():
+        entry = report[name]
+        try:
+            await database[name].create_indexes(declared)
+            entry["created"], entry["missing"] = entry["missing"], []
+            if drop_undeclared:
+                for index_name in entry["undeclared"]:
+                    await database[name].drop_index(index_name)
+                entry["dropped"], entry["undeclared"] = entry["undeclared"], []
+        except OperationFailure as e:
+            entry["error"] = str(e)
+    return report
+
+
+if __name__ == "__main__":
+    from database import db
+
+    parser = argparse.ArgumentParser(description="Sync or report the indexes declared in schemas.py")
+    parser.add_argument("command", choices=["sync", "report"])
+    parser.add_argument("--drop-undeclared", action="store_true",
+                        help="with sync: drop indexes that no schema declares")
+    args = parser.parse_args()
+
+    if db is None:
+        raise SystemExit("Database not available. Check DATABASE_URL and DATABASE_NAME environment variables.")
+    if args.command == "sync":
+        result = sync_indexes(db, drop_undeclared=args.drop_undeclared)
+    else:
+        result = report_indexes(db)
+    print(json.dumps(result, indent=2))
@@ -0,0 +1,78 @@
+"""
+Inventory Reservation
+
+Stock is reserved with one conditional update per toy: the decrement only
+applies while ``stock >= quantity``, which MongoDB evaluates atomically per
+document. Concurrent checkouts on the same hot SKU therefore serialize on
+that document and can never push stock below zero, with no locks or
+transactions needed. If any toy of an order cannot be reserved, the
+reservations already made for it are released again.
+
+Toys whose ``stock`` is None are untracked and always available.
+"""
+
+import asyncio
+from collections import Counter
+from typing import Dict, List
+
+from bson import ObjectId
+
+from database import async_db, notify_write
+
+TOY_COLLECTION = "toy"
+
+
+class InsufficientStock(Exception):
+    def __init__(self, toy_ids: List[str]):
+        super().__init__(f"Insufficient stock for {', '.join(toy_ids)}")
+        self.toy_ids = toy_ids
+
+
+def _adjust(delta: int) -> list:
+    """Update pipeline adding ``delta`` to stock and recomputing in_stock"""
+    stock = {"$add": ["$stock", delta]}
+    return [{"$set": {"stock": stock, "in_stock": {"$gt": [stock, 0]}, "updated_at": "$$NOW"}}]
+
+
+async def _take(toy_id: str, quantity: int) -> bool:
+    result = await async_db[TOY_COLLECTION].update_one(
+        {"_id": ObjectId(toy_id), "stock": {"$gte": quantity}}, _adjust(-quantity),
+    )
+    notify_write(TOY_COLLECTION, "update", [toy_id])
+    return result.modified_count == 1
+
+
+async def reserve_stock_async(quantities: Dict[str, int]) -> Dict[str, int]:
+    """Atomically take ``quantities`` (toy id -> units) out of tracked stock.
+
+    Returns what was reserved, for ``release_stock_async`` should the order
+    fail later. Raises InsufficientStock, after rolling back the toys that
+    were reserved, if any toy lacks stock.
+    """
+    toy_ids = list(quantities)
+    taken = await asyncio.gather(*(_take(toy_id, quantities[toy_id]) for toy_id in toy_ids))
+    reserved = {toy_id: quantities[toy_id] for toy_id, ok in zip(toy_ids, taken) if ok}
+    if len(reserved) < len(toy_ids):
+        await release_stock_async(reserved)
+        raise InsufficientStock([toy_id for toy_id, ok in zip(toy_ids, taken) if not ok])
+    return reserved
+
+
+async def _give_back(toy_id: str, quantity: int):
+    await async_db[TOY_COLLECTION].update_one({"_id": ObjectId(toy_id)}, _adjust(quantity))
+    notify_write(TOY_COLLECTION, "update", [toy_id])
+
+
+async def release_stock_async(reserved: Dict[str, int]):
+    """Return previously reserved units to stock"""
+    await asyncio.gather(*(_give_back(toy_id, quantity) for toy_id, quantity in reserved.items()))
+
+
+def tracked_quantities(items, catalog: Dict[str, dict]) -> Dict[str, int]:
+    """Units per toy for the order lines whose toy tracks stock (lines for the
+    same toy are summed so they are reserved in one update)"""
+    totals = Counter()
+    for item in items:
+        if catalog[item.toy_id].get("stock") is not None:
+            totals[item.toy_id] += item.quantity
+    return dict(totals)
@@ -1,23 +1,138 @@
+import asyncio
+import json
+import logging
 import os
-from fastapi import FastAPI, HTTPException
+from contextlib import asynccontextmanager
+from datetime import datetime
+from fastapi import FastAPI, HTTPException, Query, Request
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel
-from typing import List, Optional
+from pydantic import BaseModel, Field, ValidationError
+from typing import Any, AsyncIterator, List, Optional, Tuple
 from bson import ObjectId
+from pymongo.errors import OperationFailure
 
-from database import db, create_document, get_documents
-from schemas import Toy, Order
+from database import (
+    db,
+    async_db,
+    create_document_async,
+    create_documents_async,
+    document_cache,
+    query_monitor,
+    get_document_async,
+    get_documents_async,
+    get_pool_stats,
+    settings,
+    stream_documents_async,
+    prewarm_async_pool,
+    search_documents_async,
+)
+from schemas import Toy, Order, OrderItem
+from orders import CATALOG_PROJECTION, OrderRejected, catalog_filter, price_order
+from idempotency import IdempotencyMiddleware, defer_until_written
+from catalog import CatalogSettings, CatalogSnapshot
+from facets import FacetCache
+from order_queue import GroupCommitQueue, OrderQueueSettings, QueueFull
+from inventory import InsufficientStock, release_stock_async, reserve_stock_async, tracked_quantities
+from pagination import encode_cursor, decode_cursor, after_id_filter, position_of
+from toy_listing import TOY_SORTS, toy_listing_query
+from responses import MongoJSONResponse, dumps
+from http_cache import HttpCacheSettings, cached_json_response, last_modified_of
+from compression import CompressionMiddleware, CompressionSettings, ResponseCompressor
+from metrics import MetricsMiddleware, registry as metrics_registry
+from tracing import TracedRoute, TracingMiddleware, span, tracer
+from search import PrefixIndexSettings, PrefixIndexSync, toy_prefix_index
+from indexes import report_indexes_async, sync_indexes_async
+from seeding import seed_database_async
+
+logger = logging.getLogger(__name__)
+
+order_queue = GroupCommitQueue("order", OrderQueueSettings.from_env())
+catalog = CatalogSnapshot("toy", CatalogSettings.from_env())
+http_cache = HttpCacheSettings.from_env()
+compression = ResponseCompressor(CompressionSettings.from_env())
+toy_prefix_sync = PrefixIndexSync(toy_prefix_index, "toy", PrefixIndexSettings.from_env())
+toy_facets = FacetCache("toy", min_refresh_seconds=float(os.getenv("FACETS_MIN_REFRESH_SECONDS", "5")),
+                        max_age_seconds=float(os.getenv("FACETS_MAX_AGE_SECONDS", "60")))
+# Listing hints MongoDB rejected because the index does not exist (indexes
+# never synced, or the sync failed); those listings run unhinted from then on
+_missing_hints = set()
+# Strong references to fire-and-forget tasks so they are not garbage collected
+_background_tasks = set()
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    try:
+        await prewarm_async_pool()
+    except Exception as e:
+        # Connections open lazily on the first requests instead
+        logger.warning("Could not prewarm the connection pool: %s", e)
+    if async_db is not None and settings.sync_indexes_on_startup:
+        try:
+            report = await sync_indexes_async(async_db)
+            for collection, entry in report.items():
+                if entry.get("created"):
+                    logger.info("Created indexes on %s: %s", collection, entry["created"])
+                if entry.get("error"):
+                    logger.warning("Index sync failed on %s: %s", collection, entry["error"])
+        except Exception as e:
+            logger.warning("Could not sync indexes: %s", e)
+    if async_db is not None:
+        try:
+            await toy_prefix_sync.load()
+        except Exception as e:
+            # The refresh task retries on its next poll
+            logger.warning("Could not build toy prefix index: %s", e)
+        toy_prefix_sync.start()
+    if async_db is not None and order_queue.settings.enabled:
+        order_queue.start()
+    if async_db is not None and catalog.settings.enabled:
+        try:
+            await catalog.load()
+            logger.info("Loaded %d toys into the catalog snapshot", len(catalog))
+        except Exception as e:
+            # Endpoints fall back to MongoDB until a refresh succeeds
+            logger.warning("Could not load catalog snapshot: %s", e)
+        catalog.start()
+    yield
+    await toy_prefix_sync.stop()
+    await catalog.stop()
+    await order_queue.stop()
+    tracer.flush()
+
+app = FastAPI(title="Toy Store API", lifespan=lifespan, default_response_class=MongoJSONResponse)
+# Tracing hooks are only installed when an exporter is configured, so with
+# tracing off requests pay nothing for it. The route class has to be set
+# before any route is declared.
+if tracer.settings.enabled:
+    app.router.route_class = TracedRoute
 
-app = FastAPI(title="Toy Store API")
+# Retries carrying the same Idempotency-Key get the original response back
+app.add_middleware(
+    IdempotencyMiddleware,
+    routes={("POST", "/api/orders"): "order", ("POST", "/api/toys"): "toy"},
+)
+
+# Outside idempotency so stored responses are kept uncompressed
+app.add_middleware(CompressionMiddleware, compressor=compression)
 
+# Outside idempotency so replayed responses also get CORS headers
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["ETag", "Last-Modified"],
 )
 
+# Request latency includes every middleware added before this one
+app.add_middleware(MetricsMiddleware)
+
+# Outermost, so the root span covers the whole request
+if tracer.settings.enabled:
+    app.add_middleware(TracingMiddleware)
+
 @app.get("/")
 def read_root():
     return {"message": "Toy Store Backend Running"}
@@ -58,53 +173,347 @@ def test_database():
     
     return response
 
+@app.get("/metrics", tags=["admin"], response_class=PlainTextResponse)
+def metrics():
+    """Prometheus metrics for this worker process"""
+    return PlainTextResponse(metrics_registry.render(), media_type="text/plain; version=0.0.4")
+
+@app.get("/api/admin/pool", tags=["admin"])
+def pool_stats():
+    """Connection pool settings and live counters for this worker process"""
+    return get_pool_stats()
+
+@app.get("/api/admin/cache", tags=["admin"])
+def cache_stats():
+    """Document cache hit/miss/eviction counters for this worker process"""
+    return document_cache.stats()
+
+@app.get("/api/admin/compression", tags=["admin"])
+def compression_stats():
+    """Compressed response counters and precompressed body cache for this worker process"""
+    return compression.stats()
+
+@app.get("/api/admin/tracing", tags=["admin"])
+def tracing_stats():
+    """Trace sampling and export counters for this worker process"""
+    return tracer.stats()
+
+@app.get("/api/admin/order-queue", tags=["admin"])
+def order_queue_stats():
+    """Group-commit order queue depth and batch counters"""
+    return order_queue.stats()
+
+@app.get("/api/admin/catalog", tags=["admin"])
+def catalog_stats():
+    """In-memory catalog snapshot status"""
+    return catalog.stats()
+
+@app.get("/api/admin/indexes", tags=["admin"])
+async def index_report():
+    """Declared vs existing indexes per collection, with usage counters"""
+    if async_db is None:
+        raise HTTPException(status_code=503, detail="Database unavailable")
+    return await report_indexes_async(async_db)
+
+@app.get("/api/admin/slow-queries", tags=["admin"])
+async def slow_queries(limit: int = Query(20, ge=1, le=200), explain: bool = False):
+    """Top query shapes by total time and the most recent slow commands.
+
+    ``explain=true`` runs a queryPlanner explain for top read shapes that have
+    no plan summary yet.
+    """
+    if explain and async_db is not None:
+        await query_monitor.explain_top_async(async_db, limit)
+    return {
+        "threshold_ms": query_monitor.settings.slow_ms,
+        "shapes": query_monitor.top(limit),
+        "recent_slow": query_monitor.recent_slow(),
+    }
+
+@app.delete("/api/admin/slow-queries", tags=["admin"])
+def reset_slow_queries():
+    """Clear aggregated shapes and the recent slow list"""
+    query_monitor.reset()
+    return {"reset": True}
+
 # ----- Toy Endpoints -----
 
 @app.get("/api/toys")
-def list_toys(category: Optional[str] = None, q: Optional[str] = None):
-    """List toys with optional category filter and search query"""
-    if db is None:
-        return []
-    filter_dict = {}
-    if category:
-        filter_dict["category"] = category
+async def list_toys(
+    request: Request,
+    category: Optional[str] = None,
+    q: Optional[str] = None,
+    cursor: Optional[str] = None,
+    page_size: int = Query(24, ge=1, le=100),
+    fields: Optional[str] = Query(None, description="Comma-separated fields to return, e.g. name,price,image"),
+    sort: Optional[str] = Query(None, description=f"One of: {', '.join(TOY_SORTS)}"),
+    min_price: Optional[float] = Query(None, ge=0),
+    max_price: Optional[float] = Query(None, ge=0),
+    min_rating: Optional[float] = Query(None, ge=0, le=5),
+    in_stock: Optional[bool] = None,
+):
+    """List toys with optional category filter and search query.
+
+    Pass the returned ``next_cursor`` back as ``cursor`` to fetch the
+    following page; it is null on the last page. Browsing pages are keyed on
+    the sort field plus _id (just _id by default); search results (``q``)
+    are ranked by text relevance and paged by offset, since relevance has no
+    stable range key.
+    """
+    if async_db is None:
+        return {"items": [], "next_cursor": None}
+    if sort and sort not in TOY_SORTS:
+        raise HTTPException(status_code=400, detail=f"sort must be one of: {', '.join(TOY_SORTS)}")
+    projection = _toy_projection(fields)
     if q:
-        filter_dict["name"] = {"$regex": q, "$options": "i"}
-    toys = get_documents("toy", filter_dict=filter_dict, limit=100)
-    for t in toys:
-        t["_id"] = str(t.get("_id"))
-    return toys
+        if sort:
+            raise HTTPException(status_code=400, detail="Search results are ordered by relevance; sort is not supported with q")
+        filter_dict, _, _, _ = toy_listing_query(None, category, in_stock, min_price, max_price, min_rating)
+        page = await _search_toys(q, filter_dict, cursor, page_size, projection)
+        return cached_json_response(request, page, http_cache.toy_list)
+    position = None
+    if cursor:
+        try:
+            position = decode_cursor(cursor)
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+        if position.get("s") != sort:
+            raise HTTPException(status_code=400, detail="Cursor belongs to a different sort order")
+    try:
+        filter_dict, sort_spec, hint, sort_field = toy_listing_query(
+            sort, category, in_stock, min_price, max_price, min_rating, position,
+        )
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    if projection and sort_field not in projection:
+        # The cursor is built from the sort key, so it has to come back
+        projection[sort_field] = 1
+    # Fetch one extra document to learn whether another page exists
+    plain_browse = not sort and in_stock is None and min_price is None and max_price is None and min_rating is None
+    if catalog.ready and plain_browse:
+        after_id = str(after_id_filter(position)["_id"]["$gt"]) if position else None
+        toys = catalog.page(category, after_id, page_size + 1, projection)
+    else:
+        toys = await _list_toys_hinted(filter_dict, page_size + 1, sort_spec, projection, hint)
+    next_cursor = None
+    if len(toys) > page_size:
+        toys = toys[:page_size]
+        next_cursor = encode_cursor({**position_of(toys[-1], sort_field), "s": sort})
+    return cached_json_response(request, {"items": toys, "next_cursor": next_cursor}, http_cache.toy_list)
+
+TOY_FIELDS = frozenset(Toy.model_fields) | {"created_at", "updated_at"}
+
+def _toy_projection(fields: Optional[str]) -> Optional[dict]:
+    """Inclusion projection for a ``fields=`` parameter (_id is always returned)"""
+    if not fields:
+        return None
+    requested = {f.strip() for f in fields.split(",") if f.strip()}
+    unknown = requested - TOY_FIELDS
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown fields: {', '.join(sorted(unknown))}")
+    return {f: 1 for f in sorted(requested)} or None
+
+async def _search_toys(q: str, filter_dict: dict, cursor: Optional[str], page_size: int, projection: Optional[dict]):
+    offset = 0
+    if cursor:
+        try:
+            offset = int(decode_cursor(cursor)["o"])
+        except (ValueError, KeyError, TypeError):
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+        if offset < 0:
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+    toys = await search_documents_async("toy", q, filter_dict, limit=page_size + 1, skip=offset, projection=projection)
+    next_cursor = None
+    if len(toys) > page_size:
+        toys = toys[:page_size]
+        next_cursor = encode_cursor({"o": offset + page_size})
+    return {"items": toys, "next_cursor": next_cursor}
+
+async def _list_toys_hinted(filter_dict: dict, limit: int, sort_spec: list, projection: Optional[dict], hint: str):
+    if hint in _missing_hints:
+        hint = None
+    try:
+        return await get_documents_async("toy", filter_dict=filter_dict, limit=limit, sort=sort_spec,
+                                         projection=projection, hint=hint)
+    except OperationFailure as e:
+        # BadValue: "hint provided does not correspond to an existing index"
+        if hint is None or e.code != 2:
+            raise
+        logger.warning("Index %s is missing, listing without a hint: %s", hint, e)
+        _missing_hints.add(hint)
+        return await get_documents_async("toy", filter_dict=filter_dict, limit=limit, sort=sort_spec,
+                                         projection=projection)
+
+@app.get("/api/toys/suggest")
+async def suggest_toys(q: str = Query(..., min_length=1, max_length=100), limit: int = Query(10, ge=1, le=25)):
+    """Typeahead suggestions served from the in-process prefix index"""
+    return MongoJSONResponse(toy_prefix_index.suggest(q, limit))
 
 class CreateToy(BaseModel):
+    # Bounds mirror schemas.Toy so bad input is a 422 here, not a 500 there
     name: str
     description: Optional[str] = None
-    price: float
+    price: float = Field(..., ge=0)
     category: str
     image: Optional[str] = None
-    rating: Optional[float] = 4.5
+    rating: Optional[float] = Field(4.5, ge=0, le=5)
     in_stock: bool = True
+    stock: Optional[int] = Field(None, ge=0)
 
 @app.post("/api/toys", status_code=201)
-def create_toy(payload: CreateToy):
-    if db is None:
+async def create_toy(payload: CreateToy):
+    if async_db is None:
         raise HTTPException(status_code=503, detail="Database unavailable")
     toy = Toy(**payload.model_dump())
-    inserted_id = create_document("toy", toy)
+    inserted_id = await create_document_async("toy", toy)
+    toy_prefix_index.add(inserted_id, toy.name, toy.rating)
     return {"_id": inserted_id}
 
+BULK_BATCH_SIZE = 1000
+# Cap on per-row errors echoed back, so a bad 100k-row file gets a readable response
+MAX_BULK_ERRORS = 1000
+
+async def _ndjson_rows(request: Request) -> AsyncIterator[Tuple[int, Any]]:
+    """Yield (row index, parsed JSON or the parse error) line by line as the body streams in"""
+    buffer = b""
+    index = 0
+    async for chunk in request.stream():
+        buffer += chunk
+        *lines, buffer = buffer.split(b"\n")
+        for line in lines:
+            if line.strip():
+                try:
+                    yield index, json.loads(line)
+                except ValueError as e:
+                    yield index, e
+                index += 1
+    if buffer.strip():
+        try:
+            yield index, json.loads(buffer)
+        except ValueError as e:
+            yield index, e
+
+def _validation_message(error: ValidationError) -> str:
+    return "; ".join(f"{'.'.join(map(str, e['loc'])) or 'row'}: {e['msg']}" for e in error.errors())
+
+@app.post("/api/toys/bulk", status_code=201)
+async def create_toys_bulk(request: Request):
+    """Create many toys from a JSON array or an NDJSON stream
+    (Content-Type: application/x-ndjson), validated and inserted in chunks.
+
+    Rows that fail validation or insertion are reported by their 0-based
+    position in the input; the remaining rows are still inserted.
+    """
+    if async_db is None:
+        raise HTTPException(status_code=503, detail="Database unavailable")
+    content_type = request.headers.get("content-type", "")
+    if "ndjson" in content_type or "jsonl" in content_type:
+        rows = _ndjson_rows(request)
+    else:
+        try:
+            payload = json.loads(await request.body())
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Body must be a JSON array or NDJSON")
+        if not isinstance(payload, list):
+            raise HTTPException(status_code=400, detail="Body must be a JSON array or NDJSON")
+
+        async def array_rows():
+            for item in enumerate(payload):
+                yield item
+        rows = array_rows()
+
+    inserted, errors = 0, []
+    chunk, chunk_rows = [], []
+
+    async def flush():
+        nonlocal inserted
+        result = await create_documents_async("toy", chunk, batch_size=BULK_BATCH_SIZE)
+        failed = {chunk_rows[e["index"]] for e in result["errors"]}
+        errors.extend({"index": chunk_rows[e["index"]], "error": e["error"]} for e in result["errors"])
+        await toy_prefix_sync.add_many([doc for row, doc in zip(chunk_rows, chunk) if row not in failed])
+        inserted += result["inserted"]
+        chunk.clear()
+        chunk_rows.clear()
+
+    async for index, row in rows:
+        if isinstance(row, Exception):
+            errors.append({"index": index, "error": f"Invalid JSON: {row}"})
+            continue
+        try:
+            toy = Toy.model_validate(row)
+        except ValidationError as e:
+            errors.append({"index": index, "error": _validation_message(e)})
+            continue
+        # Assign ids up front so inserted rows can be matched back to their documents
+        chunk.append({"_id": ObjectId(), **toy.model_dump()})
+        chunk_rows.append(index)
+        if len(chunk) >= BULK_BATCH_SIZE:
+            await flush()
+    if chunk:
+        await flush()
+
+    errors.sort(key=lambda e: e["index"])
+    body = {
+        "inserted": inserted,
+        "failed": len(errors),
+        "errors": errors[:MAX_BULK_ERRORS],
+        "errors_truncated": len(errors) > MAX_BULK_ERRORS,
+    }
+    if not inserted and errors:
+        return JSONResponse(status_code=422, content=body)
+    return body
+
+# Flush NDJSON to the client in chunks of roughly this many bytes
+EXPORT_CHUNK_BYTES = 64 * 1024
+
+async def _ndjson_export(collection_name: str, filter_dict: dict, projection: dict = None) -> AsyncIterator[bytes]:
+    buffer = []
+    size = 0
+    async for doc in stream_documents_async(collection_name, filter_dict, projection):
+        line = dumps(doc) + b"\n"
+        buffer.append(line)
+        size += len(line)
+        if size >= EXPORT_CHUNK_BYTES:
+            yield b"".join(buffer)
+            buffer, size = [], 0
+    if buffer:
+        yield b"".join(buffer)
+
+@app.get("/api/toys/facets")
+async def toy_facets_counts(request: Request):
+    """Toy counts by category, price bucket, rating bucket and availability"""
+    if async_db is None:
+        raise HTTPException(status_code=503, detail="Database unavailable")
+    return cached_json_response(request, await toy_facets.get(), http_cache.facets)
+
+@app.get("/api/toys/export", tags=["export"])
+async def export_toys(category: Optional[str] = None, since: Optional[datetime] = None, fields: Optional[str] = None):
+    """Stream the toy catalog as NDJSON; ``since`` limits to toys updated at or after it"""
+    if async_db is None:
+        raise HTTPException(status_code=503, detail="Database unavailable")
+    projection = _toy_projection(fields)
+    filter_dict = {}
+    if category:
+        filter_dict["category"] = category
+    if since:
+        filter_dict["updated_at"] = {"$gte": since}
+    return StreamingResponse(_ndjson_export("toy", filter_dict, projection), media_type="application/x-ndjson")
+
 @app.get("/api/toys/{toy_id}")
-def get_toy(toy_id: str):
-    if db is None:
+async def get_toy(toy_id: str, request: Request):
+    if async_db is None:
         raise HTTPException(status_code=503, detail="Database unavailable")
     try:
         obj_id = ObjectId(toy_id)
     except Exception:
         raise HTTPException(status_code=400, detail="Invalid toy id")
-    doc = db["toy"].find_one({"_id": obj_id})
+    doc = catalog.get(toy_id) if catalog.ready else None
+    if doc is None:
+        # Not loaded yet, or written by another worker or script since the last refresh
+        doc = await get_document_async("toy", obj_id)
     if not doc:
         raise HTTPException(status_code=404, detail="Toy not found")
-    doc["_id"] = str(doc["_id"])
-    return doc
+    return cached_json_response(request, doc, http_cache.toy_detail, last_modified_of(doc))
 
 # ----- Order Endpoints -----
 
@@ -112,68 +521,109 @@ class CreateOrder(BaseModel):
     customer_name: str
     customer_email: str
     customer_address: str
-    items: List[dict]
+    items: List[OrderItem]
     subtotal: float
     shipping: float = 0
     total: float
     notes: Optional[str] = None
 
 @app.post("/api/orders", status_code=201)
-def create_order(payload: CreateOrder):
-    if db is None:
+async def create_order(payload: CreateOrder, request: Request):
+    if async_db is None:
         raise HTTPException(status_code=503, detail="Database unavailable")
     # Basic validation: ensure items present
     if not payload.items:
         raise HTTPException(status_code=400, detail="Order must contain at least one item")
-    order = Order(**payload.model_dump())
-    order_id = create_document("order", order)
+    try:
+        toys = await get_documents_async("toy", catalog_filter(payload.items), projection=CATALOG_PROJECTION)
+        toys_by_id = {str(t["_id"]): t for t in toys}
+        items, subtotal, total = price_order(
+            payload.items, toys_by_id, payload.subtotal, payload.shipping, payload.total,
+        )
+    except OrderRejected as e:
+        raise HTTPException(status_code=e.status_code, detail=e.detail)
+    with span("validate order"):
+        order = Order(**payload.model_dump(exclude={"items", "subtotal", "total"}),
+                      items=items, subtotal=subtotal, total=total)
+    try:
+        reserved = await reserve_stock_async(tracked_quantities(items, toys_by_id))
+    except InsufficientStock as e:
+        raise HTTPException(status_code=409, detail={"message": "Insufficient stock", "toy_ids": e.toy_ids})
+    if order_queue.settings.enabled:
+        return await _enqueue_order(request, order, reserved)
+    try:
+        order_id = await create_document_async("order", order)
+    except Exception:
+        await release_stock_async(reserved)
+        raise
+    return {"order_id": order_id}
+
+async def _enqueue_order(request: Request, order: Order, reserved: dict):
+    """Group-commit path: hand the order to the write-behind queue"""
+    # The id is assigned up front so it can be returned before the write
+    document = {"_id": ObjectId(), **order.model_dump()}
+    try:
+        written = order_queue.submit(document)
+    except QueueFull:
+        await release_stock_async(reserved)
+        raise HTTPException(status_code=429, detail="Order intake is busy, retry shortly",
+                            headers={"Retry-After": "1"})
+    if order_queue.settings.ack == "accepted":
+        written.add_done_callback(lambda future: _release_if_unwritten(future, reserved))
+        # An Idempotency-Key retry replays this 202 only once the order is written
+        defer_until_written(request.scope, written)
+        return JSONResponse(status_code=202, content={"order_id": str(document["_id"]), "status": "accepted"})
+    try:
+        # Shielded: a client disconnect must not cancel an order already queued
+        order_id = await asyncio.shield(written)
+    except Exception:
+        await release_stock_async(reserved)
+        raise
     return {"order_id": order_id}
 
-@app.get("/api/seed", tags=["dev"]) 
-def seed_sample_toys():
-    """Seed database with a few sample toys if empty"""
-    if db is None:
+def _release_if_unwritten(future: asyncio.Future, reserved: dict):
+    if future.cancelled() or future.exception() is None:
+        return
+    logger.error("Accepted order was not written, releasing stock: %s", future.exception())
+    task = asyncio.ensure_future(release_stock_async(reserved))
+    _background_tasks.add(task)
+    task.add_done_callback(_background_tasks.discard)
+
+@app.get("/api/orders/export", tags=["export"])
+async def export_orders(since: Optional[datetime] = None):
+    """Stream order history as NDJSON; ``since`` limits to orders created at or after it"""
+    if async_db is None:
+        raise HTTPException(status_code=503, detail="Database unavailable")
+    filter_dict = {"created_at": {"$gte": since}} if since else {}
+    return StreamingResponse(_ndjson_export("order", filter_dict), media_type="application/x-ndjson")
+
+# Larger catalogs should be seeded with the CLI: python seeding.py --help
+MAX_SEED_TOYS = 200_000
+MAX_SEED_ORDERS = 500_000
+
+@app.get("/api/seed", tags=["dev"])
+async def seed_sample_toys(
+    toys: int = Query(50, ge=1, le=MAX_SEED_TOYS),
+    orders: int = Query(0, ge=0, le=MAX_SEED_ORDERS),
+    seed: int = 42,
+    force: bool = False,
+):
+    """Seed a synthetic catalog (see seeding.py) if the toy collection is empty.
+
+    The same ``seed`` always produces the same toys and orders. ``force``
+    seeds even when toys exist; toys already seeded with this seed are
+    skipped as duplicates.
+    """
+    if async_db is None:
         return {"status": "Database unavailable"}
-    count = db["toy"].count_documents({})
-    if count > 0:
+    count = await async_db["toy"].count_documents({})
+    if count > 0 and not force:
         return {"status": "already-seeded", "count": count}
-    samples = [
-        {
-            "name": "Cuddly Bear",
-            "description": "Super soft plush bear.",
-            "price": 19.99,
-            "category": "Plush",
-            "image": "https://images.unsplash.com/photo-1612198185720-2d3a9c5a4f8e",
-            "rating": 4.7,
-            "in_stock": True,
-        },
-        {
-            "name": "Rainbow Stacking Rings",
-            "description": "Classic stacking rings for toddlers.",
-            "price": 14.99,
-            "category": "Educational",
-            "image": "https://images.unsplash.com/photo-1582582621959-48f5f1d7fca1",
-            "rating": 4.6,
-            "in_stock": True,
-        },
-        {
-            "name": "STEM Robot Kit",
-            "description": "Build and program your own robot.",
-            "price": 49.99,
-            "category": "STEM",
-            "image": "https://images.unsplash.com/photo-1581090464777-f3220bbe1b8b",
-            "rating": 4.8,
-            "in_stock": True,
-        },
-    ]
-    inserted = 0
-    for s in samples:
-        try:
-            create_document("toy", s)
-            inserted += 1
-        except Exception:
-            pass
-    return {"status": "seeded", "inserted": inserted}
+    report = await seed_database_async(toys, orders, seed, batch_size=BULK_BATCH_SIZE)
+    # Indexes the new toys in chunks between awaits. Other workers pick them
+    # up on their own next poll (see search.PrefixIndexSync)
+    await toy_prefix_sync.poll()
+    return {"status": "seeded", "inserted": report["toy"]["inserted"], **report}
 
 if __name__ == "__main__":
     import uvicorn
@@ -0,0 +1,267 @@
+"""
+Prometheus Metrics
+
+Counters, gauges and histograms rendered in the Prometheus text format at
+GET /metrics. Recording takes no lock: every thread (the event loop and each
+threadpool worker running a sync endpoint) writes only to its own shard, and
+a scrape sums the shards. The only lock is taken once per thread per metric,
+when that thread's shard is created.
+
+Metrics are per process, like cache.TTLCache: with several workers each
+exposes its own series, so scrape every worker (or aggregate by instance).
+
+- http_requests_total{method,route,status}
+- http_request_duration_seconds{method,route}     (histogram)
+- http_requests_in_flight
+- db_operation_duration_seconds{collection,operation}   (histogram)
+- db_operation_errors_total{collection,operation}
+
+``route`` is the route template (/api/toys/{toy_id}), never the raw path, so
+the number of series stays bounded.
+"""
+
+import bisect
+import functools
+import inspect
+import threading
+import time
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from tracing import KIND_CLIENT, record_span
+
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+UNMATCHED_ROUTE = "<unmatched>"
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    parts = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._local = threading.local()
+        self._shards: List[dict] = []
+        self._shards_lock = threading.Lock()
+
+    def _shard(self) -> dict:
+        shard = getattr(self._local, "shard", None)
+        if shard is None:
+            shard = self._local.shard = {}
+            with self._shards_lock:
+                self._shards.append(shard)
+        return shard
+
+    def _merged(self) -> Dict[Tuple[str, ...], list]:
+        merged: Dict[Tuple[str, ...], list] = {}
+        with self._shards_lock:
+            shards = list(self._shards)
+        for shard in shards:
+            # Copy first: the owning thread may add a label set meanwhile
+            for labels, values in list(shard.items()):
+                total = merged.get(labels)
+                if total is None:
+                    merged[labels] = list(values)
+                else:
+                    for i, value in enumerate(values):
+                        total[i] += value
+        return merged
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        for labels, values in sorted(self._merged().items()):
+            lines.extend(self._samples(labels, values))
+        return lines
+
+    def _samples(self, labels: Tuple[str, ...], values: list) -> List[str]:
+        return [f"{self.name}{_labels(self.labelnames, labels)} {values[0]}"]
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, *labels: str, amount: float = 1):
+        shard = self._shard()
+        values = shard.get(labels)
+        if values is None:
+            shard[labels] = [amount]
+        else:
+            values[0] += amount
+
+
+class Gauge(Counter):
+    """A counter that may go down; for in-flight style values summed across threads"""
+    kind = "gauge"
+
+    def dec(self, *labels: str, amount: float = 1):
+        self.inc(*labels, amount=-amount)
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value: float, *labels: str):
+        shard = self._shard()
+        values = shard.get(labels)
+        if values is None:
+            # One count per bucket, then +Inf, then the running sum
+            values = shard[labels] = [0] * (len(self.buckets) + 2)
+        values[bisect.bisect_left(self.buckets, value)] += 1
+        values[-1] += value
+
+    def _samples(self, labels: Tuple[str, ...], values: list) -> List[str]:
+        lines = []
+        cumulative = 0
+        for bound, count in zip((*self.buckets, "+Inf"), values[:-1]):
+            cumulative += count
+            le = f'le="{bound}"'
+            lines.append(f"{self.name}_bucket{_labels(self.labelnames, labels, le)} {cumulative}")
+        lines.append(f"{self.name}_sum{_labels(self.labelnames, labels)} {values[-1]}")
+        lines.append(f"{self.name}_count{_labels(self.labelnames, labels)} {cumulative}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self._metrics: List[_Metric] = []
+
+    def register(self, metric: _Metric) -> _Metric:
+        self._metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+http_requests = registry.register(Counter(
+    "http_requests_total", "HTTP requests by route template and status", ("method", "route", "status")))
+http_duration = registry.register(Histogram(
+    "http_request_duration_seconds", "HTTP request latency by route template", ("method", "route")))
+http_in_flight = registry.register(Gauge(
+    "http_requests_in_flight", "HTTP requests currently being handled"))
+db_duration = registry.register(Histogram(
+    "db_operation_duration_seconds", "Latency of database.py helper calls", ("collection", "operation")))
+db_errors = registry.register(Counter(
+    "db_operation_errors_total", "database.py helper calls that raised", ("collection", "operation")))
+
+
+def timed_operation(func):
+    """Record duration and errors of a database.py helper, labelled with its
+    collection (first argument) and operation (function name without _async),
+    plus a "db <operation>" span when the request is being traced.
+
+    Works on plain functions, coroutines, and sync or async generators; for
+    generators the time covers the whole iteration.
+    """
+    operation = func.__name__.removesuffix("_async")
+
+    def _done(collection: str, start: float, start_ns: int, failed: bool):
+        db_duration.observe(time.perf_counter() - start, collection, operation)
+        if failed:
+            db_errors.inc(collection, operation)
+        record_span(f"db {operation}", start_ns, KIND_CLIENT, "failed" if failed else None,
+                    **{"db.collection": collection, "db.operation": operation})
+
+    if inspect.isasyncgenfunction(func):
+        @functools.wraps(func)
+        async def wrapper(collection_name, *args, **kwargs):
+            start, start_ns, failed = time.perf_counter(), time.time_ns(), True
+            inner = func(collection_name, *args, **kwargs)
+            try:
+                async for item in inner:
+                    yield item
+                failed = False
+            except GeneratorExit:
+                # The consumer stopped early; that is not a failure
+                failed = False
+                raise
+            finally:
+                await inner.aclose()
+                _done(collection_name, start, start_ns, failed)
+    elif inspect.iscoroutinefunction(func):
+        @functools.wraps(func)
+        async def wrapper(collection_name, *args, **kwargs):
+            start, start_ns, failed = time.perf_counter(), time.time_ns(), True
+            try:
+                result = await func(collection_name, *args, **kwargs)
+                failed = False
+                return result
+            finally:
+                _done(collection_name, start, start_ns, failed)
+    elif inspect.isgeneratorfunction(func):
+        @functools.wraps(func)
+        def wrapper(collection_name, *args, **kwargs):
+            start, start_ns, failed = time.perf_counter(), time.time_ns(), True
+            try:
+                yield from func(collection_name, *args, **kwargs)
+                failed = False
+            except GeneratorExit:
+                failed = False
+                raise
+            finally:
+                _done(collection_name, start, start_ns, failed)
+    else:
+        @functools.wraps(func)
+        def wrapper(collection_name, *args, **kwargs):
+            start, start_ns, failed = time.perf_counter(), time.time_ns(), True
+            try:
+                result = func(collection_name, *args, **kwargs)
+                failed = False
+                return result
+            finally:
+                _done(collection_name, start, start_ns, failed)
+    return wrapper
+
+
+def _route_template(scope) -> str:
+    # The router stores the matched route in the scope it was given
+    route = scope.get("route")
+    return getattr(route, "path", None) or UNMATCHED_ROUTE
+
+
+class MetricsMiddleware:
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        status: Optional[int] = None
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        http_in_flight.inc()
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = time.perf_counter() - start
+            http_in_flight.dec()
+            route = _route_template(scope)
+            http_requests.inc(scope["method"], route, str(status or 500))
+            http_duration.observe(elapsed, scope["method"], route)
@@ -0,0 +1,170 @@
+"""
+Write-Behind Order Queue
+
+Optional group-commit path for order intake (ORDER_WRITE_MODE=group).
+Validated orders are put on a bounded in-process queue and a single flusher
+task writes them with one unordered insert_many per batch. A batch is
+flushed when it reaches ``max_batch`` orders or ``max_delay_ms`` after its
+first order arrived, whichever comes first. At peak this turns hundreds of
+insert round-trips into a few.
+
+Acknowledgement (ORDER_ACK):
+- durable: the request waits until its batch is written with the configured
+  write concern (ORDER_WRITE_CONCERN_W / ORDER_WRITE_CONCERN_J), then 201.
+- accepted: the request returns 202 as soon as the order is queued. Orders
+  still queued when the process dies are lost, so only use this where that
+  is acceptable.
+
+When the queue is full, submit raises QueueFull and the API answers 429.
+"""
+
+import asyncio
+import logging
+import os
+from dataclasses import dataclass
+from typing import List, Optional, Tuple, Union
+
+from pymongo import WriteConcern
+
+from database import create_documents_async
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class OrderQueueSettings:
+    mode: str = "direct"
+    ack: str = "durable"
+    max_batch: int = 500
+    max_delay_ms: int = 10
+    max_pending: int = 10000
+    write_concern_w: Union[int, str] = 1
+    write_concern_j: Optional[bool] = None
+
+    @classmethod
+    def from_env(cls) -> "OrderQueueSettings":
+        w = os.getenv("ORDER_WRITE_CONCERN_W") or str(cls.write_concern_w)
+        j = os.getenv("ORDER_WRITE_CONCERN_J")
+        return cls(
+            mode=os.getenv("ORDER_WRITE_MODE") or cls.mode,
+            ack=os.getenv("ORDER_ACK") or cls.ack,
+            max_batch=int(os.getenv("ORDER_QUEUE_MAX_BATCH") or cls.max_batch),
+            max_delay_ms=int(os.getenv("ORDER_QUEUE_MAX_DELAY_MS") or cls.max_delay_ms),
+            max_pending=int(os.getenv("ORDER_QUEUE_MAX_PENDING") or cls.max_pending),
+            write_concern_w=int(w) if w.isdigit() else w,
+            write_concern_j=j.strip().lower() in ("1", "true", "yes", "on") if j else None,
+        )
+
+    @property
+    def enabled(self) -> bool:
+        return self.mode == "group"
+
+    def write_concern(self) -> WriteConcern:
+        return WriteConcern(w=self.write_concern_w, j=self.write_concern_j)
+
+
+class QueueFull(Exception):
+    pass
+
+
+class GroupCommitQueue:
+    def __init__(self, collection_name: str, settings: OrderQueueSettings):
+        self.collection_name = collection_name
+        self.settings = settings
+        self._queue: Optional[asyncio.Queue] = None
+        self._task: Optional[asyncio.Task] = None
+        self.batches = 0
+        self.written = 0
+        self.failed = 0
+
+    def start(self):
+        self._queue = asyncio.Queue(maxsize=self.settings.max_pending)
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Flush everything already queued, then stop the flusher"""
+        if self._task is None:
+            return
+        await self._queue.put(None)
+        await self._task
+        self._task = None
+
+    def submit(self, document: dict) -> asyncio.Future:
+        """Queue a prepared document; the future resolves once it is written"""
+        if self._queue is None:
+            raise RuntimeError("Order queue is not running")
+        future = asyncio.get_running_loop().create_future()
+        try:
+            self._queue.put_nowait((document, future))
+        except asyncio.QueueFull:
+            raise QueueFull()
+        return future
+
+    def stats(self) -> dict:
+        return {
+            "mode": self.settings.mode,
+            "ack": self.settings.ack,
+            "pending": self._queue.qsize() if self._queue else 0,
+            "max_pending": self.settings.max_pending,
+            "batches": self.batches,
+            "written": self.written,
+            "failed": self.failed,
+            "avg_batch": round(self.written / self.batches, 1) if self.batches else 0.0,
+        }
+
+    async def _next_batch(self) -> Tuple[List[tuple], bool]:
+        """Wait for one order, then gather more until the batch is full or
+        the deadline passes. Returns (batch, stop requested)."""
+        first = await self._queue.get()
+        if first is None:
+            return [], True
+        batch = [first]
+        deadline = asyncio.get_running_loop().time() + self.settings.max_delay_ms / 1000
+        while len(batch) < self.settings.max_batch:
+            timeout = deadline - asyncio.get_running_loop().time()
+            try:
+                item = self._queue.get_nowait() if timeout <= 0 else await asyncio.wait_for(self._queue.get(), timeout)
+            except (asyncio.QueueEmpty, asyncio.TimeoutError):
+                break
+            if item is None:
+                return batch, True
+            batch.append(item)
+        return batch, False
+
+    async def _run(self):
+        stopping = False
+        while not stopping or not self._queue.empty():
+            if stopping:
+                # Drain whatever arrived after the stop marker
+                batch = [self._queue.get_nowait() for _ in range(min(self._queue.qsize(), self.settings.max_batch))]
+                batch = [item for item in batch if item is not None]
+            else:
+                batch, stopping = await self._next_batch()
+            if batch:
+                await self._flush(batch)
+
+    async def _flush(self, batch: List[tuple]):
+        documents = [document for document, _ in batch]
+        try:
+            result = await create_documents_async(
+                self.collection_name, documents, batch_size=len(documents),
+                write_concern=self.settings.write_concern(),
+            )
+        except Exception as e:
+            logger.exception("Order batch of %d failed", len(batch))
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            self.failed += len(batch)
+            return
+        errors = {error["index"]: error["error"] for error in result["errors"]}
+        for index, (document, future) in enumerate(batch):
+            if future.done():
+                continue
+            if index in errors:
+                future.set_exception(RuntimeError(errors[index]))
+            else:
+                future.set_result(str(document["_id"]))
+        self.batches += 1
+        self.written += result["inserted"]
+        self.failed += len(errors)
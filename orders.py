@@ -0,0 +1,76 @@
+"""
+Order Pricing
+
+Orders are priced from the live catalog rather than trusted from the client.
+All toys of an order are fetched with one ``$in`` query (``catalog_filter``),
+then ``price_order`` checks each line and the totals against the catalog.
+"""
+
+from typing import Dict, List, Tuple
+
+from bson import ObjectId
+from bson.errors import InvalidId
+
+from schemas import OrderItem
+
+# Client-computed amounts may differ from ours by float rounding only
+PRICE_TOLERANCE = 0.005
+
+# Only the fields needed to price a line are fetched
+CATALOG_PROJECTION = {"name": 1, "price": 1, "image": 1, "stock": 1, "in_stock": 1}
+
+
+class OrderRejected(Exception):
+    """Order cannot be accepted as submitted; maps onto an HTTP error response"""
+
+    def __init__(self, status_code: int, detail):
+        super().__init__(detail)
+        self.status_code = status_code
+        self.detail = detail
+
+
+def catalog_filter(items: List[OrderItem]) -> dict:
+    """Filter fetching every toy referenced by the order in a single query"""
+    try:
+        ids = {ObjectId(item.toy_id) for item in items}
+    except (InvalidId, TypeError):
+        raise OrderRejected(400, "Invalid toy id in order items")
+    return {"_id": {"$in": list(ids)}}
+
+
+def price_order(items: List[OrderItem], catalog: Dict[str, dict],
+                subtotal: float, shipping: float, total: float) -> Tuple[List[OrderItem], float, float]:
+    """Return items re-priced from ``catalog`` (toy id -> document) plus the
+    recomputed subtotal and total, or raise OrderRejected listing every
+    line that disagrees with the catalog. Toys marked out of stock that do
+    not track a stock count (so reserve_stock cannot refuse them) are
+    rejected here, with the same 409 as a failed reservation."""
+    unknown, stale, priced = [], [], []
+    for line, item in enumerate(items):
+        toy = catalog.get(item.toy_id)
+        if toy is None:
+            unknown.append({"line": line, "toy_id": item.toy_id, "error": "Toy not found"})
+            continue
+        if abs(toy["price"] - item.price) > PRICE_TOLERANCE:
+            stale.append({"line": line, "toy_id": item.toy_id, "error": "Price changed",
+                          "submitted": item.price, "current": toy["price"]})
+        priced.append(item.model_copy(update={
+            "name": toy["name"], "price": toy["price"], "image": toy.get("image", item.image),
+        }))
+    if unknown:
+        raise OrderRejected(422, {"message": "Order references unknown toys", "errors": unknown})
+
+    expected_subtotal = round(sum(item.price * item.quantity for item in priced), 2)
+    expected_total = round(expected_subtotal + shipping, 2)
+    if abs(expected_subtotal - subtotal) > PRICE_TOLERANCE:
+        stale.append({"field": "subtotal", "submitted": subtotal, "current": expected_subtotal})
+    if abs(expected_total - total) > PRICE_TOLERANCE:
+        stale.append({"field": "total", "submitted": total, "current": expected_total})
+    if stale:
+        raise OrderRejected(409, {"message": "Order does not match current catalog prices", "errors": stale})
+    unavailable = sorted({item.toy_id for item in items
+                          if catalog[item.toy_id].get("stock") is None
+                          and catalog[item.toy_id].get("in_stock") is False})
+    if unavailable:
+        raise OrderRejected(409, {"message": "Insufficient stock", "toy_ids": unavailable})
+    return priced, expected_subtotal, expected_total
@@ -0,0 +1,84 @@
+"""
+Keyset Pagination Helpers
+
+Cursors are opaque to clients: a URL-safe base64 JSON object holding the sort
+key(s) of the last document on the previous page. Resuming from a cursor is a
+range condition on an indexed key, so page 1000 costs the same as page 1
+(unlike skip/offset, which walks every skipped document).
+"""
+
+import base64
+import json
+from datetime import datetime
+from typing import List
+from bson import ObjectId
+from bson.errors import InvalidId
+
+
+def encode_cursor(position: dict) -> str:
+    """Encode a page position (e.g. {"id": "<hex>"}) into an opaque token"""
+    raw = json.dumps(position, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(token: str) -> dict:
+    """Decode a token from encode_cursor; raises ValueError if it is malformed"""
+    try:
+        padded = token + "=" * (-len(token) % 4)
+        position = json.loads(base64.urlsafe_b64decode(padded.encode()))
+    except (ValueError, TypeError) as e:
+        raise ValueError("Malformed cursor") from e
+    if not isinstance(position, dict):
+        raise ValueError("Malformed cursor")
+    return position
+
+
+def after_id_filter(position: dict) -> dict:
+    """Filter selecting documents after the cursor position in _id order"""
+    try:
+        return {"_id": {"$gt": ObjectId(position["id"])}}
+    except (KeyError, TypeError, InvalidId) as e:
+        raise ValueError("Malformed cursor") from e
+
+
+def _encode_value(value):
+    if isinstance(value, datetime):
+        return {"$date": value.isoformat()}
+    return value
+
+
+def _decode_value(value):
+    if isinstance(value, dict) and "$date" in value:
+        return datetime.fromisoformat(value["$date"])
+    return value
+
+
+def position_of(doc: dict, field: str) -> dict:
+    """Cursor position of ``doc`` in a listing sorted by (field, _id)"""
+    position = {"id": str(doc["_id"])}
+    if field != "_id":
+        position["k"] = _encode_value(doc.get(field))
+    return position
+
+
+def keyset_conditions(field: str, direction: int, position: dict) -> List[dict]:
+    """Conditions selecting documents after ``position`` in (field, _id) order.
+
+    The leading $gte/$lte on ``field`` becomes the index bound; the $or only
+    breaks ties between documents sharing the same ``field`` value.
+    """
+    try:
+        last_id = ObjectId(position["id"])
+        value = _decode_value(position["k"]) if field != "_id" else None
+    except (KeyError, TypeError, ValueError, InvalidId) as e:
+        raise ValueError("Malformed cursor") from e
+    after = "$gt" if direction == 1 else "$lt"
+    if field == "_id":
+        return [{"_id": {after: last_id}}]
+    if value is None:
+        raise ValueError("Malformed cursor")
+    bound = "$gte" if direction == 1 else "$lte"
+    return [
+        {field: {bound: value}},
+        {"$or": [{field: {after: value}}, {"_id": {after: last_id}}]},
+    ]
@@ -0,0 +1,323 @@
+"""
+Query Monitoring and Slow-Query Log
+
+A pymongo CommandListener registered on both clients in database.py (Motor
+included, it runs pymongo underneath). For every read and write command it
+records the duration, collection, the filter and sort *shape* (literal values
+replaced by "?", so {"price": {"$gte": 10}} becomes {"price": {"$gte": "?"}},
+{"name": "$x"} becomes {"name": "?"})
+and the number of documents returned or affected.
+
+- Commands slower than SLOW_QUERY_MS (default 100) are written to the
+  "slow_queries" logger as one JSON object per line, and to
+  SLOW_QUERY_LOG_FILE as well when that is set.
+- Every command is aggregated by shape; the top shapes by total time are
+  served at GET /api/admin/slow-queries. At most QUERY_SHAPES_MAX shapes are
+  kept, the cheapest in total time being dropped first.
+- Plan summaries come from a sampled explain: the last command seen for a
+  shape (with its real values, kept in memory only, never logged) is
+  explained on request from the admin endpoint and the summary is cached on
+  the shape and included in later slow-log lines.
+
+getMore batches are attributed to the find/aggregate that opened the cursor.
+Per process, like the other in-memory stats.
+"""
+
+import json
+import logging
+import os
+import threading
+from collections import deque
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional
+
+from pymongo import monitoring
+
+logger = logging.getLogger("slow_queries")
+
+TRACKED_COMMANDS = frozenset({
+    "find", "aggregate", "count", "distinct", "getMore",
+    "insert", "update", "delete", "findAndModify",
+})
+# Fields of a read command needed to explain it again
+EXPLAIN_FIELDS = {
+    "find": ("find", "filter", "sort", "projection", "hint", "skip", "limit", "collation"),
+    "aggregate": ("aggregate", "pipeline", "hint", "collation"),
+    "count": ("count", "query", "hint", "skip", "limit", "collation"),
+    "distinct": ("distinct", "key", "query", "collation"),
+}
+MAX_OPEN_CURSORS = 10000
+RECENT_SLOW = 100
+
+
+@dataclass(frozen=True)
+class QueryLogSettings:
+    slow_ms: float = 100.0
+    max_shapes: int = 500
+    log_file: Optional[str] = None
+
+    @classmethod
+    def from_env(cls) -> "QueryLogSettings":
+        return cls(
+            slow_ms=float(os.getenv("SLOW_QUERY_MS") or cls.slow_ms),
+            max_shapes=int(os.getenv("QUERY_SHAPES_MAX") or cls.max_shapes),
+            log_file=os.getenv("SLOW_QUERY_LOG_FILE") or None,
+        )
+
+
+def redact(value: Any, expression: bool = False) -> Any:
+    """Shape of a filter: operators and field names kept, values replaced by "?".
+
+    Lists collapse to their distinct element shapes, so {"$in": [1, 2, 3]}
+    and {"$in": [4]} share a shape. Strings starting with "$" are kept only
+    in expression positions (under $expr, or ``expression=True`` for
+    pipeline stages), where they are field paths and variables; in a filter
+    they are values like any other, possibly user input.
+    """
+    if isinstance(value, dict):
+        return {key: redact(item, expression or key == "$expr") for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        shapes = []
+        for item in value:
+            item_shape = redact(item, expression)
+            if item_shape not in shapes:
+                shapes.append(item_shape)
+        return shapes
+    if expression and isinstance(value, str) and value.startswith("$"):
+        return value
+    return "?"
+
+
+def redact_pipeline(pipeline: Any) -> Any:
+    """Shape of an aggregation pipeline: $match stages are filters, the other
+    stages expressions; $facet and $lookup sub-pipelines are walked the same way"""
+    if not isinstance(pipeline, (list, tuple)):
+        return "?"
+    stages = []
+    for stage in pipeline:
+        if not isinstance(stage, dict):
+            stages.append("?")
+            continue
+        shaped = {}
+        for name, spec in stage.items():
+            if name == "$match":
+                shaped[name] = redact(spec)
+            elif name == "$facet" and isinstance(spec, dict):
+                shaped[name] = {key: redact_pipeline(sub) for key, sub in spec.items()}
+            elif isinstance(spec, dict) and "pipeline" in spec:
+                shaped[name] = {key: redact_pipeline(sub) if key == "pipeline" else redact(sub, True)
+                                for key, sub in spec.items()}
+            else:
+                shaped[name] = redact(spec, True)
+        stages.append(shaped)
+    return stages
+
+
+def _collection(command_name: str, command: dict) -> str:
+    if command_name == "getMore":
+        return command.get("collection", "")
+    return str(command.get(command_name, ""))
+
+
+def _shape(command_name: str, command: dict) -> dict:
+    if command_name == "find":
+        return {"filter": redact(command.get("filter", {})), "sort": command.get("sort")}
+    if command_name == "aggregate":
+        return {"pipeline": redact_pipeline(command.get("pipeline", []))}
+    if command_name in ("count", "distinct"):
+        return {"filter": redact(command.get("query", {})), "key": command.get("key")}
+    if command_name == "update":
+        return {"filter": redact([u.get("q", {}) for u in command.get("updates", [])])}
+    if command_name == "delete":
+        return {"filter": redact([d.get("q", {}) for d in command.get("deletes", [])])}
+    if command_name == "findAndModify":
+        return {"filter": redact(command.get("query", {})), "sort": command.get("sort")}
+    return {}
+
+
+def _docs(command_name: str, reply: dict) -> int:
+    cursor = reply.get("cursor")
+    if isinstance(cursor, dict):
+        return len(cursor.get("firstBatch") or cursor.get("nextBatch") or ())
+    if command_name == "distinct":
+        return len(reply.get("values", ()))
+    if command_name == "findAndModify":
+        return 1 if reply.get("value") else 0
+    return int(reply.get("n", 0))
+
+
+def _cursor_id(reply: dict) -> int:
+    cursor = reply.get("cursor")
+    return cursor.get("id", 0) if isinstance(cursor, dict) else 0
+
+
+def _plan_stages(plan: dict) -> List[str]:
+    stage = plan.get("stage", "?")
+    if plan.get("indexName"):
+        stage = f"{stage}({plan['indexName']})"
+    children = [plan[key] for key in ("inputStage", "queryPlan") if key in plan] + plan.get("inputStages", [])
+    stages = [stage]
+    for child in children:
+        stages.extend(_plan_stages(child))
+    return stages
+
+
+def plan_summary(explain: dict) -> Optional[str]:
+    """Winning plan as "LIMIT > FETCH > IXSCAN(name)" from explain output"""
+    planner = explain.get("queryPlanner")
+    if planner is None:
+        # Aggregations that are not fully pushed down nest it in the $cursor stage
+        for stage in explain.get("stages", ()):
+            if "$cursor" in stage:
+                planner = stage["$cursor"].get("queryPlanner")
+                break
+    if not planner:
+        return None
+    return " > ".join(_plan_stages(planner["winningPlan"]))
+
+
+class QueryMonitor(monitoring.CommandListener):
+    def __init__(self, settings: QueryLogSettings):
+        self.settings = settings
+        self._lock = threading.Lock()
+        self._pending: Dict[tuple, tuple] = {}
+        self._cursors: Dict[int, str] = {}
+        self._shapes: Dict[str, dict] = {}
+        self._recent = deque(maxlen=RECENT_SLOW)
+        if settings.log_file:
+            handler = logging.FileHandler(settings.log_file)
+            handler.setFormatter(logging.Formatter("%(message)s"))
+            logger.addHandler(handler)
+            logger.setLevel(logging.INFO)
+
+    # -- listener callbacks, called on whichever thread ran the command --
+
+    def started(self, event):
+        if event.command_name not in TRACKED_COMMANDS:
+            return
+        command = event.command
+        cursor_id = None
+        if event.command_name == "getMore":
+            cursor_id = command.get("getMore")
+            key = self._cursors.get(cursor_id)
+            if key is None:
+                return
+            shape = None
+        else:
+            shape = _shape(event.command_name, command)
+            key = f"{event.command_name} {_collection(event.command_name, command)} " \
+                  f"{json.dumps(shape, default=str)}"
+        fields = EXPLAIN_FIELDS.get(event.command_name)
+        sample = {name: command[name] for name in fields if name in command} if fields else None
+        self._pending[(event.request_id, event.connection_id)] = (key, shape, sample, event.database_name, cursor_id)
+
+    def succeeded(self, event):
+        self._finish(event, failed=False)
+
+    def failed(self, event):
+        self._finish(event, failed=True)
+
+    def _finish(self, event, failed: bool):
+        pending = self._pending.pop((event.request_id, event.connection_id), None)
+        if pending is None:
+            return
+        key, shape, sample, database_name, get_more_id = pending
+        reply = {} if failed else event.reply
+        duration_ms = event.duration_micros / 1000
+        docs = 0 if failed else _docs(event.command_name, reply)
+
+        cursor_id = _cursor_id(reply)
+        if event.command_name in ("find", "aggregate") and cursor_id:
+            if len(self._cursors) >= MAX_OPEN_CURSORS:
+                self._cursors.pop(next(iter(self._cursors)), None)
+            self._cursors[cursor_id] = key
+        elif event.command_name == "getMore" and not cursor_id:
+            self._cursors.pop(get_more_id, None)
+
+        with self._lock:
+            entry = self._shapes.get(key)
+            if entry is None:
+                if shape is None:
+                    return
+                entry = self._new_shape(key, event.command_name, shape, database_name)
+            if shape is not None:
+                # getMore batches add time and documents, not executions
+                entry["count"] += 1
+            entry["total_ms"] += duration_ms
+            entry["max_ms"] = max(entry["max_ms"], duration_ms)
+            entry["docs"] += docs
+            entry["errors"] += failed
+            if sample is not None:
+                entry["sample"] = sample
+            slow = duration_ms >= self.settings.slow_ms
+            if slow:
+                entry["slow"] += 1
+
+        if slow:
+            record = {
+                "ts": datetime.now(timezone.utc).isoformat(),
+                "command": event.command_name,
+                "collection": entry["collection"],
+                "duration_ms": round(duration_ms, 3),
+                "shape": entry["shape"],
+                "docs": docs,
+                "failed": failed,
+                "plan": entry["plan"],
+            }
+            self._recent.append(record)
+            logger.warning(json.dumps(record, default=str))
+
+    def _new_shape(self, key: str, command_name: str, shape: dict, database_name: str) -> dict:
+        if len(self._shapes) >= self.settings.max_shapes:
+            cheapest = min(self._shapes, key=lambda k: self._shapes[k]["total_ms"])
+            del self._shapes[cheapest]
+        entry = self._shapes[key] = {
+            "command": command_name, "collection": key.split(" ", 2)[1], "database": database_name,
+            "shape": shape, "count": 0, "total_ms": 0.0, "max_ms": 0.0, "docs": 0,
+            "errors": 0, "slow": 0, "plan": None, "sample": None,
+        }
+        return entry
+
+    # -- reporting --
+
+    def top(self, limit: int = 20) -> List[dict]:
+        """Shapes by total time spent, most expensive first"""
+        with self._lock:
+            entries = sorted(self._shapes.items(), key=lambda item: item[1]["total_ms"], reverse=True)[:limit]
+            return [{
+                "key": key,
+                **{name: value for name, value in entry.items() if name not in ("sample", "database")},
+                "total_ms": round(entry["total_ms"], 3),
+                "max_ms": round(entry["max_ms"], 3),
+                "avg_ms": round(entry["total_ms"] / entry["count"], 3) if entry["count"] else 0.0,
+            } for key, entry in entries]
+
+    def recent_slow(self) -> List[dict]:
+        return list(self._recent)
+
+    def reset(self):
+        with self._lock:
+            self._shapes.clear()
+            self._recent.clear()
+
+    async def explain_top_async(self, db, limit: int = 20) -> int:
+        """Explain the sampled command of each top read shape lacking a plan; returns how many were explained"""
+        explained = 0
+        for item in self.top(limit):
+            with self._lock:
+                entry = self._shapes.get(item["key"])
+                sample = entry and entry["sample"]
+                if not sample or entry["plan"] is not None:
+                    continue
+            try:
+                result = await db.client[entry["database"]].command(
+                    {"explain": sample, "verbosity": "queryPlanner"})
+            except Exception as e:
+                summary = f"explain failed: {e}"
+            else:
+                summary = plan_summary(result)
+            with self._lock:
+                entry["plan"] = summary
+            explained += 1
+        return explained
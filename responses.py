@@ -0,0 +1,35 @@
+"""
+Response Classes
+
+MongoJSONResponse renders with orjson, which serializes datetime natively and
+ObjectId through ``default``. Handlers can return raw Mongo documents in it
+directly, skipping both per-document ``_id`` stringification and FastAPI's
+``jsonable_encoder`` pass (which only runs when a handler returns plain data).
+"""
+
+from typing import Any
+
+import orjson
+from bson import ObjectId
+from fastapi.responses import JSONResponse
+
+from tracing import current_span, span
+
+
+def _default(value: Any):
+    if isinstance(value, ObjectId):
+        return str(value)
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def dumps(content: Any) -> bytes:
+    """Serialize to compact JSON bytes, ObjectId as its hex string"""
+    if current_span() is None:
+        return orjson.dumps(content, default=_default)
+    with span("encode response"):
+        return orjson.dumps(content, default=_default)
+
+
+class MongoJSONResponse(JSONResponse):
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
@@ -9,10 +9,15 @@ Model name is converted to lowercase for the collection name:
 - User -> "user" collection
 - Product -> "product" collection
 - BlogPost -> "blogs" collection
+
+Indexes are declared next to the model they serve in an ``__indexes__``
+class variable (a list of pymongo IndexModel) and synced by indexes.py.
 """
 
-from pydantic import BaseModel, Field, EmailStr
-from typing import Optional, List
+from pydantic import BaseModel, Field, EmailStr, model_validator
+from pymongo import ASCENDING, DESCENDING, TEXT, IndexModel
+from datetime import datetime
+from typing import ClassVar, Optional, List
 
 # Example schemas (replace with your own):
 
@@ -27,6 +32,10 @@ class User(BaseModel):
     age: Optional[int] = Field(None, ge=0, le=120, description="Age in years")
     is_active: bool = Field(True, description="Whether user is active")
 
+    __indexes__: ClassVar[List[IndexModel]] = [
+        IndexModel([("email", ASCENDING)], unique=True),
+    ]
+
 class Product(BaseModel):
     """
     Products collection schema
@@ -52,6 +61,36 @@ class Toy(BaseModel):
     image: Optional[str] = Field(None, description="Image URL")
     rating: Optional[float] = Field(4.5, ge=0, le=5, description="Average rating")
     in_stock: bool = Field(True, description="Availability")
+    stock: Optional[int] = Field(None, ge=0, description="Units available; None means stock is not tracked")
+
+    __indexes__: ClassVar[List[IndexModel]] = [
+        # Category filter + keyset pagination on _id
+        IndexModel([("category", ASCENDING), ("_id", ASCENDING)]),
+        # Sorted listings, with and without a category (see toy_listing.TOY_SORTS):
+        # equality field first, then the sort key with _id as tie-breaker.
+        # Each serves both sort directions and price/rating ranges.
+        IndexModel([("price", ASCENDING), ("_id", ASCENDING)]),
+        IndexModel([("rating", ASCENDING), ("_id", ASCENDING)]),
+        IndexModel([("created_at", ASCENDING), ("_id", ASCENDING)]),
+        IndexModel([("category", ASCENDING), ("price", ASCENDING), ("_id", ASCENDING)]),
+        IndexModel([("category", ASCENDING), ("rating", ASCENDING), ("_id", ASCENDING)]),
+        IndexModel([("category", ASCENDING), ("created_at", ASCENDING), ("_id", ASCENDING)]),
+        # Incremental catalog refresh and export ?since=
+        IndexModel([("updated_at", ASCENDING)]),
+        # Full-text search, name matches rank highest
+        IndexModel(
+            [("name", TEXT), ("description", TEXT), ("category", TEXT)],
+            weights={"name": 10, "category": 3, "description": 1},
+            name="toy_text",
+        ),
+    ]
+
+    @model_validator(mode="after")
+    def _sync_in_stock(self):
+        # When stock is tracked, availability follows it
+        if self.stock is not None:
+            self.in_stock = self.stock > 0
+        return self
 
 class OrderItem(BaseModel):
     toy_id: str = Field(..., description="Referenced toy _id as string")
@@ -74,6 +113,33 @@ class Order(BaseModel):
     total: float = Field(..., ge=0)
     notes: Optional[str] = None
 
+    __indexes__: ClassVar[List[IndexModel]] = [
+        # Order history per customer, newest first
+        IndexModel([("customer_email", ASCENDING), ("created_at", DESCENDING)]),
+    ]
+
+# Records expire this long after the first request with a given key
+IDEMPOTENCY_KEY_TTL_SECONDS = 24 * 60 * 60
+
+class Idempotency(BaseModel):
+    """
+    Stored responses for requests sent with an Idempotency-Key header
+    Collection name: "idempotency"
+    _id is "<scope>:<key>", so the _id index doubles as the unique key index
+    """
+    scope: str = Field(..., description="Endpoint the key was used on, e.g. order")
+    key: str = Field(..., description="Client-supplied Idempotency-Key")
+    request_hash: str = Field(..., description="SHA-256 of the request body")
+    status: str = Field("pending", description="pending or done")
+    status_code: Optional[int] = Field(None, description="Status of the stored response")
+    content_type: Optional[str] = None
+    body: Optional[bytes] = Field(None, description="Stored response body")
+    created_at: datetime = Field(...)
+
+    __indexes__: ClassVar[List[IndexModel]] = [
+        IndexModel([("created_at", ASCENDING)], expireAfterSeconds=IDEMPOTENCY_KEY_TTL_SECONDS),
+    ]
+
 # Add your own schemas here:
 # --------------------------------------------------
 
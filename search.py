@@ -0,0 +1,288 @@
+"""
+Toy Search Helpers
+
+Full-text search is delegated to MongoDB's text index (declared on
+schemas.Toy); this module holds the in-process prefix index used for
+typeahead, where a round-trip per keystroke would be wasteful.
+
+The prefix index is per process. It is built in full once, at startup,
+before requests are served; after that PrefixIndexSync only changes it
+incrementally: writes made through database.py in this process are applied
+(deletes) or polled (inserts and updates) at once, toys with a recent
+updated_at are polled every PREFIX_INDEX_POLL_SECONDS to catch other
+workers and scripts, and every PREFIX_INDEX_SWEEP_SECONDS a sweep of the
+collection's _ids drops toys deleted elsewhere. Each of these works in
+small chunks between awaits, so none holds the event loop for long.
+"""
+
+import asyncio
+import bisect
+import heapq
+import logging
+import os
+import re
+import unicodedata
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from itertools import islice
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+from pymongo.errors import PyMongoError
+
+import database
+
+logger = logging.getLogger(__name__)
+
+_WORD = re.compile(r"\w+")
+
+
+def normalize(text: str) -> str:
+    """Lowercase and strip accents so 'Épée' and 'epee' match"""
+    decomposed = unicodedata.normalize("NFKD", text)
+    return "".join(c for c in decomposed if not unicodedata.combining(c)).casefold()
+
+
+def tokenize(text: str) -> List[str]:
+    return _WORD.findall(normalize(text))
+
+
+class PrefixIndex:
+    """(token, doc_id) pairs searched with bisect, kept in one sorted list
+    per bucket of tokens sharing their first BUCKET_CHARS characters.
+
+    Every word of a toy name is indexed, so "bea" finds "Cuddly Bear".
+    Adding or removing a key is a bisect.insort / del in its bucket, so it
+    moves that bucket's tail rather than the whole index. All mutation
+    happens on the event loop thread, so no locking is needed.
+    """
+
+    BUCKET_CHARS = 2
+    # Keys examined per lookup, so a one-letter prefix costs the same at 1M
+    # toys as at 1k. Lossy: when more keys match, only the first MAX_SCAN in
+    # token order are ranked, so very short prefixes return good matches
+    # rather than the best ones
+    MAX_SCAN = 2000
+
+    def __init__(self):
+        self._buckets: Dict[str, List[tuple]] = {}
+        self._docs: dict = {}
+
+    def __len__(self):
+        return len(self._docs)
+
+    def rebuild(self, docs: Iterable[dict]):
+        """Replace the index contents with ``docs`` (dicts with _id, name, rating)"""
+        buckets, entries = {}, {}
+        for doc in docs:
+            doc_id = str(doc["_id"])
+            entries[doc_id] = (doc["name"], doc.get("rating") or 0, set(tokenize(doc["name"])))
+            for token in entries[doc_id][2]:
+                buckets.setdefault(token[:self.BUCKET_CHARS], []).append((token, doc_id))
+        for keys in buckets.values():
+            keys.sort()
+        self._buckets, self._docs = buckets, entries
+
+    def add(self, doc_id: str, name: str, rating: Optional[float] = None):
+        self.remove(doc_id)
+        tokens = set(tokenize(name))
+        self._docs[doc_id] = (name, rating or 0, tokens)
+        for token in tokens:
+            bisect.insort(self._buckets.setdefault(token[:self.BUCKET_CHARS], []), (token, doc_id))
+
+    def remove(self, doc_id: str):
+        entry = self._docs.pop(doc_id, None)
+        if entry is None:
+            return
+        for token in entry[2]:
+            keys = self._buckets.get(token[:self.BUCKET_CHARS], [])
+            i = bisect.bisect_left(keys, (token, doc_id))
+            if i < len(keys) and keys[i] == (token, doc_id):
+                del keys[i]
+            if not keys:
+                self._buckets.pop(token[:self.BUCKET_CHARS], None)
+
+    def changed(self, docs: Iterable[dict]) -> List[dict]:
+        """The ``docs`` whose name or rating differ from what is indexed"""
+        return [doc for doc in docs
+                if self._docs.get(str(doc["_id"]), (None, None))[:2] != (doc["name"], doc.get("rating") or 0)]
+
+    def ids(self) -> List[str]:
+        return list(self._docs)
+
+    def _span(self, word: str, exact: bool) -> Tuple[List[tuple], int, int]:
+        """Bucket and [lo, hi) slice of the keys for ``word`` (a token, or a
+        prefix of at least BUCKET_CHARS characters)"""
+        keys = self._buckets.get(word[:self.BUCKET_CHARS], [])
+        lo = bisect.bisect_left(keys, (word,))
+        hi = bisect.bisect_left(keys, (word, chr(0x10FFFF)) if exact else (word + chr(0x10FFFF),))
+        return keys, lo, hi
+
+    def _count(self, word: str, exact: bool = True) -> int:
+        _, lo, hi = self._span(word, exact)
+        return hi - lo
+
+    def _exact(self, word: str) -> Iterator[tuple]:
+        keys, lo, hi = self._span(word, exact=True)
+        return iter(keys[lo:hi])
+
+    def _matches(self, prefix: str) -> Iterator[tuple]:
+        """(token, doc_id) keys whose token starts with ``prefix``, in key order"""
+        if len(prefix) >= self.BUCKET_CHARS:
+            names = [prefix[:self.BUCKET_CHARS]]
+        else:
+            names = sorted(name for name in self._buckets if name.startswith(prefix))
+        for name in names:
+            keys = self._buckets.get(name, [])
+            i = bisect.bisect_left(keys, (prefix,))
+            while i < len(keys) and keys[i][0].startswith(prefix):
+                yield keys[i]
+                i += 1
+
+    def suggest(self, query: str, limit: int = 10) -> List[dict]:
+        """Best-rated toys whose name has a word starting with the last query
+        word and contains every earlier query word"""
+        words = tokenize(query)
+        if not words:
+            return []
+        *required, prefix = words
+        keys, check_prefix = self._matches(prefix), False
+        if required:
+            # A full word often has far fewer keys than a short prefix: walk
+            # the rarest one instead and check the prefix per document
+            rarest = min(required, key=self._count)
+            if len(prefix) < self.BUCKET_CHARS or self._count(rarest) < self._count(prefix, exact=False):
+                keys, check_prefix = self._exact(rarest), True
+        candidates = set()
+        for _, doc_id in islice(keys, self.MAX_SCAN):
+            tokens = self._docs[doc_id][2]
+            if not all(word in tokens for word in required):
+                continue
+            if check_prefix and not any(token.startswith(prefix) for token in tokens):
+                continue
+            candidates.add(doc_id)
+        ranked = heapq.nsmallest(limit, candidates, key=lambda d: (-self._docs[d][1], self._docs[d][0]))
+        return [{"_id": d, "name": self._docs[d][0]} for d in ranked]
+
+
+@dataclass(frozen=True)
+class PrefixIndexSettings:
+    poll_seconds: float = 5.0
+    sweep_seconds: float = 300.0
+    # Polls re-read this far behind the newest updated_at seen: app and
+    # server clocks ($$NOW in inventory.py) differ, and a write can commit
+    # after a later-stamped one
+    overlap_seconds: float = 5.0
+
+    @classmethod
+    def from_env(cls) -> "PrefixIndexSettings":
+        return cls(
+            poll_seconds=float(os.getenv("PREFIX_INDEX_POLL_SECONDS") or cls.poll_seconds),
+            sweep_seconds=float(os.getenv("PREFIX_INDEX_SWEEP_SECONDS") or cls.sweep_seconds),
+            overlap_seconds=float(os.getenv("PREFIX_INDEX_OVERLAP_SECONDS") or cls.overlap_seconds),
+        )
+
+
+class PrefixIndexSync:
+    """Background refresh of a PrefixIndex from a collection"""
+
+    PROJECTION = {"name": 1, "rating": 1, "updated_at": 1}
+    # Documents indexed, or ids swept, between yields to the event loop
+    ADD_CHUNK = 100
+    SWEEP_CHUNK = 5000
+
+    def __init__(self, index: PrefixIndex, collection_name: str, settings: PrefixIndexSettings):
+        self.index = index
+        self.collection_name = collection_name
+        self.settings = settings
+        self._high_water: Optional[datetime] = None
+        self._wake = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+        self._loop = None
+
+    def _advance(self, docs: List[dict]):
+        for doc in docs:
+            updated_at = doc.get("updated_at")
+            if updated_at is not None and (self._high_water is None or updated_at > self._high_water):
+                self._high_water = updated_at
+
+    async def load(self):
+        """Build the index from a full read in one go. Holds the loop for the
+        whole build, so it is meant for startup, before requests are served"""
+        docs = await database.async_db[self.collection_name].find({}, self.PROJECTION).to_list(length=None)
+        self.index.rebuild(docs)
+        self._advance(docs)
+
+    async def poll(self):
+        """Re-index toys written since the newest updated_at seen"""
+        query = {}
+        if self._high_water is not None:
+            query = {"updated_at": {"$gte": self._high_water - timedelta(seconds=self.settings.overlap_seconds)}}
+        docs = await database.async_db[self.collection_name].find(query, self.PROJECTION).to_list(length=None)
+        await self.add_many(docs)
+        self._advance(docs)
+
+    async def add_many(self, docs: List[dict]):
+        """Index ``docs`` ADD_CHUNK at a time, yielding to the loop between chunks"""
+        for start in range(0, len(docs), self.ADD_CHUNK):
+            for doc in self.index.changed(docs[start:start + self.ADD_CHUNK]):
+                self.index.add(str(doc["_id"]), doc["name"], doc.get("rating"))
+            await asyncio.sleep(0)
+
+    async def sweep(self):
+        """Drop indexed toys that are no longer in the collection (deleted by
+        another worker or script). Only ids indexed before the sweep started
+        are considered, so toys added meanwhile are never dropped"""
+        indexed = self.index.ids()
+        present = set()
+        cursor = database.async_db[self.collection_name].find({}, {"_id": 1}, batch_size=self.SWEEP_CHUNK)
+        async for doc in cursor:
+            present.add(str(doc["_id"]))
+        for start in range(0, len(indexed), self.SWEEP_CHUNK):
+            for doc_id in indexed[start:start + self.SWEEP_CHUNK]:
+                if doc_id not in present:
+                    self.index.remove(doc_id)
+            await asyncio.sleep(0)
+
+    def on_write(self, collection_name: str, operation: str, doc_ids: list):
+        """database.py write listener: apply deletes now, poll for the rest"""
+        if collection_name != self.collection_name or self._loop is None:
+            return
+        if operation == "delete":
+            for doc_id in doc_ids:
+                self._loop.call_soon_threadsafe(self.index.remove, doc_id)
+        else:
+            self._loop.call_soon_threadsafe(self._wake.set)
+
+    def start(self):
+        self._loop = asyncio.get_running_loop()
+        database.add_write_listener(self.on_write)
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        next_sweep = loop.time() + self.settings.sweep_seconds
+        while True:
+            try:
+                await asyncio.wait_for(self._wake.wait(), timeout=self.settings.poll_seconds)
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+            try:
+                await self.poll()
+                if loop.time() >= next_sweep:
+                    await self.sweep()
+                    next_sweep = loop.time() + self.settings.sweep_seconds
+            except PyMongoError as e:
+                logger.warning("Prefix index refresh failed: %s", e)
+
+
+toy_prefix_index = PrefixIndex()
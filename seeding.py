@@ -0,0 +1,284 @@
+"""
+Synthetic Catalog Seeding
+
+Generates production-shaped toy catalogs and order histories for capacity
+testing, deterministically: the same ``seed`` always produces the same
+documents, _ids included, however the work is split into batches or threads.
+Each document is derived from (seed, index) alone, which is also what lets
+orders reference toys without reading them back.
+
+Distributions:
+- categories are Zipf-skewed (a few big categories, a long tail of small ones);
+- prices are log-normal around a per-category median, with .99 endings;
+- ratings lean towards 4-5 stars, as they do on real storefronts;
+- names come from a Zipf-popular brand pool, a category noun, and optional
+  adjectives, variants and series numbers, so most names are rare;
+- stock is mostly tracked, sometimes zero, sometimes untracked (None);
+- orders have 1-5 lines, pick toys with a popularity skew, and come from a
+  customer pool where a minority of customers place most orders.
+
+Documents are written with database.create_documents in parallel batches:
+
+    python seeding.py --toys 1000000 --orders 2000000 --seed 42 --workers 8 --drop
+"""
+
+import argparse
+import asyncio
+import hashlib
+import json
+import math
+import random
+import struct
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+from typing import Callable, Iterator, List
+
+from bson import ObjectId
+
+# Creation dates are spread over the three years before this fixed point so
+# output does not depend on when the generator runs
+EPOCH = datetime(2025, 1, 1, tzinfo=timezone.utc)
+HISTORY_DAYS = 3 * 365
+
+# (category, median price, nouns), most popular first
+CATEGORIES = [
+    ("Plush", 18.0, ["Bear", "Bunny", "Unicorn", "Puppy", "Kitten", "Dragon", "Penguin", "Sloth"]),
+    ("Building Blocks", 35.0, ["Brick Set", "Castle Kit", "Space Station", "City Set", "Marble Run"]),
+    ("STEM", 45.0, ["Robot Kit", "Circuit Lab", "Microscope", "Telescope", "Coding Mouse", "Chemistry Set"]),
+    ("Puzzles", 16.0, ["Jigsaw", "3D Puzzle", "Brain Teaser", "Puzzle Cube", "Floor Puzzle"]),
+    ("Vehicles", 24.0, ["Race Car", "Fire Truck", "Train Set", "Monster Truck", "Airplane", "Tractor"]),
+    ("Dolls", 22.0, ["Doll", "Dollhouse", "Fashion Doll", "Baby Doll", "Doll Stroller"]),
+    ("Educational", 20.0, ["Stacking Rings", "Abacus", "Flash Cards", "Shape Sorter", "Globe"]),
+    ("Outdoor", 30.0, ["Kite", "Water Blaster", "Scooter", "Sandbox Set", "Bubble Machine"]),
+    ("Board Games", 25.0, ["Board Game", "Card Game", "Strategy Game", "Trivia Game"]),
+    ("Arts & Crafts", 14.0, ["Paint Set", "Clay Kit", "Bead Kit", "Sketch Pad", "Sticker Book"]),
+    ("Musical", 28.0, ["Xylophone", "Keyboard", "Drum Set", "Ukulele", "Maracas"]),
+    ("Baby", 15.0, ["Rattle", "Teether", "Play Mat", "Soft Blocks", "Mobile"]),
+]
+CATEGORY_WEIGHTS = [1 / (rank + 1) ** 1.1 for rank in range(len(CATEGORIES))]
+ADJECTIVES = ["Cuddly", "Rainbow", "Wooden", "Magnetic", "Glow-in-the-Dark", "Mini", "Giant", "Deluxe",
+              "Classic", "Turbo", "Eco", "Sparkly", "Pocket", "Super", "Junior", "Galaxy", "Ocean", "Jungle"]
+VARIANTS = ["2-Pack", "Starter Set", "Travel Edition", "XL", "Collector's Edition", "Bundle", "Refill Pack"]
+SYLLABLES = ["ka", "zo", "mi", "lu", "ta", "ro", "ne", "pi", "bo", "vi", "sa", "qu", "fen", "dor", "lix", "tam"]
+BRAND_POOL = 500
+DESCRIPTIONS = [
+    "A {adj} {noun} loved by kids and grown-ups alike.",
+    "{brand}'s {noun} is built to last through years of play.",
+    "Sparks imagination: this {noun} comes ready to play straight out of the box.",
+    "Perfect gift for ages {age}+. Includes everything needed to get started.",
+]
+FIRST_NAMES = ["Ava", "Liam", "Mia", "Noah", "Zoe", "Omar", "Ines", "Kai", "Lena", "Ravi", "Sofia", "Yuki"]
+LAST_NAMES = ["Smith", "Garcia", "Chen", "Okafor", "Muller", "Rossi", "Kowalski", "Nguyen", "Silva", "Haddad"]
+STREETS = ["Maple St", "Oak Ave", "Pine Rd", "Cedar Ln", "Elm Way", "Birch Blvd"]
+
+
+def _rng(seed: int, kind: str, index: int) -> random.Random:
+    return random.Random(f"{seed}:{kind}:{index}")
+
+
+def _object_id(seed: int, kind: str, index: int, created_at: datetime) -> ObjectId:
+    """Stable ObjectId whose timestamp part is ``created_at``"""
+    digest = hashlib.blake2b(f"{seed}:{kind}:{index}".encode(), digest_size=8).digest()
+    return ObjectId(struct.pack(">I", int(created_at.timestamp())) + digest)
+
+
+def _zipf_index(rng: random.Random, n: int, skew: float = 3.0) -> int:
+    """Index in [0, n) where low indexes are much more likely"""
+    return min(n - 1, int(n * rng.random() ** skew))
+
+
+def _brand(index: int) -> str:
+    rng = random.Random(f"brand:{index}")
+    return "".join(rng.choice(SYLLABLES) for _ in range(rng.randint(2, 3))).capitalize()
+
+
+BRANDS = [_brand(i) for i in range(BRAND_POOL)]
+
+
+def make_toy(seed: int, index: int) -> dict:
+    """The ``index``-th toy of the catalog generated from ``seed``"""
+    rng = _rng(seed, "toy", index)
+    category, median, nouns = rng.choices(CATEGORIES, weights=CATEGORY_WEIGHTS)[0]
+    brand = BRANDS[_zipf_index(rng, BRAND_POOL)]
+    noun = rng.choice(nouns)
+    adjective = rng.choice(ADJECTIVES)
+    parts = [brand]
+    if rng.random() < 0.7:
+        parts.append(adjective)
+    parts.append(noun)
+    if rng.random() < 0.25:
+        parts.append(rng.choice(VARIANTS))
+    if rng.random() < 0.4:
+        parts.append(str(rng.randint(1, 9999)))
+    name = " ".join(parts)
+
+    price = math.exp(rng.gauss(math.log(median), 0.55))
+    price = min(499.99, max(1.99, math.floor(price) + 0.99))
+    rating = round(1 + 4 * rng.betavariate(5, 1.6), 1)
+    roll = rng.random()
+    if roll < 0.10:
+        stock = None
+    elif roll < 0.18:
+        stock = 0
+    else:
+        stock = int(rng.expovariate(1 / 40)) + 1
+    created_at = EPOCH - timedelta(days=rng.random() * HISTORY_DAYS)
+    toy_id = _object_id(seed, "toy", index, created_at)
+    description = rng.choice(DESCRIPTIONS).format(
+        adj=adjective.lower(), noun=noun.lower(), brand=brand, age=rng.choice([1, 3, 5, 8, 12]))
+    return {
+        "_id": toy_id,
+        "name": name,
+        "description": description,
+        "price": price,
+        "category": category,
+        "image": f"https://picsum.photos/seed/{toy_id}/400/400",
+        "rating": rating,
+        "in_stock": stock is None or stock > 0,
+        "stock": stock,
+        "created_at": created_at,
+    }
+
+
+def make_order(seed: int, index: int, toy_count: int, customer_count: int) -> dict:
+    """The ``index``-th order, referencing toys of the same seed's catalog"""
+    rng = _rng(seed, "order", index)
+    # Popular customers reorder a lot
+    customer = _zipf_index(rng, customer_count, skew=2.0)
+    crng = random.Random(f"{seed}:customer:{customer}")
+    first, last = crng.choice(FIRST_NAMES), crng.choice(LAST_NAMES)
+    lines = rng.choices([1, 2, 3, 4, 5], weights=[50, 25, 12, 8, 5])[0]
+    toy_indexes = {_zipf_index(rng, toy_count, skew=2.5) for _ in range(lines)}
+    items = []
+    for toy_index in sorted(toy_indexes):
+        toy = make_toy(seed, toy_index)
+        items.append({"toy_id": str(toy["_id"]), "name": toy["name"], "price": toy["price"],
+                      "quantity": rng.choices([1, 2, 3], weights=[80, 15, 5])[0], "image": toy["image"]})
+    subtotal = round(sum(item["price"] * item["quantity"] for item in items), 2)
+    shipping = 0.0 if subtotal >= 50 else 5.99
+    created_at = EPOCH - timedelta(days=rng.random() * HISTORY_DAYS)
+    return {
+        "_id": _object_id(seed, "order", index, created_at),
+        "customer_name": f"{first} {last}",
+        "customer_email": f"{first.lower()}.{last.lower()}.{customer}@example.com",
+        "customer_address": f"{crng.randint(1, 9999)} {crng.choice(STREETS)}",
+        "items": items,
+        "subtotal": subtotal,
+        "shipping": shipping,
+        "total": round(subtotal + shipping, 2),
+        "notes": None,
+        "created_at": created_at,
+    }
+
+
+def generate_toys(seed: int, start: int, stop: int) -> Iterator[dict]:
+    for index in range(start, stop):
+        yield make_toy(seed, index)
+
+
+def generate_orders(seed: int, start: int, stop: int, toy_count: int, order_count: int) -> Iterator[dict]:
+    # About five orders per customer on average
+    customer_count = max(1, order_count // 5)
+    for index in range(start, stop):
+        yield make_order(seed, index, toy_count, customer_count)
+
+
+def chunks(total: int, size: int) -> List[range]:
+    return [range(start, min(start + size, total)) for start in range(0, total, size)]
+
+
+def _run_parallel(insert: Callable[[range], dict], ranges: List[range], workers: int) -> dict:
+    summary = {"inserted": 0, "errors": 0}
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        for result in pool.map(insert, ranges):
+            summary["inserted"] += result["inserted"]
+            summary["errors"] += len(result["errors"])
+    return summary
+
+
+def seed_database(db, toys: int, orders: int = 0, seed: int = 42, batch_size: int = 1000,
+                  workers: int = 4, drop: bool = False, write_concern=None) -> dict:
+    """Generate and insert ``toys`` toys and ``orders`` orders.
+
+    Each worker thread generates a chunk of ``batch_size * 10`` documents and
+    writes it with create_documents (unordered insert_many per batch), so
+    generation of one chunk overlaps with the round-trips of others. Existing
+    documents with the same _id (a re-run with the same seed) are reported
+    as errors and left as they are, unless ``drop`` empties the collections
+    first.
+    """
+    from database import create_documents
+
+    if drop:
+        db["toy"].delete_many({})
+        db["order"].delete_many({})
+    chunk = batch_size * 10
+    report = {"seed": seed}
+    started = time.perf_counter()
+    report["toy"] = _run_parallel(
+        lambda r: create_documents("toy", generate_toys(seed, r.start, r.stop), batch_size, write_concern),
+        chunks(toys, chunk), workers)
+    report["toy"]["seconds"] = round(time.perf_counter() - started, 2)
+    if orders and toys:
+        started = time.perf_counter()
+        report["order"] = _run_parallel(
+            lambda r: create_documents("order", generate_orders(seed, r.start, r.stop, toys, orders), batch_size,
+                                       write_concern),
+            chunks(orders, chunk), workers)
+        report["order"]["seconds"] = round(time.perf_counter() - started, 2)
+    return report
+
+
+async def seed_database_async(toys: int, orders: int = 0, seed: int = 42, batch_size: int = 1000,
+                              workers: int = 4) -> dict:
+    """seed_database for the event loop: chunks are generated in a worker
+    thread and written with create_documents_async, ``workers`` at a time"""
+    from database import create_documents_async
+
+    semaphore = asyncio.Semaphore(workers)
+
+    async def insert(collection: str, generate: Callable[[range], Iterator[dict]], r: range) -> dict:
+        async with semaphore:
+            documents = await asyncio.to_thread(lambda: list(generate(r)))
+            return await create_documents_async(collection, documents, batch_size)
+
+    async def run(collection: str, total: int, generate: Callable[[range], Iterator[dict]]) -> dict:
+        started = time.perf_counter()
+        results = await asyncio.gather(*(insert(collection, generate, r) for r in chunks(total, batch_size * 10)))
+        return {"inserted": sum(r["inserted"] for r in results), "errors": sum(len(r["errors"]) for r in results),
+                "seconds": round(time.perf_counter() - started, 2)}
+
+    report = {"seed": seed, "toy": await run("toy", toys, lambda r: generate_toys(seed, r.start, r.stop))}
+    if orders and toys:
+        report["order"] = await run(
+            "order", orders, lambda r: generate_orders(seed, r.start, r.stop, toys, orders))
+    return report
+
+
+if __name__ == "__main__":
+    from pymongo import WriteConcern
+
+    from database import db
+    from indexes import sync_indexes
+
+    parser = argparse.ArgumentParser(description="Seed a synthetic toy catalog and order history")
+    parser.add_argument("--toys", type=int, default=100000)
+    parser.add_argument("--orders", type=int, default=0)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--batch-size", type=int, default=1000)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--drop", action="store_true", help="empty the toy and order collections first")
+    parser.add_argument("--no-journal", action="store_true",
+                        help="insert with w=1, j=false for speed on a scratch database")
+    parser.add_argument("--no-indexes", action="store_true", help="skip syncing the schemas.py indexes afterwards")
+    args = parser.parse_args()
+
+    if db is None:
+        raise SystemExit("Database not available. Check DATABASE_URL and DATABASE_NAME environment variables.")
+    write_concern = WriteConcern(w=1, j=False) if args.no_journal else None
+    result = seed_database(db, args.toys, args.orders, args.seed, args.batch_size, args.workers,
+                           args.drop, write_concern)
+    if not args.no_indexes:
+        result["indexes"] = sync_indexes(db)
+    print(json.dumps(result, indent=2, default=str))
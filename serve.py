@@ -0,0 +1,122 @@
+"""
+Production Server Entry Point
+
+Runs main:app under uvicorn with several worker processes and without the
+reloader (start_server.sh used ``uvicorn --reload``, which runs a single
+process plus a supervisor polling every source file for changes).
+
+- WEB_CONCURRENCY workers, default one per CPU. They share the listening
+  socket; the kernel spreads connections across them.
+- uvloop and httptools when they are installed, asyncio and h11 otherwise
+  (both are in requirements.txt; uvloop is skipped on Windows).
+- No Mongo client crosses a fork. This module never imports main or
+  database: the app is handed to uvicorn as an import string and workers are
+  started with the "spawn" method, so each one imports database.py itself
+  and opens its own pools after it starts. Pool sizes and caches are per
+  worker (see MongoSettings).
+- SIGTERM / SIGINT drain gracefully: each worker stops accepting, finishes
+  in-flight requests for up to GRACEFUL_TIMEOUT seconds, then runs the
+  lifespan shutdown (order queue flush, catalog poller stop, trace flush).
+
+Usage:
+    python serve.py                         # HOST:PORT, WEB_CONCURRENCY workers
+    python serve.py --workers 4 --port 9000
+
+Settings (environment, overridden by the flags): HOST=0.0.0.0, PORT=8000,
+WEB_CONCURRENCY=<cpu count>, GRACEFUL_TIMEOUT=30, KEEPALIVE_TIMEOUT=5,
+BACKLOG=2048, LOG_LEVEL=info, ACCESS_LOG=false (per-request log lines cost
+throughput; GET /metrics already counts requests by route and status).
+"""
+
+import argparse
+import importlib.util
+import os
+from dataclasses import dataclass, replace
+
+import uvicorn
+from dotenv import load_dotenv
+
+APP = "main:app"
+
+
+def _env_bool(name: str, default: bool) -> bool:
+    value = os.getenv(name)
+    if value in (None, ""):
+        return default
+    return value.strip().lower() in ("1", "true", "yes", "on")
+
+
+def _available(module: str) -> bool:
+    return importlib.util.find_spec(module) is not None
+
+
+@dataclass(frozen=True)
+class ServeSettings:
+    host: str = "0.0.0.0"
+    port: int = 8000
+    workers: int = 0                 # 0 = one per CPU
+    graceful_timeout: int = 30
+    keepalive_timeout: int = 5
+    backlog: int = 2048
+    log_level: str = "info"
+    access_log: bool = False
+
+    @classmethod
+    def from_env(cls) -> "ServeSettings":
+        return cls(
+            host=os.getenv("HOST") or cls.host,
+            port=int(os.getenv("PORT") or cls.port),
+            workers=int(os.getenv("WEB_CONCURRENCY") or cls.workers),
+            graceful_timeout=int(os.getenv("GRACEFUL_TIMEOUT") or cls.graceful_timeout),
+            keepalive_timeout=int(os.getenv("KEEPALIVE_TIMEOUT") or cls.keepalive_timeout),
+            backlog=int(os.getenv("BACKLOG") or cls.backlog),
+            log_level=os.getenv("LOG_LEVEL") or cls.log_level,
+            access_log=_env_bool("ACCESS_LOG", cls.access_log),
+        )
+
+    @property
+    def worker_count(self) -> int:
+        return self.workers or os.cpu_count() or 1
+
+    def uvicorn_kwargs(self) -> dict:
+        """Keyword arguments for uvicorn.run"""
+        return {
+            "host": self.host,
+            "port": self.port,
+            "workers": self.worker_count,
+            "loop": "uvloop" if _available("uvloop") else "asyncio",
+            "http": "httptools" if _available("httptools") else "h11",
+            "reload": False,
+            "timeout_graceful_shutdown": self.graceful_timeout,
+            "timeout_keep_alive": self.keepalive_timeout,
+            "backlog": self.backlog,
+            "log_level": self.log_level,
+            "access_log": self.access_log,
+        }
+
+
+def serve(settings: ServeSettings):
+    kwargs = settings.uvicorn_kwargs()
+    print(f"Serving {APP} on {settings.host}:{settings.port} with {kwargs['workers']} worker(s), "
+          f"loop={kwargs['loop']} http={kwargs['http']}", flush=True)
+    uvicorn.run(APP, **kwargs)
+
+
+if __name__ == "__main__":
+    load_dotenv()
+    defaults = ServeSettings.from_env()
+
+    parser = argparse.ArgumentParser(description="Run the API with multiple uvicorn workers")
+    parser.add_argument("--host", default=defaults.host)
+    parser.add_argument("--port", type=int, default=defaults.port)
+    parser.add_argument("--workers", type=int, default=defaults.workers,
+                        help="worker processes (default: WEB_CONCURRENCY, else one per CPU)")
+    parser.add_argument("--graceful-timeout", type=int, default=defaults.graceful_timeout,
+                        help="seconds a worker waits for in-flight requests on SIGTERM")
+    parser.add_argument("--log-level", default=defaults.log_level)
+    parser.add_argument("--access-log", action="store_true", default=defaults.access_log)
+    args = parser.parse_args()
+
+    serve(replace(defaults, host=args.host, port=args.port, workers=args.workers,
+                  graceful_timeout=args.graceful_timeout, log_level=args.log_level,
+                  access_log=args.access_log))
@@ -1,19 +1,29 @@
 #!/bin/bash
 echo "Starting FastAPI backend server..."
 
-# Find and kill MainThread processes
-PIDS=$(ps | grep uvicorn | grep -v grep | awk '{print $1}')
+SERVER_PATTERN="python[0-9.]* serve\.py|uvicorn main:app"
+
+# Stop a running server: SIGTERM lets workers finish in-flight requests
+# (GRACEFUL_TIMEOUT, default 30s) before we fall back to SIGKILL
+PIDS=$(pgrep -f "$SERVER_PATTERN")
 if [ ! -z "$PIDS" ]; then
-  echo "Killing uvicorn processes: $PIDS"
-  for pid in $PIDS; do
-    kill $pid 2>/dev/null || true
+  echo "Stopping server processes: $PIDS"
+  kill $PIDS 2>/dev/null || true
+  for _ in $(seq $(( ${GRACEFUL_TIMEOUT:-30} + 5 ))); do
+    pgrep -f "$SERVER_PATTERN" > /dev/null || break
+    sleep 1
   done
-  sleep 2
+  pkill -9 -f "$SERVER_PATTERN" 2>/dev/null || true
 fi
 
 mkdir -p logs
-echo "Installing dependencies..."
-pip install -r requirements.txt
+# Only reinstall when requirements.txt changed since the last start
+REQ_HASH=$(sha256sum requirements.txt | awk '{print $1}')
+if [ "$REQ_HASH" != "$(cat logs/.requirements.sha256 2>/dev/null)" ]; then
+  echo "Installing dependencies..."
+  pip install -r requirements.txt && echo "$REQ_HASH" > logs/.requirements.sha256
+fi
 echo "Starting FastAPI server..."
-nohup uvicorn main:app --host 0.0.0.0 --port 8000 --reload > logs/server.log 2>&1 
+# WEB_CONCURRENCY workers (default: one per CPU), no reloader; see serve.py
+nohup python serve.py > logs/server.log 2>&1
 echo "Server started in background"
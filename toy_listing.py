@@ -0,0 +1,76 @@
+"""
+Toy Listing Queries
+
+Builds the filter, sort and index hint for GET /api/toys browsing. Every
+supported combination runs on a compound index laid out as (equality,
+sort key, _id) from schemas.Toy, so MongoDB returns documents already in
+order and never needs an in-memory SORT stage:
+
+- no category:   {sort_key: 1, _id: 1}       (or the _id index)
+- with category: {category: 1, sort_key: 1, _id: 1}
+
+Price/rating ranges and in_stock are applied as bounds or filters on that
+same index scan. The index is pinned with a hint so the planner cannot
+swap in a plan that sorts in memory. Toys without a value for the sort
+field are left out of listings sorted by it.
+"""
+
+from typing import List, Optional, Tuple
+
+from pagination import keyset_conditions
+
+# sort parameter -> (field, direction)
+TOY_SORTS = {
+    "price": ("price", 1),
+    "-price": ("price", -1),
+    "rating": ("rating", 1),
+    "-rating": ("rating", -1),
+    "created_at": ("created_at", 1),
+    "-created_at": ("created_at", -1),
+}
+
+
+def index_hint(field: str, category: Optional[str]) -> str:
+    """Name of the schemas.Toy index serving a listing sorted by ``field``"""
+    if field == "_id":
+        return "category_1__id_1" if category else "_id_"
+    return f"category_1_{field}_1__id_1" if category else f"{field}_1__id_1"
+
+
+def toy_listing_query(
+    sort: Optional[str] = None,
+    category: Optional[str] = None,
+    in_stock: Optional[bool] = None,
+    min_price: Optional[float] = None,
+    max_price: Optional[float] = None,
+    min_rating: Optional[float] = None,
+    position: Optional[dict] = None,
+) -> Tuple[dict, List[tuple], str, str]:
+    """Return (filter, sort spec, index hint, sort field) for a listing page.
+
+    ``position`` is a decoded cursor; raises ValueError for an unknown sort
+    or a malformed position.
+    """
+    if sort and sort not in TOY_SORTS:
+        raise ValueError(f"Unsupported sort: {sort}")
+    field, direction = TOY_SORTS[sort] if sort else ("_id", 1)
+
+    conditions = []
+    if category:
+        conditions.append({"category": category})
+    if in_stock is not None:
+        conditions.append({"in_stock": in_stock})
+    if min_price is not None:
+        conditions.append({"price": {"$gte": min_price}})
+    if max_price is not None:
+        conditions.append({"price": {"$lte": max_price}})
+    if min_rating is not None:
+        conditions.append({"rating": {"$gte": min_rating}})
+    if field != "_id":
+        conditions.append({field: {"$ne": None}})
+    if position is not None:
+        conditions.extend(keyset_conditions(field, direction, position))
+
+    filter_dict = {"$and": conditions} if conditions else {}
+    sort_spec = [(field, direction)] if field == "_id" else [(field, direction), ("_id", direction)]
+    return filter_dict, sort_spec, index_hint(field, category), field
@@ -0,0 +1,376 @@
+"""
+Request Tracing
+
+A small tracer: one trace per sampled request, with spans for
+- the request as a whole (named after the route template),
+- routing and middleware (request start until the route is matched),
+- request validation (body parsing and parameter validation by FastAPI),
+- the endpoint itself,
+- serialization of the returned value, and response encoding (responses.dumps),
+- every database.py helper call (via metrics.timed_operation),
+- explicit ``with span(...)`` blocks in handlers.
+
+W3C Trace Context: an incoming ``traceparent`` header continues the caller's
+trace and its sampled flag is honoured; otherwise a request is sampled with
+probability TRACE_SAMPLE_RATE (default 0.01). Sampled responses carry a
+``traceresponse`` header with the trace id. Unsampled requests cost one
+header lookup, one random draw and a ContextVar read per instrumented call.
+
+Finished spans are queued and shipped by a background thread in batches:
+- TRACE_EXPORTER=file: OTLP JSON spans, one per line, to TRACE_FILE
+  (default logs/traces.jsonl);
+- TRACE_EXPORTER=otlp: OTLP/HTTP JSON POSTed to OTLP_ENDPOINT
+  (default http://localhost:4318/v1/traces);
+- unset or "none": tracing is off and nothing is sampled.
+When the queue is full spans are dropped and counted, never blocking a request.
+"""
+
+import asyncio
+import functools
+import json
+import logging
+import os
+import random
+import re
+import threading
+import time
+import urllib.request
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass
+from typing import Dict, List, Optional
+
+from fastapi.routing import APIRoute
+
+logger = logging.getLogger(__name__)
+
+TRACEPARENT = re.compile(r"^00-([0-9a-f]{32})-([0-9a-f]{16})-([0-9a-f]{2})$")
+# OTLP span kinds
+KIND_INTERNAL = 1
+KIND_SERVER = 2
+KIND_CLIENT = 3
+
+
+@dataclass(frozen=True)
+class TracingSettings:
+    exporter: str = "none"
+    sample_rate: float = 0.01
+    file: str = "logs/traces.jsonl"
+    otlp_endpoint: str = "http://localhost:4318/v1/traces"
+    service_name: str = "toy-store-api"
+    max_queue: int = 10000
+    batch_size: int = 512
+    export_interval: float = 2.0
+
+    @classmethod
+    def from_env(cls) -> "TracingSettings":
+        return cls(
+            exporter=(os.getenv("TRACE_EXPORTER") or cls.exporter).lower(),
+            sample_rate=float(os.getenv("TRACE_SAMPLE_RATE") or cls.sample_rate),
+            file=os.getenv("TRACE_FILE") or cls.file,
+            otlp_endpoint=os.getenv("OTLP_ENDPOINT") or cls.otlp_endpoint,
+            service_name=os.getenv("TRACE_SERVICE_NAME") or cls.service_name,
+            max_queue=int(os.getenv("TRACE_MAX_QUEUE") or cls.max_queue),
+            batch_size=int(os.getenv("TRACE_BATCH_SIZE") or cls.batch_size),
+            export_interval=float(os.getenv("TRACE_EXPORT_INTERVAL") or cls.export_interval),
+        )
+
+    @property
+    def enabled(self) -> bool:
+        return self.exporter in ("file", "otlp")
+
+
+class Span:
+    __slots__ = ("trace_id", "span_id", "parent_id", "name", "kind", "start_ns", "end_ns", "attributes", "error")
+
+    def __init__(self, name: str, trace_id: str, parent_id: Optional[str], kind: int = KIND_INTERNAL,
+                 start_ns: Optional[int] = None):
+        self.trace_id = trace_id
+        self.span_id = os.urandom(8).hex()
+        self.parent_id = parent_id
+        self.name = name
+        self.kind = kind
+        self.start_ns = start_ns or time.time_ns()
+        self.end_ns = 0
+        self.attributes: Dict[str, object] = {}
+        self.error: Optional[str] = None
+
+    def child(self, name: str, kind: int = KIND_INTERNAL, start_ns: Optional[int] = None) -> "Span":
+        return Span(name, self.trace_id, self.span_id, kind, start_ns)
+
+    def to_otlp(self) -> dict:
+        span = {
+            "traceId": self.trace_id,
+            "spanId": self.span_id,
+            "name": self.name,
+            "kind": self.kind,
+            "startTimeUnixNano": str(self.start_ns),
+            "endTimeUnixNano": str(self.end_ns),
+            "attributes": [{"key": key, "value": _otlp_value(value)} for key, value in self.attributes.items()],
+            "status": {"code": 2, "message": self.error} if self.error else {"code": 0},
+        }
+        if self.parent_id:
+            span["parentSpanId"] = self.parent_id
+        return span
+
+
+def _otlp_value(value) -> dict:
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+
+class Tracer:
+    """Sampling decisions and the export queue; spans go through ``finish``"""
+
+    def __init__(self, settings: TracingSettings):
+        self.settings = settings
+        self._queue = deque()
+        self._wake = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._pid = None
+        self._start_lock = threading.Lock()
+        self.exported = 0
+        self.dropped = 0
+        self.export_errors = 0
+
+    def sample(self, traceparent: Optional[str]) -> Optional[Span]:
+        """Root server span for a request, or None when it is not sampled"""
+        if not self.settings.enabled:
+            return None
+        if traceparent:
+            match = TRACEPARENT.match(traceparent.strip().lower())
+            if match:
+                trace_id, parent_id, flags = match.groups()
+                if not int(flags, 16) & 1:
+                    return None
+                return Span("request", trace_id, parent_id, KIND_SERVER)
+        if random.random() >= self.settings.sample_rate:
+            return None
+        return Span("request", os.urandom(16).hex(), None, KIND_SERVER)
+
+    def finish(self, span: Span, end_ns: Optional[int] = None):
+        span.end_ns = end_ns or time.time_ns()
+        if len(self._queue) >= self.settings.max_queue:
+            self.dropped += 1
+            return
+        self._queue.append(span)
+        self._ensure_exporter()
+        if len(self._queue) >= self.settings.batch_size:
+            self._wake.set()
+
+    def _ensure_exporter(self):
+        # Started lazily, and again in a forked worker where the thread did not survive
+        if self._pid == os.getpid():
+            return
+        with self._start_lock:
+            if self._pid != os.getpid():
+                self._pid = os.getpid()
+                self._thread = threading.Thread(target=self._run, name="trace-exporter", daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        while True:
+            self._wake.wait(self.settings.export_interval)
+            self._wake.clear()
+            self.flush()
+
+    def flush(self):
+        while self._queue:
+            batch = []
+            while self._queue and len(batch) < self.settings.batch_size:
+                batch.append(self._queue.popleft())
+            try:
+                self._export(batch)
+                self.exported += len(batch)
+            except Exception as e:
+                self.export_errors += 1
+                logger.warning("Trace export failed, dropping %d spans: %s", len(batch), e)
+
+    def _export(self, batch: List[Span]):
+        spans = [span.to_otlp() for span in batch]
+        if self.settings.exporter == "file":
+            directory = os.path.dirname(self.settings.file)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            with open(self.settings.file, "a") as f:
+                for span in spans:
+                    f.write(json.dumps(span) + "\n")
+            return
+        payload = {"resourceSpans": [{
+            "resource": {"attributes": [{"key": "service.name",
+                                         "value": {"stringValue": self.settings.service_name}}]},
+            "scopeSpans": [{"scope": {"name": "tracing"}, "spans": spans}],
+        }]}
+        request = urllib.request.Request(
+            self.settings.otlp_endpoint, data=json.dumps(payload).encode(),
+            headers={"Content-Type": "application/json"}, method="POST")
+        with urllib.request.urlopen(request, timeout=5) as response:
+            response.read()
+
+    def stats(self) -> dict:
+        return {
+            "exporter": self.settings.exporter,
+            "sample_rate": self.settings.sample_rate,
+            "queued": len(self._queue),
+            "exported": self.exported,
+            "dropped": self.dropped,
+            "export_errors": self.export_errors,
+        }
+
+
+tracer = Tracer(TracingSettings.from_env())
+_current: ContextVar[Optional[Span]] = ContextVar("current_span", default=None)
+# Timestamps a TracedRoute handler shares with its endpoint wrapper
+_marks: ContextVar[Optional[dict]] = ContextVar("route_marks", default=None)
+
+
+def current_span() -> Optional[Span]:
+    return _current.get()
+
+
+@contextmanager
+def span(name: str, kind: int = KIND_INTERNAL, **attributes):
+    """Child span of the current one; a no-op outside a sampled request"""
+    parent = _current.get()
+    if parent is None:
+        yield None
+        return
+    child = parent.child(name, kind)
+    child.attributes.update(attributes)
+    token = _current.set(child)
+    try:
+        yield child
+    except BaseException as e:
+        child.error = f"{type(e).__name__}: {e}"
+        raise
+    finally:
+        _current.reset(token)
+        tracer.finish(child)
+
+
+def _record(parent: Span, name: str, start_ns: int, end_ns: int):
+    """Add an already finished child span"""
+    if end_ns > start_ns:
+        tracer.finish(parent.child(name, start_ns=start_ns), end_ns)
+
+
+def record_span(name: str, start_ns: int, kind: int = KIND_INTERNAL, error: Optional[str] = None, **attributes):
+    """Add a child of the current span that started at ``start_ns`` and ends now.
+
+    For timing code that cannot hold the span open as the current one (e.g.
+    generators, where the context var would leak to the consumer between items).
+    """
+    parent = _current.get()
+    if parent is None:
+        return
+    child = parent.child(name, kind, start_ns)
+    child.attributes.update(attributes)
+    child.error = error
+    tracer.finish(child)
+
+
+def _traced_endpoint(endpoint):
+    name = f"endpoint {endpoint.__name__}"
+
+    if asyncio.iscoroutinefunction(endpoint):
+        @functools.wraps(endpoint)
+        async def wrapper(*args, **kwargs):
+            marks = _marks.get()
+            if marks is None:
+                return await endpoint(*args, **kwargs)
+            marks["endpoint_start"] = time.time_ns()
+            try:
+                with span(name):
+                    return await endpoint(*args, **kwargs)
+            finally:
+                marks["endpoint_end"] = time.time_ns()
+    else:
+        @functools.wraps(endpoint)
+        def wrapper(*args, **kwargs):
+            # Sync endpoints run in the threadpool, which copies the context
+            marks = _marks.get()
+            if marks is None:
+                return endpoint(*args, **kwargs)
+            marks["endpoint_start"] = time.time_ns()
+            try:
+                with span(name):
+                    return endpoint(*args, **kwargs)
+            finally:
+                marks["endpoint_end"] = time.time_ns()
+    return wrapper
+
+
+class TracedRoute(APIRoute):
+    """APIRoute that splits a sampled request into routing, validation,
+    endpoint and serialization spans. Install with ``app.router.route_class``."""
+
+    def __init__(self, path: str, endpoint, **kwargs):
+        super().__init__(path, _traced_endpoint(endpoint), **kwargs)
+
+    def get_route_handler(self):
+        handler = super().get_route_handler()
+
+        async def traced_handler(request):
+            root = _current.get()
+            if root is None:
+                return await handler(request)
+            start = time.time_ns()
+            _record(root, "routing", root.start_ns, start)
+            marks = {}
+            token = _marks.set(marks)
+            try:
+                return await handler(request)
+            finally:
+                end = time.time_ns()
+                _marks.reset(token)
+                _record(root, "validation", start, marks.get("endpoint_start", end))
+                if "endpoint_end" in marks:
+                    _record(root, "serialization", marks["endpoint_end"], end)
+
+        return traced_handler
+
+
+class TracingMiddleware:
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        traceparent = None
+        if tracer.settings.enabled:
+            for name, value in scope["headers"]:
+                if name == b"traceparent":
+                    traceparent = value.decode("latin-1")
+                    break
+        root = tracer.sample(traceparent)
+        if root is None:
+            return await self.app(scope, receive, send)
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                root.attributes["http.status_code"] = message["status"]
+                message.setdefault("headers", [])
+                message["headers"] = [*message["headers"],
+                                      (b"traceresponse", f"00-{root.trace_id}-{root.span_id}-01".encode())]
+            await send(message)
+
+        root.attributes["http.method"] = scope["method"]
+        token = _current.set(root)
+        try:
+            await self.app(scope, receive, send_wrapper)
+        except BaseException as e:
+            root.error = f"{type(e).__name__}: {e}"
+            raise
+        finally:
+            _current.reset(token)
+            route = getattr(scope.get("route"), "path", None)
+            root.attributes["http.route"] = route or "<unmatched>"
+            root.name = f"{scope['method']} {route or '<unmatched>'}"
+            tracer.finish(root)